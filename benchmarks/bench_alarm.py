@@ -0,0 +1,160 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from models import ALARM_RETRY, CentralServer  # noqa: E402
+from protocol import FrameDecoder, send_message  # noqa: E402
+from stats import LatencyStats  # noqa: E402
+
+DEVICES = {
+    tag: {"tag": tag, "name": tag, "kind": kind}
+    for tag, kind in (
+        ("presence_sensor", "input"),
+        ("window_sensor", "input"),
+        ("door_sensor", "input"),
+        ("smoke_sensor", "input"),
+        ("alarm_bell", "output"),
+    )
+}
+
+
+class FakeRoom(threading.Thread):
+    def __init__(self, number, port):
+        threading.Thread.__init__(self, daemon=True)
+        self.number = number
+        self.client = socket.create_connection(("127.0.0.1", port))
+        self.decoder = FrameDecoder()
+        self.bell_on = threading.Event()
+        self.bell_at = 0.0
+        # Bell commands to reject before accepting one
+        self.reject_bells = 0
+        send_message(
+            self.client,
+            {
+                "type": "register",
+                "data": {"name": f"room_{number}", "devices": DEVICES},
+            },
+        )
+
+    def push(self, data):
+        send_message(self.client, {"type": "push", "data": data})
+
+    def run(self):
+        while True:
+            data = self.client.recv(4096)
+            if not data:
+                return
+            for message in self.decoder.feed(data):
+                # The welcome greeting is not a command
+                if (
+                    not isinstance(message, dict)
+                    or message.get("type") != "post"
+                ):
+                    continue
+                command = message.get("data")
+                status = "accepted"
+                if command.get("alarm_bell") == "on":
+                    if self.reject_bells:
+                        self.reject_bells -= 1
+                        status = "rejected"
+                    else:
+                        self.bell_at = time.perf_counter()
+                        self.bell_on.set()
+                send_message(
+                    self.client,
+                    {
+                        "type": "response",
+                        "id": message.get("id"),
+                        "data": {},
+                        "status": status,
+                        "message": "Command applied",
+                    },
+                )
+
+
+def headless_central(sock):
+    central = CentralServer(sock)
+    # No screen and no disk: only the rule path is measured
+    central.show_feedbacks_system = lambda messages=None: None
+    central.show_dashboard = lambda: None
+    central.log_command = lambda log_command: None
+
+    def on_room_connected(room):
+        room.on_sensor_change = central.rules.evaluate
+        setattr(central, room.name, room)
+
+    central.engine.on_room_connected = on_room_connected
+    return central
+
+
+def bench_retry(central, fakes):
+    # A room that rejects the bell gets it again while the smoke lasts,
+    # with no new edge from the sensor
+    source, failing = fakes[0], fakes[1]
+    failing.bell_on.clear()
+    failing.reject_bells = 1
+    central.buzzer = 0
+    detected = time.perf_counter()
+    source.push({"smoke_sensor": 1})
+    if not failing.bell_on.wait(ALARM_RETRY + 2):
+        raise RuntimeError(f"room {failing.number} never got the bell again")
+    source.push({"smoke_sensor": 0})
+    return round(failing.bell_at - detected, 3)
+
+
+def run(rooms=20, triggers=50):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    central = headless_central(sock)
+    central.engine.start()
+    port = central.engine.get_port()
+    fakes = [FakeRoom(number, port) for number in range(1, rooms + 1)]
+    for fake in fakes:
+        fake.start()
+    while len(central.get_rooms()) < rooms:
+        time.sleep(0.01)
+
+    latency = LatencyStats(size=triggers)
+    for trigger in range(triggers):
+        source = fakes[trigger % rooms]
+        last = fakes[-1 - trigger % rooms]
+        last.bell_on.clear()
+        central.buzzer = 0
+        sensor = "smoke_sensor"
+        if trigger % 2:
+            central.alarm_system = 1
+            sensor = "window_sensor"
+        detected = time.perf_counter()
+        source.push({sensor: 1})
+        if not last.bell_on.wait(2):
+            raise RuntimeError(
+                f"room {last.number} never got the bell for {sensor}"
+            )
+        latency.record(last.bell_at - detected)
+        source.push({sensor: 0})
+        central.alarm_system = 0
+        time.sleep(0.01)
+    result = {
+        "rooms": rooms,
+        "detection_to_bell": latency.summary(),
+        "detection_to_all_accepted": central.alarm_latency.summary(),
+        "rejected_bell_retry_s": bench_retry(central, fakes),
+    }
+    central.engine.stop()
+    return result
+
+
+if __name__ == "__main__":
+    result = run()
+    print(f"{result['rooms']} rooms, smoke and intrusion triggers")
+    print("sensor push -> alarm_bell command at a room:")
+    for name, value in result["detection_to_bell"].items():
+        print(f"  {name:<10} {value}")
+    print("sensor read -> every room accepted the alarm_bell command:")
+    for name, value in result["detection_to_all_accepted"].items():
+        print(f"  {name:<10} {value}")
+    print(f"rejected bell sent again after {result['rejected_bell_retry_s']}s")
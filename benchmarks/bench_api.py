@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from api import send_request  # noqa: E402
+from bench_central import connect_rooms, create_central  # noqa: E402
+from stats import LatencyStats  # noqa: E402
+
+
+def start_central(directory, rooms):
+    # Headless: nothing drawn, commands only through the API socket
+    central = create_central(directory)
+    central.api.path = os.path.join(directory, "central.sock")
+    central.start()
+    fake_rooms = connect_rooms(central, rooms)
+    return central, fake_rooms
+
+
+def bench_command(central, calls):
+    # One command per request, the way the menu sends them
+    latency = LatencyStats(size=calls)
+    for number in range(calls):
+        request = {"type": "command", "id": number, "room": 1, "command": 1}
+        start = time.perf_counter()
+        replies = list(send_request(request, central.api.path))
+        latency.record(time.perf_counter() - start)
+        assert replies[1].get("status") == "accepted", replies
+    return latency.summary()
+
+
+def bench_batch(central, rooms, commands):
+    # Toggles spread over every room in one request
+    batch = [
+        {"room": 1 + number % rooms, "command": 1 + number % 4}
+        for number in range(commands)
+    ]
+    request = {"type": "batch", "id": 1, "commands": batch}
+    start = time.perf_counter()
+    first = None
+    accepted = 0
+    for reply in send_request(request, central.api.path):
+        if reply.get("type") != "result":
+            continue
+        if first is None:
+            first = time.perf_counter() - start
+        accepted += reply.get("status") == "accepted"
+    elapsed = time.perf_counter() - start
+    return {
+        "rooms": rooms,
+        "commands": commands,
+        "accepted": accepted,
+        "first_result_ms": round(first * 1000, 3),
+        "commands_per_s": round(commands / elapsed),
+    }
+
+
+def run(calls=300, rooms=10, commands=5000):
+    with tempfile.TemporaryDirectory() as directory:
+        central, fake_rooms = start_central(directory, rooms)
+        try:
+            return {
+                "command": bench_command(central, calls),
+                "batch": bench_batch(central, rooms, commands),
+            }
+        finally:
+            central.stop()
+            fake_rooms.close()
+
+
+if __name__ == "__main__":
+    for part, result in run().items():
+        print(part)
+        for name, value in result.items():
+            print(f"  {name:<18} {value}")
@@ -0,0 +1,285 @@
+import json
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+import globals  # noqa: E402
+from headless import HeadlessScreen  # noqa: E402
+from models import CentralServer, Room  # noqa: E402
+from protocol import FrameDecoder, RECV_SIZE, encode_frame  # noqa: E402
+from screen import Renderer  # noqa: E402
+from stats import LatencyStats  # noqa: E402
+
+CLIENT_CONFIG = os.path.join(
+    os.path.dirname(__file__), "..", "client", "config.json"
+)
+
+
+def load_devices():
+    with open(CLIENT_CONFIG, "r") as file:
+        devices = json.load(file).get("devices")
+    parsed = {
+        tag: {
+            "tag": values.get("tag"),
+            "name": values.get("name"),
+            "kind": values.get("type"),
+        }
+        for tag, values in devices.items()
+        if not tag.startswith("people_counting_sensor")
+    }
+    parsed["people_count"] = {
+        "tag": "people_count",
+        "name": "Contagem de pessoas",
+        "kind": "input",
+    }
+    return parsed
+
+
+class FakeRooms(threading.Thread):
+    # Every room socket on one selector; commands are answered at once
+    def __init__(self, port, rooms):
+        threading.Thread.__init__(self, daemon=True)
+        self.selector = selectors.DefaultSelector()
+        self.sockets = []
+        devices = load_devices()
+        for number in range(1, rooms + 1):
+            client = socket.create_connection(("127.0.0.1", port))
+            client.sendall(
+                encode_frame(
+                    {
+                        "type": "register",
+                        "data": {"name": f"room_{number}", "devices": devices},
+                    }
+                )
+            )
+            self.selector.register(
+                client, selectors.EVENT_READ, FrameDecoder()
+            )
+            self.sockets.append(client)
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                try:
+                    data = key.fileobj.recv(RECV_SIZE)
+                except OSError:
+                    data = b""
+                if not data:
+                    self.selector.unregister(key.fileobj)
+                    if not self.selector.get_map():
+                        return
+                    continue
+                for message in key.data.feed(data):
+                    if isinstance(message, dict) and message.get("id"):
+                        self.answer(key.fileobj, message)
+
+    def answer(self, client, message):
+        updates = {
+            tag: 1 if action == "on" else 0
+            for tag, action in message.get("data").items()
+        }
+        client.sendall(
+            encode_frame(
+                {
+                    "type": "response",
+                    "id": message.get("id"),
+                    "data": updates,
+                    "message": "Command applied",
+                    "status": "accepted",
+                }
+            )
+        )
+
+    def close(self):
+        for client in self.sockets:
+            client.close()
+
+
+def create_central(directory):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    return CentralServer(
+        sock,
+        {
+            "log_file": os.path.join(directory, "logs.csv"),
+            "telemetry_dir": os.path.join(directory, "telemetry"),
+        },
+    )
+
+
+def connect_rooms(central, rooms):
+    fake_rooms = FakeRooms(central.engine.get_port(), rooms)
+    fake_rooms.start()
+    while len(central.get_rooms()) < rooms:
+        time.sleep(0.01)
+    return fake_rooms
+
+
+def timed(function, calls) -> LatencyStats:
+    latency = LatencyStats(size=calls)
+    for _ in range(calls):
+        start = time.perf_counter()
+        function()
+        latency.record(time.perf_counter() - start)
+    return latency
+
+
+def bench_apply_action(directory, calls):
+    # Central command to one room and back, redraw of the room included,
+    # through execute like the menu and the API
+    central = create_central(directory)
+    central.engine.start()
+    fake_rooms = connect_rooms(central, 1)
+    latency = timed(lambda: central.engine.call(central.execute(1, 1)), calls)
+    central.engine.stop()
+    fake_rooms.close()
+    return latency.summary()
+
+
+def bench_broadcast(directory, rooms, calls):
+    central = create_central(directory)
+    central.engine.start()
+    fake_rooms = connect_rooms(central, rooms)
+    accepted = [0]
+
+    def broadcast():
+        result = central.engine.call(central.execute(0, 5))
+        accepted[0] += result["status"] == "accepted"
+
+    latency = timed(broadcast, calls)
+    central.engine.stop()
+    fake_rooms.close()
+    return {"rooms": rooms, "all_accepted": accepted[0], **latency.summary()}
+
+
+def create_screen(directory, rooms, fps=10):
+    # The panels of the central without the text box, which would wait
+    # for keys on a terminal nobody types on
+    central = create_central(directory)
+    central.renderer = Renderer(fps)
+    central.renderer.add_panel("dashboard", central.draw_dashboard)
+    central.renderer.add_panel("instructions", central.draw_instructions)
+    central.renderer.add_panel("feedbacks", central.draw_feedbacks_system)
+    central.renderer.add_panel("rooms", central.draw_rooms)
+    devices = load_devices()
+    for number in range(1, rooms + 1):
+        room = Room(f"room_{number}", ("127.0.0.1", number), None, **devices)
+        room.on_change = central.on_room_change
+        setattr(central, room.name, room)
+        central.add_room_panel(room)
+    return central
+
+
+def bench_frame(directory, screen, rooms, calls):
+    # Every panel dirty: the most a single frame can draw
+    central = create_screen(directory, rooms)
+    renderer = central.renderer
+
+    def frame():
+        renderer.invalidate_all()
+        renderer.render()
+
+    written = screen.written
+    latency = timed(frame, calls)
+    # Give the drain thread a moment to read the last frames
+    time.sleep(0.1)
+    return {
+        "rooms": rooms,
+        "terminal_kb_per_call": round(
+            (screen.written - written) / calls / 1024, 2
+        ),
+        **latency.summary(),
+    }
+
+
+def bench_storm(directory, screen, rooms, updates, seconds=1.0):
+    # Sensor changes spread over a second in every room, with the
+    # renderer running: frames stay at the cap whatever the update rate
+    central = create_screen(directory, rooms)
+    renderer = central.renderer
+    renderer.render()
+    thread = threading.Thread(target=renderer.run, daemon=True)
+    written = screen.written
+    frames = renderer.frames
+    thread.start()
+    start = time.perf_counter()
+    for number in range(updates):
+        room = getattr(central, f"room_{1 + number % rooms}")
+        room.apply_client_updates(
+            {"presence_sensor": number % 2}, time.perf_counter()
+        )
+        delay = start + seconds * (number + 1) / updates - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    globals.stop_threads = True
+    thread.join()
+    globals.stop_threads = False
+    time.sleep(0.1)
+    return {
+        "rooms": rooms,
+        "updates": updates,
+        "frames": renderer.frames - frames,
+        "frames_per_s": round((renderer.frames - frames) / elapsed, 1),
+        "terminal_kb": round((screen.written - written) / 1024, 2),
+    }
+
+
+def bench_log_command(directory, commands):
+    central = create_central(directory)
+    central.journal.start()
+    command = {"local": 1, "action": {"lamp1": "on", "lamp2": "off"}}
+    start = time.perf_counter()
+    for _ in range(commands):
+        central.log_command(command)
+    elapsed = time.perf_counter() - start
+    central.journal.stop()
+    return {"commands": commands, "commands_per_s": round(commands / elapsed)}
+
+
+def run(
+    calls=300,
+    broadcast_rooms=50,
+    screen_rooms=4,
+    many_rooms=200,
+    updates=4000,
+    commands=50_000,
+):
+    screen = HeadlessScreen()
+    globals.stdscr_global = screen.open()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            return {
+                "apply_action": bench_apply_action(directory, calls),
+                "broadcast": bench_broadcast(
+                    directory, broadcast_rooms, calls // 3
+                ),
+                "full_frame": bench_frame(
+                    directory, screen, screen_rooms, calls
+                ),
+                "full_frame_many": bench_frame(
+                    directory, screen, many_rooms, calls
+                ),
+                "update_storm": bench_storm(
+                    directory, screen, screen_rooms, updates
+                ),
+                "update_storm_many": bench_storm(
+                    directory, screen, many_rooms, updates
+                ),
+                "log_command": bench_log_command(directory, commands),
+            }
+    finally:
+        screen.close()
+
+
+if __name__ == "__main__":
+    for part, result in run().items():
+        print(part)
+        for name, value in result.items():
+            print(f"  {name:<22} {value}")
@@ -0,0 +1,108 @@
+import contextlib
+import io
+import json
+import os
+import queue
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("FSE_GPIO", "fake")
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "client")
+sys.path.insert(0, CLIENT)
+
+import globals  # noqa: E402
+from connection import ApplyCommand, ReceiveMessage, SendMessage  # noqa: E402
+from interface import ControlGPIO  # noqa: E402
+from protocol import FrameDecoder, RECV_SIZE, encode_frame  # noqa: E402
+from utils import parse_devices_to_client  # noqa: E402
+
+COMMANDS = [
+    {"lamp1": "on"},
+    {"lamp1": "off"},
+    {"lamp2": "on", "air_conditioner": "on"},
+    {"all": "lamp_off"},
+]
+
+
+def start_client(connection):
+    with open(os.path.join(CLIENT, "config.json"), "r") as file:
+        devices = json.load(file).get("devices")
+    globals.queueCommands = queue.Queue()
+    globals.queueMessages = queue.Queue()
+    globals.people_count = threading.Semaphore(2)
+    globals.stop_threads = False
+    interface = ControlGPIO(**parse_devices_to_client(devices))
+    interface.initialize()
+    interface.persister.start()
+    threads = [
+        ApplyCommand(interface),
+        ReceiveMessage(connection),
+        SendMessage(connection),
+    ]
+    for thread in threads:
+        thread.start()
+    return interface, threads
+
+
+def receive_response(central, decoder):
+    while True:
+        for message in decoder.feed(central.recv(RECV_SIZE)):
+            if message.get("type") == "response":
+                return message
+
+
+def time_apply_commands(interface, calls) -> float:
+    # ControlGPIO alone, without the socket and the threads. The "all"
+    # command has no single device value to report, so it is left out.
+    commands = [command for command in COMMANDS if "all" not in command]
+    start = time.perf_counter()
+    for number in range(calls):
+        interface.apply_commands(commands[number % len(commands)])
+    return (time.perf_counter() - start) / calls
+
+
+def run(commands=200, direct_calls=20000):
+    # The client's per-command prints stay out of the results
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with tempfile.TemporaryDirectory() as directory, quiet:
+        os.makedirs(os.path.join(directory, "client"))
+        os.chdir(directory)
+        central, room = socket.socketpair()
+        interface, threads = start_client(room)
+        decoder = FrameDecoder()
+        latencies = []
+        for request_id in range(commands):
+            data = COMMANDS[request_id % len(COMMANDS)]
+            start = time.perf_counter()
+            central.sendall(
+                encode_frame({"type": "post", "id": request_id, "data": data})
+            )
+            response = receive_response(central, decoder)
+            latencies.append(time.perf_counter() - start)
+            assert response["id"] == request_id, response
+        apply_commands = time_apply_commands(interface, direct_calls)
+        globals.stop_threads = True
+        room.shutdown(socket.SHUT_RDWR)
+        for thread in threads:
+            thread.join()
+        interface.persister.stop()
+        central.close()
+        room.close()
+    latencies.sort()
+    return {
+        "commands": commands,
+        "mean_ms": round(1000 * statistics.mean(latencies), 3),
+        "p50_ms": round(1000 * latencies[len(latencies) // 2], 3),
+        "p99_ms": round(1000 * latencies[int(len(latencies) * 0.99)], 3),
+        "max_ms": round(1000 * latencies[-1], 3),
+        "apply_commands_us": round(1e6 * apply_commands, 2),
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<18} {value}")
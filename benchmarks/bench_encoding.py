@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from protocol import BinaryCodec, FrameDecoder, encode_frame  # noqa: E402
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "client", "config.json")
+
+MESSAGES = {
+    "dht22_push": {
+        "type": "push",
+        "message": "ok",
+        "seq": 1042,
+        "data": {
+            "temperature_humidity_sensor": {
+                "temperature": 23.4,
+                "humidity": 61.2,
+            }
+        },
+    },
+    "contacts_push": {
+        "type": "push",
+        "message": "ok",
+        "seq": 1043,
+        "data": {"presence_sensor": 1, "window_sensor": 0, "people_count": 7},
+    },
+    "command": {
+        "type": "post",
+        "id": 88,
+        "data": {"lamp1": 1, "lamp2": 1, "multimedia_projector": 0},
+    },
+    "response": {
+        "type": "response",
+        "id": 88,
+        "data": {"lamp1": 1, "lamp2": 1, "multimedia_projector": 0},
+        "message": "Command applied",
+        "status": "accepted",
+    },
+}
+
+
+def get_codec() -> BinaryCodec:
+    # The ids the central hands out for the devices of client/config.json
+    with open(CONFIG, "r") as file:
+        devices = json.load(file).get("devices")
+    return BinaryCodec(list(devices) + ["people_count", "alarm_system"])
+
+
+def time_encode(message, codec, count) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        encode_frame(message, codec)
+    return time.perf_counter() - start
+
+
+def time_decode(message, codec, count) -> float:
+    decoder = FrameDecoder(codec=codec)
+    stream = encode_frame(message, codec) * count
+    start = time.perf_counter()
+    decoded = decoder.feed(stream)
+    elapsed = time.perf_counter() - start
+    assert len(decoded) == count and decoded[0] == message
+    return elapsed
+
+
+def bench_message(message, codec, count, repeat):
+    result = {}
+    for name, used in (("json", None), ("binary", codec)):
+        encode = min(time_encode(message, used, count) for _ in range(repeat))
+        decode = min(time_decode(message, used, count) for _ in range(repeat))
+        result[f"{name}_bytes"] = len(encode_frame(message, used))
+        result[f"{name}_encode_us"] = round(1e6 * encode / count, 2)
+        result[f"{name}_decode_us"] = round(1e6 * decode / count, 2)
+    return result
+
+
+def run(count=20000, repeat=5):
+    codec = get_codec()
+    return {
+        name: bench_message(message, codec, count, repeat)
+        for name, message in MESSAGES.items()
+    }
+
+
+if __name__ == "__main__":
+    for part, result in run().items():
+        print(part)
+        for name, value in result.items():
+            print(f"  {name:<18} {value}")
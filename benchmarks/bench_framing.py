@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from protocol import FrameDecoder, encode_frame  # noqa: E402
+
+PUSH = {
+    "type": "push",
+    "message": "ok",
+    "data": {
+        "temperature_humidity_sensor": {"temperature": 23.4, "humidity": 61},
+        "people_count": 12,
+        "presence_sensor": 1,
+    },
+}
+
+
+def bench_encode(count):
+    start = time.perf_counter()
+    for _ in range(count):
+        encode_frame(PUSH)
+    return count / (time.perf_counter() - start)
+
+
+def bench_decode(count, chunk_size):
+    stream = encode_frame(PUSH) * count
+    chunks = [
+        stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size)
+    ]
+    decoder = FrameDecoder()
+    decoded = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        decoded += len(decoder.feed(chunk))
+    elapsed = time.perf_counter() - start
+    assert decoded == count and not decoder.pending()
+    return count / elapsed
+
+
+def bench_unframed(count):
+    # What the old single recv + json.loads path costs when every push
+    # happens to arrive alone on the socket
+    payload = json.dumps(PUSH).encode("utf-8")
+    start = time.perf_counter()
+    for _ in range(count):
+        json.loads(payload.decode("utf-8"))
+    return count / (time.perf_counter() - start)
+
+
+def run(count=200_000):
+    results = {
+        "encode": bench_encode(count),
+        "unframed_json_loads": bench_unframed(count),
+    }
+    # 7 bytes splits every frame, 4096 merges dozens of frames per read
+    for chunk_size in (7, 64, 4096, 65536):
+        results[f"decode_chunk_{chunk_size}"] = bench_decode(
+            count, chunk_size
+        )
+    return {name: round(value) for name, value in results.items()}
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<24} {value:>12,} msg/s")
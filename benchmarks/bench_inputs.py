@@ -0,0 +1,138 @@
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+os.environ["FSE_GPIO"] = "fake"
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "client")
+sys.path.insert(0, CLIENT)
+
+import globals  # noqa: E402
+from connection import InputDispatcher  # noqa: E402
+from hardware import GPIO  # noqa: E402
+from interface import ControlGPIO  # noqa: E402
+from timers import TimerWheel  # noqa: E402
+from utils import parse_devices_to_client  # noqa: E402
+
+
+def create_interface():
+    with open(os.path.join(CLIENT, "config.json"), "r") as file:
+        devices = json.load(file).get("devices")
+    globals.queueMessages = queue.Queue()
+    globals.people_count = threading.Semaphore(2)
+    globals.stop_threads = False
+    globals.timers = TimerWheel()
+    globals.timers.start()
+    interface = ControlGPIO(**parse_devices_to_client(devices))
+    interface.initialize()
+    interface.persister.start()
+    return interface
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def bench_edges(interface, dispatcher, edges):
+    entry = interface.people_counting_sensor_entry.pin
+    exit_pin = interface.people_counting_sensor_exit.pin
+    # Pipeline capacity: no debounce, every edge becomes an event. The
+    # counters, since a contact is read once after it settles
+    for event in GPIO.events.values():
+        event[2] = 0
+    handled = dispatcher.events_handled
+    start = time.perf_counter()
+    for edge in range(edges):
+        GPIO.pulse(exit_pin if edge % 2 else entry)
+    wait_for(lambda: dispatcher.events_handled - handled >= edges)
+    elapsed = time.perf_counter() - start
+    return round((dispatcher.events_handled - handled) / elapsed)
+
+
+def bench_short_pulses(interface, dispatcher, pulses, width, spacing):
+    # The old SeeInputs thread looked at the counter every 50 ms
+    pin = interface.people_counting_sensor_entry.pin
+    seen_by_polling = [0]
+    stop = threading.Event()
+
+    def poll():
+        last = 0
+        while not stop.is_set():
+            level = GPIO.input(pin)
+            if level and not last:
+                seen_by_polling[0] += 1
+            last = level
+            time.sleep(0.05)
+
+    poller = threading.Thread(target=poll, daemon=True)
+    poller.start()
+    handled = dispatcher.events_handled
+    for _ in range(pulses):
+        GPIO.pulse(pin, width)
+        time.sleep(spacing)
+    wait_for(lambda: dispatcher.events_handled - handled >= pulses, 2)
+    stop.set()
+    poller.join()
+    return dispatcher.events_handled - handled, seen_by_polling[0]
+
+
+def idle_cpu(seconds, polling_threads=0):
+    stop = threading.Event()
+
+    def poll(interval):
+        while not stop.is_set():
+            GPIO.input(7)
+            time.sleep(interval)
+
+    threads = [
+        threading.Thread(
+            target=poll, args=(0.05 if number < 2 else 1,), daemon=True
+        )
+        for number in range(polling_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    start = time.process_time()
+    time.sleep(seconds)
+    used = time.process_time() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return round(100 * used / seconds, 3)
+
+
+def run(edges=4000, pulses=100):
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "client"))
+        os.chdir(directory)
+        interface = create_interface()
+        dispatcher = InputDispatcher(interface)
+        dispatcher.register()
+        dispatcher.start()
+        wait_for(dispatcher.events.empty)
+        caught, polled = bench_short_pulses(
+            interface, dispatcher, pulses, 0.002, 0.03
+        )
+        result = {
+            "short_pulses": pulses,
+            "caught_by_callbacks": caught,
+            "caught_by_50ms_polling": polled,
+            "idle_cpu_percent_dispatcher": idle_cpu(2),
+            "idle_cpu_percent_polling_threads": idle_cpu(2, 9),
+            "edges_per_s": bench_edges(interface, dispatcher, edges),
+        }
+        globals.stop_threads = True
+        dispatcher.join()
+        interface.persister.stop()
+        globals.timers.stop()
+    return result
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<34} {value}")
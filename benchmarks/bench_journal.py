@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from journal import Journal  # noqa: E402
+
+ACTION = "lamp1 on lamp2 on"
+
+
+def old_log_command(path):
+    # The previous CentralServer.log_command: open, append, close
+    log_message = f"Room 1, {ACTION}, {datetime.now().time()}\n"
+    with open(path, "a") as f:
+        f.write(log_message)
+
+
+def bench_old(path, events):
+    start = time.perf_counter()
+    for _ in range(events):
+        old_log_command(path)
+    return events / (time.perf_counter() - start)
+
+
+def bench_journal(path, events):
+    journal = Journal(path, max_buffer=events, max_bytes=1 << 30)
+    journal.start()
+    start = time.perf_counter()
+    for _ in range(events):
+        journal.write("Room 1", ACTION)
+    caller = time.perf_counter() - start
+    journal.stop()
+    total = time.perf_counter() - start
+    return {
+        "caller_events_per_s": round(events / caller),
+        "durable_events_per_s": round(events / total),
+        "flushes": journal.flushes,
+        "dropped": journal.dropped,
+    }
+
+
+def run(events=100_000):
+    with tempfile.TemporaryDirectory() as directory:
+        old = bench_old(os.path.join(directory, "old.csv"), events)
+        new = bench_journal(os.path.join(directory, "new.csv"), events)
+    return {"old_events_per_s": round(old), **new}
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<22} {value:>12,}")
@@ -0,0 +1,79 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from logquery import LogIndex, query  # noqa: E402
+
+ACTIONS = [
+    "lamp1 on",
+    "lamp2 of",
+    "alarm_bell on",
+    "buzzer on smoke_sensor on",
+    "air_conditioner on",
+]
+
+
+def write_log(path, lines):
+    date = datetime(2026, 1, 1)
+    random.seed(1)
+    with open(path, "w") as file:
+        file.write("place,action,date\n")
+        for _ in range(lines):
+            date += timedelta(seconds=1)
+            room = random.randint(0, 8)
+            place = "Central" if room == 0 else f"Room {room}"
+            timestamp = date.isoformat(sep=" ", timespec="milliseconds")
+            file.write(f"{place}, {random.choice(ACTIONS)}, {timestamp}\n")
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, round(time.perf_counter() - start, 4)
+
+
+def run(lines=1_000_000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "logs.csv")
+        write_log(path, lines)
+        _, build = timed(lambda: LogIndex(path).update())
+        hour, hour_time = timed(
+            lambda: sum(
+                1
+                for _ in query(
+                    path,
+                    room=3,
+                    since="2026-01-05 14:00:00.000",
+                    until="2026-01-05 15:00:00.000",
+                )
+            )
+        )
+        smoke, smoke_time = timed(
+            lambda: sum(
+                1
+                for _ in query(
+                    path,
+                    action="smoke_sensor",
+                    since="2026-01-06 00:00:00.000",
+                    until="2026-01-06 23:59:59.999",
+                )
+            )
+        )
+    return {
+        "lines": lines,
+        "index_build_s": build,
+        "room_hour_matches": hour,
+        "room_hour_s": hour_time,
+        "action_day_matches": smoke,
+        "action_day_s": smoke_time,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<20} {value}")
@@ -0,0 +1,150 @@
+import os
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("FSE_GPIO", "fake")
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "client")
+sys.path.insert(0, CLIENT)
+
+import globals  # noqa: E402
+from connection import SendMessage, push  # noqa: E402
+from outbox import DROP_NEWEST, DROP_OLDEST, Outbox  # noqa: E402
+from protocol import FrameDecoder, RECV_SIZE  # noqa: E402
+
+SIZE = 256 * 1024
+
+
+def reading(number) -> dict:
+    return {
+        "temperature_humidity_sensor": {
+            "temperature": 20 + number % 50 / 10,
+            "humidity": 50 + number % 30 / 10,
+        }
+    }
+
+
+def bench_fill(path, entries, policy):
+    outbox = Outbox(path, SIZE, policy)
+    start = time.perf_counter()
+    for number in range(entries):
+        outbox.append(reading(number))
+    elapsed = time.perf_counter() - start
+    kept = outbox.peek(len(outbox))
+    stats = outbox.get_stats()
+    outbox.close()
+    # Same file after a restart of the client
+    reopened = Outbox(path, SIZE, policy)
+    survived = len(reopened) == len(kept) and reopened.peek(1) == kept[:1]
+    last_seq = reopened.last_seq
+    reopened.close()
+    os.remove(path)
+    return {
+        "appended": entries,
+        "append_us": round(1e6 * elapsed / entries, 2),
+        "kept": stats["entries"],
+        "dropped": stats["dropped"],
+        "kept_seqs": f"{kept[0]['seq']}-{kept[-1]['seq']}",
+        "survived_restart": survived,
+        "last_seq_after_restart": last_seq,
+    }
+
+
+class Manager:
+    # Stands in for the ConnectionManager: down until `restore` is called
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.connection = None
+        self.decoder = None
+        self.reconnecting = False
+        self.up = threading.Event()
+
+    def restore(self, connection):
+        with self.condition:
+            self.connection = connection
+            self.decoder = FrameDecoder()
+        self.up.set()
+
+    def reconnect(self, connection, timeout=None):
+        if self.up.wait(timeout):
+            return self.connection, self.decoder
+        return None, None
+
+
+def receive(connection, frames):
+    decoder = FrameDecoder()
+    while True:
+        data = connection.recv(RECV_SIZE)
+        if not data:
+            break
+        frames.extend(decoder.feed(data))
+
+
+def bench_outage(path, seconds, rate):
+    # Pushes keep coming while the central is away; they are flushed to
+    # the outbox and uploaded once the connection comes back
+    globals.queueMessages = queue.Queue()
+    globals.stop_threads = False
+    outbox = Outbox(path, SIZE, DROP_OLDEST)
+    manager = Manager()
+    down, _ = socket.socketpair()
+    down.close()
+    sender = SendMessage(down, manager=manager, outbox=outbox)
+    sender.start()
+    count = int(seconds * rate)
+    for number in range(count):
+        push(reading(number))
+        time.sleep(1 / rate)
+    time.sleep(0.2)
+    spooled = len(outbox)
+    client, server = socket.socketpair()
+    frames = []
+    receiver = threading.Thread(target=receive, args=(server, frames))
+    receiver.start()
+    back_at = time.perf_counter()
+    manager.restore(client)
+    while len(outbox):
+        time.sleep(0.001)
+    upload = time.perf_counter() - back_at
+    globals.stop_threads = True
+    sender.join()
+    client.close()
+    receiver.join()
+    server.close()
+    outbox.close()
+    os.remove(path)
+    entries = [
+        entry
+        for frame in frames
+        if frame.get("type") == "backlog"
+        for entry in frame["data"]
+    ]
+    seqs = [entry["seq"] for entry in entries]
+    return {
+        "pushes_while_down": count,
+        "entries_spooled": spooled,
+        "backlog_frames": sum(f.get("type") == "backlog" for f in frames),
+        "backlog_entries": len(entries),
+        "seqs_in_order": seqs == sorted(set(seqs)),
+        "upload_ms": round(1000 * upload, 2),
+    }
+
+
+def run(entries=20000, seconds=3, rate=200):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "outbox.bin")
+        return {
+            "drop_oldest": bench_fill(path, entries, DROP_OLDEST),
+            "drop_newest": bench_fill(path, entries, DROP_NEWEST),
+            "outage": bench_outage(path, seconds, rate),
+        }
+
+
+if __name__ == "__main__":
+    for part, result in run().items():
+        print(part)
+        for name, value in result.items():
+            print(f"  {name:<24} {value}")
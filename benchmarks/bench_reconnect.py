@@ -0,0 +1,237 @@
+import json
+import os
+import queue
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# The central runs in a child process: server and client modules share
+# names and cannot be imported side by side
+CENTRAL = "--central" in sys.argv
+os.environ.setdefault("FSE_GPIO", "fake")
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLIENT = os.path.join(ROOT, "client")
+sys.path.insert(0, os.path.join(ROOT, "server" if CENTRAL else "client"))
+
+
+def central(port):
+    from engine import RoomServer
+    from models import Room
+
+    def report(event, room):
+        print(
+            json.dumps(
+                {
+                    "event": event,
+                    "room": room.name,
+                    "rooms": len(engine.rooms),
+                    "time": time.time(),
+                }
+            ),
+            flush=True,
+        )
+
+    sock = socket.create_server(("127.0.0.1", port))
+    engine = RoomServer(
+        sock,
+        Room,
+        on_room_connected=lambda room: report("connected", room),
+        on_room_reconnected=lambda room: report("reattached", room),
+    )
+    engine.start()
+    # Each line asks for the live value of a device of the room; runs
+    # until the benchmark closes stdin or kills it
+    for line in sys.stdin:
+        room = next(iter(engine.rooms.values()))
+        tag = line.strip()
+        value = room.__dict__[tag].get_value()
+        print(
+            json.dumps({"event": "state", "tag": tag, "value": value}),
+            flush=True,
+        )
+    engine.stop()
+
+
+class Central:
+    def __init__(self, port):
+        self.port = port
+        self.process = None
+        self.events = queue.Queue()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, __file__, "--central", str(self.port)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        threading.Thread(
+            target=self.read_events, args=(self.process,), daemon=True
+        ).start()
+        self.wait_listening()
+        return time.time()
+
+    def wait_listening(self):
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                return
+            except ConnectionRefusedError:
+                time.sleep(0.005)
+
+    def read_events(self, process):
+        for line in process.stdout:
+            self.events.put(json.loads(line))
+
+    def next_event(self, timeout=60):
+        return self.events.get(timeout=timeout)
+
+    def get_value(self, tag):
+        self.process.stdin.write(f"{tag}\n")
+        self.process.stdin.flush()
+        while True:
+            event = self.next_event()
+            if event["event"] == "state":
+                return event["value"]
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+
+def start_client(port):
+    import globals
+    from connection import (
+        ApplyCommand,
+        ConnectionManager,
+        ReceiveMessage,
+        SendMessage,
+    )
+    from interface import ControlGPIO
+    from outbox import Outbox
+    from timers import TimerWheel
+    from utils import parse_devices_to_client
+
+    with open(os.path.join(CLIENT, "config.json"), "r") as file:
+        config = json.load(file)
+    config.update(
+        server_ip="127.0.0.1",
+        server_port=port,
+        client_ip="127.0.0.1",
+        client_port=0,
+    )
+    globals.config = config
+    globals.queueCommands = queue.Queue()
+    globals.queueMessages = queue.Queue()
+    globals.people_count = threading.Semaphore(2)
+    globals.timers = TimerWheel()
+    globals.stop_threads = False
+    interface = ControlGPIO(**parse_devices_to_client(config["devices"]))
+    interface.initialize()
+    outbox = Outbox(os.path.join("client", "outbox.bin"))
+    manager = ConnectionManager(
+        interface.get_snapshot, last_seq=lambda: outbox.last_seq
+    )
+    connection, decoder = manager.connect()
+    threads = [
+        ApplyCommand(interface),
+        ReceiveMessage(connection, decoder, manager),
+        SendMessage(connection, manager=manager, outbox=outbox),
+    ]
+    for thread in threads:
+        thread.start()
+    return manager, threads
+
+
+def stop_client(manager, threads):
+    import globals
+
+    globals.stop_threads = True
+    manager.close()
+    for thread in threads:
+        thread.join()
+
+
+def push_after_restart(central_server, manager, timeout=5) -> float:
+    # The reader sees the restart and reconnects first. The sender only
+    # learns of it on its next push, which must still reach live state
+    from connection import push
+
+    reconnections = manager.reconnections
+    central_server.kill()
+    central_server.start()
+    central_server.next_event()
+    while manager.reconnections == reconnections:
+        time.sleep(0.01)
+    start = time.monotonic()
+    push({"door_sensor": 1})
+    while central_server.get_value("door_sensor") != 1:
+        if time.monotonic() - start > timeout:
+            raise RuntimeError("door_sensor never reached the central")
+        time.sleep(0.01)
+    return time.monotonic() - start
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(restarts=5, downtime=1.0):
+    port = get_free_port()
+    central_server = Central(port)
+    central_server.start()
+    quiet = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, quiet
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "client"))
+        os.chdir(directory)
+        manager, threads = start_client(port)
+        try:
+            central_server.next_event()
+            after_restart = []
+            for restart in range(restarts):
+                central_server.kill()
+                time.sleep(downtime)
+                up_at = central_server.start()
+                event = central_server.next_event()
+                after_restart.append(event["time"] - up_at)
+                # The central sees the register before the room sees the
+                # greeting; killing it in between would merge two outages
+                while len(manager.recovery_times) <= restart:
+                    time.sleep(0.01)
+            push_s = push_after_restart(central_server, manager)
+            # The room drops its own connection; the central keeps running
+            manager.connection.shutdown(socket.SHUT_RDWR)
+            event = central_server.next_event()
+        finally:
+            # The client threads would keep a failed run from exiting
+            stop_client(manager, threads)
+            sys.stdout = stdout
+            quiet.close()
+            central_server.process.stdin.close()
+            central_server.process.wait()
+    return {
+        "central_restarts": restarts,
+        "central_downtime_s": downtime,
+        "outage_mean_s": round(statistics.mean(manager.recovery_times), 3),
+        "outage_max_s": round(max(manager.recovery_times), 3),
+        "after_restart_mean_s": round(statistics.mean(after_restart), 3),
+        "after_restart_max_s": round(max(after_restart), 3),
+        "push_after_restart_ms": round(push_s * 1000, 3),
+        "room_drop_event": event["event"],
+        "rooms_after_room_drop": event["rooms"],
+    }
+
+
+if __name__ == "__main__":
+    if CENTRAL:
+        central(int(sys.argv[2]))
+    else:
+        for name, value in run().items():
+            print(f"{name:<22} {value}")
@@ -0,0 +1,150 @@
+import json
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("FSE_GPIO", "fake")
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "client")
+sys.path.insert(0, CLIENT)
+
+import globals  # noqa: E402
+from connection import InputDispatcher  # noqa: E402
+from hardware import GPIO  # noqa: E402
+from interface import ControlGPIO  # noqa: E402
+from reporting import Reporter  # noqa: E402
+from timers import TimerWheel  # noqa: E402
+from utils import parse_devices_to_client  # noqa: E402
+
+TAG = "temperature_humidity_sensor"
+# Simulated seconds per real second, applied to the sensor period and to
+# the policy intervals alike
+SPEEDUP = 1000
+
+
+def load_devices():
+    with open(os.path.join(CLIENT, "config.json"), "r") as file:
+        return json.load(file).get("devices")
+
+
+def count_pushes() -> int:
+    pushes = 0
+    while not globals.queueMessages.empty():
+        globals.queueMessages.get()
+        pushes += 1
+    return pushes
+
+
+def scaled(policy) -> dict:
+    policy = dict(policy)
+    for key in ("min_interval", "heartbeat"):
+        if policy.get(key):
+            policy[key] /= SPEEDUP
+    return policy
+
+
+def bench_dht22(hours):
+    # The sampler's median after each 2 s read: slow drift plus noise
+    policy = load_devices()[TAG]["report"]
+    reporter = Reporter({TAG: scaled(policy)})
+    random.seed(1)
+    temperature, humidity = 22.0, 60.0
+    samples = int(hours * 3600 / 2)
+    changes = 0
+    last = None
+    for _ in range(samples):
+        temperature += random.gauss(0, 0.05)
+        humidity += random.gauss(0, 0.2)
+        value = {
+            "temperature": round(temperature, 1),
+            "humidity": round(humidity, 1),
+        }
+        if value != last:
+            # Every change used to be pushed
+            changes += 1
+            last = value
+            reporter.report(TAG, value)
+        time.sleep(2 / SPEEDUP)
+    time.sleep(0.05)
+    globals.timers.cancel(f"heartbeat:{TAG}")
+    stats = reporter.get_stats()
+    return {
+        "simulated_hours": hours,
+        "changes": changes,
+        "pushes_with_policy": count_pushes(),
+        "heartbeats": stats["heartbeats"],
+        "suppressed": stats["suppressed"],
+    }
+
+
+def bounce(pin, level, bounces):
+    for _ in range(bounces):
+        GPIO.set_input(pin, level)
+        time.sleep(0.001)
+        GPIO.set_input(pin, not level)
+        time.sleep(0.001)
+    GPIO.set_input(pin, level)
+
+
+def bench_contacts(openings, bounces, debounce):
+    devices = load_devices()
+    if not debounce:
+        for device in devices.values():
+            device.get("report", {}).pop("debounce_ms", None)
+    interface = ControlGPIO(**parse_devices_to_client(devices))
+    interface.initialize()
+    dispatcher = InputDispatcher(interface)
+    dispatcher.register()
+    dispatcher.start()
+    pin = interface.window_sensor.pin
+    if not debounce:
+        for event in GPIO.events.values():
+            event[2] = 0
+    time.sleep(0.1)
+    count_pushes()
+    for _ in range(openings):
+        bounce(pin, 1, bounces)
+        time.sleep(0.1)
+        bounce(pin, 0, bounces)
+        time.sleep(0.1)
+    time.sleep(0.1)
+    pushes = count_pushes()
+    globals.stop_threads = True
+    dispatcher.join()
+    dispatcher.unregister()
+    GPIO.cleanup()
+    globals.stop_threads = False
+    return {
+        "changes": 2 * openings,
+        "pushes": pushes,
+        "level_matches": interface.window_sensor.get_value() == 0,
+        "suppressed": interface.reporter.get_stats()["suppressed"],
+    }
+
+
+def run(hours=24, openings=20, bounces=3):
+    globals.queueMessages = queue.Queue()
+    globals.people_count = threading.Semaphore(2)
+    globals.stop_threads = False
+    globals.timers = TimerWheel(tick=0.001)
+    globals.timers.start()
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "client"))
+        os.chdir(directory)
+        result = {
+            "dht22": bench_dht22(hours),
+            "window_no_debounce": bench_contacts(openings, bounces, False),
+            "window_debounced": bench_contacts(openings, bounces, True),
+        }
+    globals.timers.stop()
+    return result
+
+
+if __name__ == "__main__":
+    for part, result in run().items():
+        print(part)
+        for name, value in result.items():
+            print(f"  {name:<20} {value}")
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from engine import RoomServer  # noqa: E402
+from models import Room  # noqa: E402
+from protocol import FrameDecoder, encode_frame  # noqa: E402
+
+CLIENT_CONFIG = os.path.join(
+    os.path.dirname(__file__), "..", "client", "config.json"
+)
+
+
+def load_devices():
+    with open(CLIENT_CONFIG, "r") as file:
+        devices = json.load(file).get("devices")
+    parsed = {
+        tag: {
+            "tag": values.get("tag"),
+            "name": values.get("name"),
+            "kind": values.get("type"),
+        }
+        for tag, values in devices.items()
+        if not tag.startswith("people_counting_sensor")
+    }
+    parsed["people_count"] = {
+        "tag": "people_count",
+        "name": "Contagem de pessoas",
+        "kind": "input",
+    }
+    return parsed
+
+
+async def virtual_room(port, number, devices, rate, duration):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        encode_frame(
+            {
+                "type": "register",
+                "data": {"name": f"room_{number}", "devices": devices},
+            }
+        )
+    )
+    decoder = FrameDecoder()
+    while not decoder.feed(await reader.read(4096), limit=1):
+        pass
+    deadline = time.monotonic() + duration
+    count = 0
+    while time.monotonic() < deadline:
+        count += 1
+        writer.write(
+            encode_frame(
+                {
+                    "type": "push",
+                    "message": "ok",
+                    "data": {
+                        "people_count": count,
+                        "temperature_humidity_sensor": {
+                            "temperature": 20 + count % 10,
+                            "humidity": 50,
+                        },
+                    },
+                }
+            )
+        )
+        await writer.drain()
+        await asyncio.sleep(1 / rate)
+    writer.close()
+
+
+def simulate(port, rooms, rate, duration):
+    async def main():
+        devices = load_devices()
+        await asyncio.gather(
+            *[
+                virtual_room(port, number, devices, rate, duration)
+                for number in range(1, rooms + 1)
+            ]
+        )
+
+    asyncio.run(main())
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status", "r") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(rooms, rate, duration):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    updates = [0]
+
+    def on_room_connected(room):
+        room.on_change = lambda room: updates.__setitem__(0, updates[0] + 1)
+
+    engine = RoomServer(sock, Room, on_room_connected=on_room_connected)
+    engine.start()
+    rss_before = rss_kb()
+    client = multiprocessing.Process(
+        target=simulate, args=(engine.get_port(), rooms, rate, duration)
+    )
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    client.start()
+    client.join()
+    time.sleep(0.2)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    result = {
+        "rooms": rooms,
+        "connected": len(engine.rooms),
+        "threads": threading.active_count(),
+        "rss_kb": rss_kb(),
+        "rss_growth_kb": rss_kb() - rss_before,
+        "cpu_percent": round(100 * cpu / wall, 1),
+        "updates_per_s": round(updates[0] / wall),
+    }
+    engine.stop()
+    return result
+
+
+def run(room_counts=(10, 50, 100, 200, 400), rate=2, duration=3):
+    return [measure(rooms, rate, duration) for rooms in room_counts]
+
+
+if __name__ == "__main__":
+    header = (
+        "rooms",
+        "connected",
+        "threads",
+        "rss_kb",
+        "rss_growth_kb",
+        "cpu_percent",
+        "updates_per_s",
+    )
+    print(" ".join(f"{name:>14}" for name in header))
+    for result in run():
+        print(" ".join(f"{result[name]:>14}" for name in header))
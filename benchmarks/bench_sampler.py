@@ -0,0 +1,104 @@
+import os
+import queue
+import random
+import sys
+import threading
+
+os.environ.setdefault("FSE_GPIO", "fake")
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "client")
+sys.path.insert(0, CLIENT)
+
+import globals  # noqa: E402
+from interface import Device  # noqa: E402
+from reporting import Reporter  # noqa: E402
+from sampler import DHT22Sampler  # noqa: E402
+from timers import TimerWheel  # noqa: E402
+
+
+class Interface:
+    def __init__(self):
+        self.reporter = Reporter()
+
+    def save_state(self):
+        pass
+
+
+def create_sensor(failure_rate, spike_rate):
+    device = Device(
+        "Temperature sensor", 4, "temperature_humidity_sensor", "dth22"
+    )
+    device.sensor.failure_rate = failure_rate
+    device.sensor.spike_rate = spike_rate
+    return device
+
+
+def error(device, value) -> float:
+    return abs(value["temperature"] - device.sensor.temperature_value)
+
+
+def legacy(device, reads):
+    # SeeInputs: read inline, failures become zeros and are skipped
+    errors = []
+    failures = 0
+    for _ in range(reads):
+        try:
+            value = device.read_sensor()
+        except RuntimeError:
+            failures += 1
+            continue
+        errors.append(error(device, value))
+    return failures, errors
+
+
+def sampled(device, reads):
+    sampler = DHT22Sampler(device, Interface())
+    errors = []
+    for _ in range(reads):
+        published = sampler.published
+        sampler.sample()
+        if sampler.published != published:
+            errors.append(error(device, device.get_value()))
+    return sampler, errors
+
+
+def summary(errors) -> dict:
+    return {
+        "published": len(errors),
+        "published_off_by_5C": sum(1 for value in errors if value > 5),
+        "max_error_C": round(max(errors), 1),
+    }
+
+
+def run(reads=5000, failure_rate=0.3, spike_rate=0.05):
+    globals.queueMessages = queue.Queue()
+    globals.people_count = threading.Semaphore(2)
+    globals.stop_threads = False
+    globals.timers = TimerWheel()
+    random.seed(1)
+    failures, legacy_errors = legacy(
+        create_sensor(failure_rate, spike_rate), reads
+    )
+    sampler, sampler_errors = sampled(
+        create_sensor(failure_rate, spike_rate), reads
+    )
+    backoff = []
+    sampler.failures_in_row = 0
+    for _ in range(6):
+        sampler.failures_in_row += 1
+        backoff.append(sampler.get_delay())
+    return {
+        "reads": reads,
+        "failed_reads": failures,
+        "legacy": summary(legacy_errors),
+        "sampler": {
+            **summary(sampler_errors),
+            "failed_reads": sampler.failures,
+            "rejected": sampler.rejected,
+        },
+        "retry_delays_s": backoff,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<16} {value}")
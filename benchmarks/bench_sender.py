@@ -0,0 +1,111 @@
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+os.environ.setdefault("FSE_GPIO", "fake")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client"))
+
+import globals  # noqa: E402
+from connection import SendMessage, push  # noqa: E402
+from protocol import FrameDecoder, RECV_SIZE, send_message  # noqa: E402
+
+
+class LegacySender(threading.Thread):
+    # SendMessage before batching: one message, then half a second asleep
+    def __init__(self, client):
+        threading.Thread.__init__(self)
+        self.client = client
+        self.pushes_received = 0
+        self.frames_sent = 0
+
+    def run(self):
+        while not globals.stop_threads:
+            if not globals.queueMessages.empty():
+                send_message(self.client, globals.queueMessages.get())
+                self.pushes_received += 1
+                self.frames_sent += 1
+            time.sleep(0.5)
+
+
+class Receiver(threading.Thread):
+    def __init__(self, connection):
+        threading.Thread.__init__(self, daemon=True)
+        self.connection = connection
+        self.decoder = FrameDecoder()
+        self.values = {}
+
+    def run(self):
+        while True:
+            data = self.connection.recv(RECV_SIZE)
+            if not data:
+                break
+            for message in self.decoder.feed(data):
+                self.values.update(message.get("data"))
+
+
+def storm(rate, seconds):
+    # DHT22 and people counters firing as fast as the rate allows
+    last = {}
+    depths = []
+    burst = max(1, rate // 100)
+    sent = 0
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        for _ in range(burst):
+            sent += 1
+            if sent % 2:
+                tag, value = "people_count", sent
+            else:
+                tag = "temperature_humidity_sensor"
+                value = {"temperature": 20 + sent % 50 / 10, "humidity": 60}
+            last[tag] = value
+            push({tag: value})
+        depths.append(globals.queueMessages.qsize())
+        time.sleep(0.01)
+    return sent, last, depths
+
+
+def run_sender(sender_class, rate, seconds):
+    globals.queueMessages = queue.Queue()
+    globals.stop_threads = False
+    local, remote = socket.socketpair()
+    receiver = Receiver(remote)
+    receiver.start()
+    sender = sender_class(local)
+    sender.start()
+    sent, last, depths = storm(rate, seconds)
+    time.sleep(0.5)
+    left = globals.queueMessages.qsize()
+    globals.stop_threads = True
+    sender.join()
+    local.close()
+    receiver.join()
+    remote.close()
+    return {
+        "pushes_queued": sent,
+        "pushes_delivered_per_s": round(sender.pushes_received / seconds),
+        "frames_sent": sender.frames_sent,
+        "max_queue_depth": max(depths),
+        "queue_depth_after": left,
+        "latest_values_delivered": all(
+            receiver.values.get(key) == value for key, value in last.items()
+        ),
+    }
+
+
+def run(rate=2000, seconds=3):
+    return {
+        "legacy": run_sender(LegacySender, rate, seconds),
+        "batched": run_sender(SendMessage, rate, seconds),
+    }
+
+
+if __name__ == "__main__":
+    for sender, result in run().items():
+        print(sender)
+        for name, value in result.items():
+            print(f"  {name:<24} {value}")
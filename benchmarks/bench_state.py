@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("FSE_GPIO", "fake")
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "client")
+sys.path.insert(0, CLIENT)
+
+import globals  # noqa: E402
+from interface import STATE_FILE, ControlGPIO  # noqa: E402
+from utils import parse_devices_to_client  # noqa: E402
+
+
+def create_interface():
+    with open(os.path.join(CLIENT, "config.json"), "r") as file:
+        devices = json.load(file).get("devices")
+    globals.people_count = threading.Semaphore(2)
+    interface = ControlGPIO(**parse_devices_to_client(devices))
+    interface.initialize()
+    return interface
+
+
+def legacy_save(interface):
+    # save_state before the persister: every call rewrites the file
+    with open(STATE_FILE, "w") as file:
+        json.dump(interface.get_state_to_save(), file)
+
+
+def burst(save, threads, saves, spacing):
+    # Inputs, commands and the DHT22 all saving at the same time
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(saves):
+            start = time.perf_counter()
+            save()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+            time.sleep(spacing)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    latencies.sort()
+    return {
+        "save_calls": len(latencies),
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "caller_p99_us": round(1e6 * latencies[int(len(latencies) * 0.99)]),
+    }
+
+
+def run(threads=3, saves=300, spacing=0.005):
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "client"))
+        os.chdir(directory)
+        interface = create_interface()
+        legacy = burst(lambda: legacy_save(interface), threads, saves, spacing)
+        legacy["file_writes"] = legacy["save_calls"]
+        interface.persister.start()
+        persisted = burst(interface.save_state, threads, saves, spacing)
+        interface.persister.stop()
+        persisted["file_writes"] = interface.persister.writes
+        persisted["writes_saved"] = interface.persister.get_saved_writes()
+        with open(STATE_FILE, "r") as file:
+            persisted["state_is_valid_json"] = bool(json.load(file))
+    return {"legacy": legacy, "write_behind": persisted}
+
+
+if __name__ == "__main__":
+    for mode, result in run().items():
+        print(mode)
+        for name, value in result.items():
+            print(f"  {name:<20} {value}")
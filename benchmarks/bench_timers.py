@@ -0,0 +1,106 @@
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client"))
+
+from timers import TimerWheel  # noqa: E402
+
+
+def per_operation(function, keys) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        function(key)
+    return round(1e6 * (time.perf_counter() - start) / len(keys), 3)
+
+
+def bench_wheel(timers):
+    wheel = TimerWheel()
+    wheel.start()
+    lateness = []
+    done = threading.Event()
+
+    def action(deadline):
+        lateness.append(time.monotonic() - deadline)
+        if len(lateness) == timers:
+            done.set()
+
+    def schedule(key):
+        delay = random.uniform(0.5, 2.0)
+        deadline = time.monotonic() + delay
+        wheel.schedule(key, delay, lambda: action(deadline))
+
+    tracemalloc.start()
+    schedule_us = per_operation(schedule, range(timers))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    threads = threading.active_count()
+    # Half of them are cancelled and scheduled again with a new deadline
+    cancel_us = per_operation(wheel.cancel, range(0, timers, 2))
+    per_operation(schedule, range(0, timers, 2))
+    # Extending is timed on separate long timers so no deadline moves
+    extra = list(range(timers, 2 * timers))
+    for key in extra:
+        wheel.schedule(key, 60, lambda: None)
+    extend_us = per_operation(lambda key: wheel.extend(key, 60), extra)
+    for key in extra:
+        wheel.cancel(key)
+    done.wait(10)
+    wheel.stop()
+    lateness.sort()
+    return {
+        "timers": timers,
+        "threads": threads,
+        "bytes_per_timer": memory // timers,
+        "schedule_us": schedule_us,
+        "extend_us": extend_us,
+        "cancel_us": cancel_us,
+        "fired": len(lateness),
+        "late_p50_ms": round(1000 * lateness[len(lateness) // 2], 1),
+        "late_p99_ms": round(1000 * lateness[int(len(lateness) * 0.99)], 1),
+    }
+
+
+def bench_threading_timer(timers):
+    # One threading.Timer per pending deadline, as the lamp-off used to be
+    pending = []
+
+    def schedule(key):
+        timer = threading.Timer(60, lambda: None)
+        timer.daemon = True
+        timer.start()
+        pending.append(timer)
+
+    tracemalloc.start()
+    schedule_us = per_operation(schedule, range(timers))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    threads = threading.active_count()
+    cancel_us = per_operation(lambda key: pending[key].cancel(), range(timers))
+    for timer in pending:
+        timer.join()
+    return {
+        "timers": timers,
+        "threads": threads,
+        "bytes_per_timer": memory // timers,
+        "schedule_us": schedule_us,
+        "cancel_us": cancel_us,
+    }
+
+
+def run(timers=10000):
+    random.seed(1)
+    return {
+        "timer_wheel": bench_wheel(timers),
+        "threading_timer": bench_threading_timer(timers // 10),
+    }
+
+
+if __name__ == "__main__":
+    for kind, result in run().items():
+        print(kind)
+        for name, value in result.items():
+            print(f"  {name:<16} {value}")
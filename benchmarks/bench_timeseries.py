@@ -0,0 +1,42 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from models import HISTORY_SIZE, TREND_WINDOWS  # noqa: E402
+from timeseries import RingBuffer  # noqa: E402
+
+
+def run(samples=500_000):
+    random.seed(1)
+    values = [random.uniform(15, 35) for _ in range(samples)]
+    tracemalloc.start()
+    buffer = RingBuffer(HISTORY_SIZE, TREND_WINDOWS.values())
+    for value in values[:HISTORY_SIZE]:
+        buffer.append(value)
+    warm, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for value in values:
+        buffer.append(value)
+    elapsed = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(10_000):
+        for window in TREND_WINDOWS.values():
+            buffer.stats(window)
+    stats_elapsed = time.perf_counter() - start
+    return {
+        "appends_per_s": round(samples / elapsed),
+        "stats_reads_per_s": round(30_000 / stats_elapsed),
+        "array_bytes": buffer.nbytes(),
+        "memory_growth_bytes": after - warm,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<20} {value:>12,}")
@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from tsstore import DAY, TelemetryStore  # noqa: E402
+
+SERIES = [
+    f"room_{room}/{metric}"
+    for room in range(1, 5)
+    for metric in ("temperature", "humidity", "people_count", "lamp1")
+]
+
+
+def directory_size(path) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def run(days=7, period=10):
+    random.seed(1)
+    start = 1_700_000_000 - 1_700_000_000 % DAY
+    samples = days * DAY // period
+    with tempfile.TemporaryDirectory() as root:
+        store = TelemetryStore(root)
+        begin = time.perf_counter()
+        for sample in range(samples):
+            timestamp = start + sample * period
+            temperature = 22 + 3 * ((sample // 360) % 4) / 4
+            for series in SERIES:
+                if series.endswith("temperature"):
+                    value = round(temperature + random.random() / 10, 1)
+                elif series.endswith("humidity"):
+                    value = 60
+                elif series.endswith("people_count"):
+                    value = (sample // 90) % 12
+                else:
+                    value = (sample // 180) % 2
+                store.record(series, value, timestamp)
+            if sample % 500 == 0:
+                store.flush()
+        store.close_buckets()
+        store.flush()
+        ingest = time.perf_counter() - begin
+        records = samples * len(SERIES)
+        middle = start + days * DAY // 2
+        begin = time.perf_counter()
+        hour = store.query("room_2/temperature", middle, middle + 3600)
+        hour_time = time.perf_counter() - begin
+        begin = time.perf_counter()
+        day = store.query("room_2/temperature", middle, middle + DAY, "1m")
+        day_time = time.perf_counter() - begin
+        begin = time.perf_counter()
+        week = store.query("room_2/temperature", start, start + 7 * DAY, "1h")
+        week_time = time.perf_counter() - begin
+        disk = directory_size(root)
+        removed = store.apply_retention(now=start + 10 * DAY)
+    return {
+        "records": records,
+        "ingest_per_s": round(records / ingest),
+        "disk_bytes": disk,
+        "bytes_per_record": round(disk / records, 2),
+        "raw_hour_points": len(hour),
+        "raw_hour_ms": round(hour_time * 1000, 2),
+        "minute_day_points": len(day),
+        "minute_day_ms": round(day_time * 1000, 2),
+        "hour_week_points": len(week),
+        "hour_week_ms": round(week_time * 1000, 2),
+        "chunks_removed_by_retention": removed,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<28} {value}")
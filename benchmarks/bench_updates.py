@@ -0,0 +1,110 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from engine import RoomServer  # noqa: E402
+from models import Room  # noqa: E402
+from protocol import FrameDecoder, encode_frame, send_message  # noqa: E402
+from stats import LatencyStats  # noqa: E402
+
+DEVICES = {
+    "people_count": {
+        "tag": "people_count",
+        "name": "Contagem de pessoas",
+        "kind": "input",
+    },
+}
+
+
+def push(count):
+    return encode_frame(
+        {"type": "push", "message": "ok", "data": {"people_count": count}}
+    )
+
+
+def run(pushes=300, interval=0.005, bursts=50, burst_size=20):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    rooms = []
+    sent_at = {}
+    latency = LatencyStats(size=pushes)
+    redraws = [0]
+    applied = threading.Event()
+    expected = [0]
+
+    def on_change(room):
+        now = time.perf_counter()
+        value = room.people_count.get_value()
+        redraws[0] += 1
+        if value in sent_at:
+            latency.record(now - sent_at.pop(value))
+        if value == expected[0]:
+            applied.set()
+
+    def on_room_connected(room):
+        room.on_change = on_change
+        rooms.append(room)
+
+    engine = RoomServer(sock, Room, on_room_connected=on_room_connected)
+    engine.start()
+    client = socket.create_connection(("127.0.0.1", engine.get_port()))
+    send_message(
+        client,
+        {"type": "register", "data": {"name": "room_1", "devices": DEVICES}},
+    )
+    decoder = FrameDecoder()
+    while not decoder.feed(client.recv(4096)):
+        pass
+
+    # One push at a time: time from the write on the room socket until the
+    # central state changed and the redraw hook ran
+    for count in range(1, pushes + 1):
+        expected[0] = count
+        applied.clear()
+        sent_at[count] = time.perf_counter()
+        client.sendall(push(count))
+        applied.wait(1)
+        time.sleep(interval)
+
+    # Bursts: every push of a burst arrives in the same read
+    redraws[0] = 0
+    changes_before = rooms[0].updates_applied
+    base = pushes
+    for _ in range(bursts):
+        applied.clear()
+        expected[0] = base + burst_size
+        client.sendall(
+            b"".join(push(base + i) for i in range(1, burst_size + 1))
+        )
+        applied.wait(1)
+        base += burst_size
+    time.sleep(0.05)
+    result = {
+        "push_to_state": latency.summary(),
+        "room_side": rooms[0].update_latency.summary(),
+        "burst_pushes": bursts * burst_size,
+        "burst_state_changes": rooms[0].updates_applied - changes_before,
+        "burst_redraws": redraws[0],
+    }
+    client.close()
+    engine.stop()
+    return result
+
+
+if __name__ == "__main__":
+    result = run()
+    print("push -> state change (socket write to redraw hook):")
+    for name, value in result["push_to_state"].items():
+        print(f"  {name:<10} {value}")
+    print("frame read -> state applied inside the room:")
+    for name, value in result["room_side"].items():
+        print(f"  {name:<10} {value}")
+    print(
+        f"{result['burst_pushes']} pushes sent in bursts -> "
+        f"{result['burst_state_changes']} state changes, "
+        f"{result['burst_redraws']} redraws"
+    )
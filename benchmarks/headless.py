@@ -0,0 +1,71 @@
+import curses
+import fcntl
+import multiprocessing
+import os
+import pty
+import struct
+import sys
+import termios
+
+# Real curses on a pseudo-terminal nobody looks at: the central draws
+# exactly as it does on screen, and what it writes is read and dropped.
+# The reader is a child process: doupdate keeps the GIL while it writes,
+# so a reader thread could never empty a full pseudo-terminal.
+
+
+def drain(master, written):
+    while True:
+        try:
+            data = os.read(master, 65536)
+        except OSError:
+            return
+        if not data:
+            return
+        written.value += len(data)
+
+
+class HeadlessScreen:
+    def __init__(self, rows=48, cols=160):
+        self.rows = rows
+        self.cols = cols
+        self.master = None
+        self.stdout = None
+        self.counter = None
+        self.process = None
+
+    def open(self):
+        self.master, slave = pty.openpty()
+        fcntl.ioctl(
+            slave,
+            termios.TIOCSWINSZ,
+            struct.pack("HHHH", self.rows, self.cols, 0, 0),
+        )
+        self.counter = multiprocessing.Value("q", 0, lock=False)
+        self.process = multiprocessing.Process(
+            target=drain, args=(self.master, self.counter), daemon=True
+        )
+        self.process.start()
+        # curses draws on stdout; the real one comes back in close()
+        sys.stdout.flush()
+        self.stdout = os.dup(1)
+        os.dup2(slave, 1)
+        os.close(slave)
+        os.environ.setdefault("TERM", "xterm-256color")
+        os.environ["LINES"] = str(self.rows)
+        os.environ["COLUMNS"] = str(self.cols)
+        stdscr = curses.initscr()
+        curses.noecho()
+        return stdscr
+
+    @property
+    def written(self) -> int:
+        return self.counter.value
+
+    def close(self):
+        curses.endwin()
+        sys.stdout.flush()
+        os.dup2(self.stdout, 1)
+        os.close(self.stdout)
+        os.close(self.master)
+        self.process.terminate()
+        self.process.join()
@@ -0,0 +1,219 @@
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+RESULTS = os.path.join(BENCHMARKS, "results")
+TIMEOUT = 600
+# A metric that moved more than this against its direction is a regression
+THRESHOLD = 0.2
+# Suffixes of the metrics where lower is better and higher is better;
+# the other metrics are shown but never counted as regressions
+LOWER_IS_BETTER = ("_ms", "_us", "_s", "_kb", "_kb_per_call", "_bytes")
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def list_benchmarks() -> list[str]:
+    return sorted(
+        os.path.basename(path)[len("bench_") : -len(".py")]
+        for path in glob.glob(os.path.join(BENCHMARKS, "bench_*.py"))
+    )
+
+
+def run_child(name, output):
+    # Runs in its own process: server and client modules share names and
+    # every benchmark sets up its own globals
+    # A fake room or server thread that dies would otherwise only print its
+    # traceback and leave the numbers of a broken run
+    failed = []
+
+    def excepthook(args):
+        failed.append(args.thread.name if args.thread else "unknown")
+        default_excepthook(args)
+
+    default_excepthook = threading.excepthook
+    threading.excepthook = excepthook
+    sys.path.insert(0, BENCHMARKS)
+    module = importlib.import_module(f"bench_{name}")
+    result = module.run()
+    if failed:
+        raise RuntimeError(f"threads raised: {', '.join(failed)}")
+    negative = [
+        metric
+        for metric, value in flatten(result).items()
+        if value < 0 and metric.endswith(LOWER_IS_BETTER)
+    ]
+    if negative:
+        raise ValueError(f"negative metrics: {', '.join(negative)}")
+    with open(output, "w") as file:
+        json.dump(result, file, default=str)
+
+
+def run_benchmark(name, timeout=TIMEOUT) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "result.json")
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(
+                [sys.executable, __file__, "--child", name, output],
+                cwd=ROOT,
+                env=dict(os.environ, FSE_GPIO="fake"),
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return {"error": f"timed out after {timeout}s"}
+        elapsed = round(time.perf_counter() - start, 2)
+        if process.returncode != 0 or not os.path.exists(output):
+            lines = process.stderr.strip().splitlines()
+            return {"error": lines[-1] if lines else "no result"}
+        with open(output, "r") as file:
+            return {"elapsed_s": elapsed, "result": json.load(file)}
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def flatten(value, prefix="") -> dict:
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return {}
+        return {prefix: value}
+    metrics = {}
+    for key, item in items:
+        metrics.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+    return metrics
+
+
+def get_direction(metric) -> int:
+    # 1 when higher is better, -1 when lower is better, 0 when unknown
+    name = metric.rsplit(".", 1)[-1]
+    if name.startswith("max"):
+        # A single worst sample is too noisy to fail a run on
+        return 0
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold=THRESHOLD) -> list[tuple]:
+    old = {}
+    new = {}
+    for name, entry in baseline.get("benchmarks", {}).items():
+        old.update(flatten(entry.get("result"), name))
+    for name, entry in current.get("benchmarks", {}).items():
+        new.update(flatten(entry.get("result"), name))
+    rows = []
+    for metric, value in new.items():
+        before = old.get(metric)
+        if not before or metric.endswith("elapsed_s"):
+            continue
+        change = (value - before) / abs(before)
+        if abs(change) <= threshold:
+            continue
+        direction = get_direction(metric)
+        regression = direction != 0 and change * direction < 0
+        rows.append((metric, before, value, change, regression))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the benchmarks and save the results as JSON"
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help=f"default: all of {', '.join(list_benchmarks())}",
+    )
+    parser.add_argument("--output", help="default: benchmarks/results/")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--timeout", type=int, default=TIMEOUT)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        return
+
+    names = args.names or list_benchmarks()
+    unknown = set(names) - set(list_benchmarks())
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    commit = get_commit()
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "benchmarks": {},
+    }
+    for name in names:
+        print(f"{name:<12} ", end="", flush=True)
+        entry = run_benchmark(name, args.timeout)
+        report["benchmarks"][name] = entry
+        print(entry.get("error") or f"{entry['elapsed_s']}s")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS, f"{stamp}-{commit or 'nocommit'}.json")
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output}")
+
+    failed = [
+        name
+        for name, entry in report["benchmarks"].items()
+        if "error" in entry
+    ]
+    regressions = []
+    if args.compare:
+        with open(args.compare, "r") as file:
+            rows = compare(json.load(file), report, args.threshold)
+        for metric, before, value, change, regression in rows:
+            mark = "REGRESSION" if regression else ""
+            print(
+                f"{metric:<56} {before:>12} -> {value:<12} "
+                f"{change:+.0%} {mark}"
+            )
+        regressions = [row for row in rows if row[-1]]
+        print(
+            f"{len(rows)} metrics changed more than {args.threshold:.0%}, "
+            f"{len(regressions)} regressions"
+        )
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
-import RPi.GPIO as GPIO
 import time
 
 
 import globals
+from hardware import GPIO
 from interface import ControlGPIO
-from connection import SendMessage, ReceiveMessage, ApplyCommand, SeeInputs
-from utils import parse_devices_to_client, createConection
+from connection import (
+    ApplyCommand,
+    ConnectionManager,
+    InputDispatcher,
+    ReceiveMessage,
+    SendMessage,
+)
+from outbox import Outbox
+from sampler import DHT22Sampler
+from utils import parse_devices_to_client
 
 
 def main():
@@ -13,34 +21,55 @@ def main():
         print("Starting client")
         globals.initialize()
 
-        name = globals.config.get("name")
         devices = globals.config.get("devices")
 
         interface = ControlGPIO(**parse_devices_to_client(devices))
         interface.initialize()
         interface.load_state()
-        state = interface.get_state()
-        state["name"] = name
-        globals.queueMessages.put(state)
+        interface.persister.start()
+        globals.timers.start()
 
-        connection = createConection()
+        # Pushes flushed while the central is unreachable are kept here
+        outbox = Outbox(**globals.config.get("outbox", {}))
+
+        # Every (re)connect registers and sends the full state
+        manager = ConnectionManager(
+            interface.get_snapshot, last_seq=lambda: outbox.last_seq
+        )
+        connection, decoder = manager.connect()
 
         inputs_devices = interface.get_inputs_devices()
         interface.print_all_devices()
         print(inputs_devices)
+        dispatcher = InputDispatcher(interface)
+        dispatcher.register()
+        dispatcher.start()
         for device in inputs_devices:
-            SeeInputs(device, interface).start()
+            if device.kind == "dth22":
+                DHT22Sampler(device, interface).start()
 
-            ApplyCommand(interface).start()
+        # A single reader and writer per socket keeps the frames in order
+        ApplyCommand(interface).start()
 
-            ReceiveMessage(connection).start()
+        ReceiveMessage(connection, decoder, manager).start()
 
-            SendMessage(connection).start()
+        SendMessage(
+            connection, manager=manager, outbox=outbox, codec=decoder.codec
+        ).start()
+        while not globals.stop_threads:
+            time.sleep(1)
     except KeyboardInterrupt:
         globals.stop_threads = True
         time.sleep(1)
+        globals.timers.stop()
+        interface.persister.stop()
+        print(f"State writes saved: {interface.persister.get_saved_writes()}")
+        print(f"Sensor reports: {interface.reporter.get_stats()}")
+        print(f"Reconnections: {manager.reconnections}")
+        print(f"Outbox: {outbox.get_stats()}")
+        outbox.close()
         GPIO.cleanup()
-        connection.close()
+        manager.close()
         print("Client stopped")
 
 
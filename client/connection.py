@@ -1,23 +1,147 @@
-import json
+import queue
+import random
+import socket
 import threading
 import time
 import globals
+from hardware import GPIO
+from protocol import FrameDecoder, FrameError, RECV_SIZE, encode_frame
+from utils import createConection
+
+# Reconnect backoff: a random delay up to BASE * 2^attempt, capped
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+
+
+class ConnectionManager:
+    # Owns the socket to the central. The reader and the sender report a
+    # lost connection here; the first report starts a reconnect with
+    # jittered exponential backoff in the background and both wait for
+    # its result. Every connect registers again and sends a full state
+    # snapshot along with the last push sequence number.
+    def __init__(
+        self,
+        snapshot=None,
+        base_delay=RECONNECT_BASE_DELAY,
+        max_delay=RECONNECT_MAX_DELAY,
+        last_seq=None,
+    ):
+        self.snapshot = snapshot
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.last_seq = last_seq
+        self.condition = threading.Condition()
+        self.connection = None
+        self.decoder = None
+        self.reconnecting = False
+        self.reconnections = 0
+        self.recovery_times = []
+
+    def get_delay(self, attempt) -> float:
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(0, delay)
+
+    def connect(self):
+        print("Waiting for connection...")
+        attempt = 0
+        while not globals.stop_threads:
+            snapshot = self.snapshot() if self.snapshot else None
+            seq = self.last_seq() if self.last_seq else None
+            try:
+                connection, decoder = createConection(snapshot, seq)
+            except OSError as e:
+                delay = self.get_delay(attempt)
+                print(f"Connection failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            with self.condition:
+                self.connection = connection
+                self.decoder = decoder
+                self.reconnecting = False
+                self.condition.notify_all()
+            return connection, decoder
+        with self.condition:
+            self.reconnecting = False
+            self.condition.notify_all()
+        return None, None
+
+    def reconnect(self, connection, timeout=None):
+        # Returns the connection that replaced `connection`, or None when
+        # the client stops or `timeout` runs out first
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            if self.connection is connection and not self.reconnecting:
+                self.reconnecting = True
+                threading.Thread(
+                    target=self.recover, args=(connection,), daemon=True
+                ).start()
+            while self.connection is connection or self.reconnecting:
+                if globals.stop_threads:
+                    return None, None
+                wait = 0.5
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return None, None
+                self.condition.wait(wait)
+            return self.connection, self.decoder
+
+    def recover(self, connection):
+        lost_at = time.monotonic()
+        try:
+            # Wakes up the other thread if it is blocked on this socket
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        connection.close()
+        if self.connect()[0] is not None:
+            self.reconnections += 1
+            self.recovery_times.append(time.monotonic() - lost_at)
+
+    def close(self):
+        with self.condition:
+            connection = self.connection
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
 
 
 class ReceiveMessage(threading.Thread):
-    def __init__(self, client):
+    def __init__(self, client, decoder=None, manager=None):
         threading.Thread.__init__(self)
         self.client = client
+        self.decoder = decoder or FrameDecoder()
+        self.manager = manager
 
     def run(self):
+        # Frames left over from the register handshake come first
+        messages = self.decoder.feed(b"")
         while True:
             if globals.stop_threads:
                 break
-            in_data = self.client.recv(1024)
-            if in_data:
-                print("From Server :", in_data.decode("utf-8"))
-                globals.queueCommands.put(json.loads(in_data.decode("utf-8")))
-            time.sleep(0.5)
+            for message in messages:
+                print("From Server :", message)
+                globals.queueCommands.put(message)
+            messages = []
+            try:
+                in_data = self.client.recv(RECV_SIZE)
+                if not in_data:
+                    raise ConnectionError("Server closed the connection")
+                messages = self.decoder.feed(in_data)
+            except (OSError, FrameError) as e:
+                print(f"Error receiving from server: {e}")
+                if self.manager is None or globals.stop_threads:
+                    break
+                self.client, self.decoder = self.manager.reconnect(
+                    self.client
+                )
+                if self.client is None:
+                    break
+                messages = self.decoder.feed(b"")
 
 
 class ApplyCommand(threading.Thread):
@@ -29,194 +153,351 @@ class ApplyCommand(threading.Thread):
         while True:
             if globals.stop_threads:
                 break
-            if not globals.queueCommands.empty():
-                command = globals.queueCommands.get().get("data")
-                try:
-                    devices_updates = self.interface.apply_commands(command)
-                except Exception as e:
-                    globals.queueMessages.put(
-                        {
-                            "type": "response",
-                            "data": {},
-                            "message": str(e),
-                            "status": "error",
-                        }
-                    )
-                else:
-                    globals.queueMessages.put(
-                        {
-                            "type": "response",
-                            "data": devices_updates,
-                            "message": "Command applied",
-                            "status": "accepted",
-                        }
-                    )
-                self.interface.save_state()
-            time.sleep(0.5)
-
-
-class SeeInputs(threading.Thread):
-    def __init__(self, device, interface):
+            try:
+                message = globals.queueCommands.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.handle_command(message)
+
+    def handle_command(self, message):
+        command = message.get("data")
+        try:
+            devices_updates = self.interface.apply_commands(command)
+        except Exception as e:
+            globals.queueMessages.put(
+                {
+                    "type": "response",
+                    "id": message.get("id"),
+                    "data": {},
+                    "message": str(e),
+                    "status": "error",
+                }
+            )
+        else:
+            globals.queueMessages.put(
+                {
+                    "type": "response",
+                    "id": message.get("id"),
+                    "data": devices_updates,
+                    "message": "Command applied",
+                    "status": "accepted",
+                }
+            )
+        # The response is already on its way when the state hits the disk
+        self.interface.save_state()
+
+
+# Sign applied to the people count by each counting sensor
+PEOPLE_COUNTERS = {
+    "people_counting_sensor_entry": 1,
+    "people_counting_sensor_exit": -1,
+}
+# Debounce (ms) handed to GPIO edge detection, unless the device sets
+# debounce_ms in its reporting policy
+PEOPLE_COUNTER_BOUNCETIME = 20
+CONTACT_BOUNCETIME = 50
+PRESENCE_LAMP_SECONDS = 15
+PRESENCE_LAMP_TIMER = "presence_lamps"
+
+
+def push(data):
+    globals.queueMessages.put({"type": "push", "message": "ok", "data": data})
+
+
+class InputDispatcher(threading.Thread):
+    # GPIO edge callbacks only queue the pin and its level; this thread
+    # applies the sensor logic for every input and feeds the outbound queue.
+    # A contact is read again once its bouncetime is over: the level seen
+    # in the callback may be mid-bounce, and the edge where it settles is
+    # swallowed by the bouncetime.
+    def __init__(self, interface):
         threading.Thread.__init__(self)
-        self.device = device
         self.interface = interface
+        self.events = queue.Queue()
+        self.devices = {}
+        self.settle_delays = {}
+        self.events_handled = 0
 
-    def run(self):
-        print(
-            f"Starting thread for {self.interface.__dict__.get(self.device.tag).name }..."
+    def register(self):
+        for device in self.interface.get_inputs_devices():
+            if device.kind == "dth22":
+                continue
+            self.devices[device.pin] = device
+            if device.tag in PEOPLE_COUNTERS:
+                # Every rising edge is one person, however short the pulse
+                GPIO.add_event_detect(
+                    device.pin,
+                    GPIO.RISING,
+                    callback=self.on_edge,
+                    bouncetime=device.report.get(
+                        "debounce_ms", PEOPLE_COUNTER_BOUNCETIME
+                    ),
+                )
+            else:
+                bouncetime = device.report.get(
+                    "debounce_ms", CONTACT_BOUNCETIME
+                )
+                self.settle_delays[device.pin] = bouncetime / 1000
+                GPIO.add_event_detect(
+                    device.pin,
+                    GPIO.BOTH,
+                    callback=self.on_contact_edge,
+                    bouncetime=bouncetime,
+                )
+                # Catch up with anything that changed while we were off
+                self.events.put((device.pin, None))
+
+    def unregister(self):
+        for pin in self.devices:
+            GPIO.remove_event_detect(pin)
+            globals.timers.cancel(f"settle:{pin}")
+        globals.timers.cancel(PRESENCE_LAMP_TIMER)
+
+    def on_edge(self, pin):
+        self.events.put((pin, GPIO.input(pin)))
+
+    def on_contact_edge(self, pin):
+        # Every edge pushes the read back, so a bounce burst gives one
+        globals.timers.schedule(
+            f"settle:{pin}",
+            self.settle_delays[pin],
+            lambda: self.on_edge(pin),
         )
 
+    def run(self):
         while True:
             if globals.stop_threads:
                 break
-            # Check if a person is detected
-            if (
-                self.interface.__dict__.get(self.device.tag).get_tag()
-                == "people_counting_sensor_exit"
-                or self.interface.__dict__.get(self.device.tag).get_tag()
-                == "people_counting_sensor_entry"
-            ):
-                if (
-                    self.interface.__dict__.get(self.device.tag).get_input()
-                    == 1
-                    and self.interface.__dict__.get(
-                        self.device.tag
-                    ).get_value()
-                    == 0
-                ):
-                    # If a person is detected, send a message to the server and increment
-                    # count of people in the room
-                    with globals.people_count:
-                        if (
-                            self.interface.__dict__.get(
-                                self.device.tag
-                            ).get_tag()
-                            == "people_counting_sensor_exit"
-                        ):
-                            globals.people_count._value -= 1
-                        elif (
-                            self.interface.__dict__.get(
-                                self.device.tag
-                            ).get_tag()
-                            == "people_counting_sensor_entry"
-                        ):
-                            globals.people_count._value += 1
-                    globals.queueMessages.put(
-                        {
-                            "type": "push",
-                            "message": "ok",
-                            "data": {
-                                "people_count": globals.people_count._value,
-                            },
-                        }
-                    )
-                    self.interface.__dict__.get(self.device.tag).set_value(1)
-
-                elif (
-                    self.interface.__dict__.get(self.device.tag).get_input()
-                    == 0
-                    and self.interface.__dict__.get(
-                        self.device.tag
-                    ).get_value()
-                    == 1
-                ):
-                    self.interface.__dict__.get(self.device.tag).set_value(0)
-                time.sleep(0.05)
+            try:
+                pin, level = self.events.get(timeout=0.5)
+            except queue.Empty:
                 continue
-            else:
-                value = self.interface.__dict__.get(
-                    self.device.tag
-                ).get_input()
-                if (
-                    value
-                    is not self.interface.__dict__.get(
-                        self.device.tag
-                    ).get_value()
-                ):
-                    self.interface.__dict__.get(self.device.tag).set_value(
-                        value
-                    )
-                    self.interface.save_state()
-
-                    if (
-                        self.interface.__dict__.get(self.device.tag).tag
-                        == "presence_sensor"
-                    ):
-                        if (
-                            value == 1
-                            and self.interface.get_alarm_system() == 0
-                        ):
-                            self.interface.turn_all_lamp_on()
-                            globals.queueMessages.put(
-                                {
-                                    "type": "push",
-                                    "message": "ok",
-                                    "data": {
-                                        "lamp1": 1,
-                                        "lamp2": 1,
-                                        "presence_sensor": 1,
-                                    },
-                                }
-                            )
-                            time.sleep(15)
-                            self.interface.turn_all_lamp_off()
-                            globals.queueMessages.put(
-                                {
-                                    "type": "push",
-                                    "message": "ok",
-                                    "data": {
-                                        "lamp1": 0,
-                                        "lamp2": 0,
-                                    },
-                                }
-                            )
-                            continue
-
-                    if (
-                        self.interface.__dict__.get(self.device.tag).kind
-                        == "dth22"
-                    ):
-                        if (
-                            value.get("temperature") == 0
-                            and value.get("humidity") == 0
-                        ):
-                            continue
-                    globals.queueMessages.put(
-                        {
-                            "type": "push",
-                            "message": "ok",
-                            "data": {
-                                self.interface.__dict__.get(
-                                    self.device.tag
-                                ).get_tag(): value,
-                            },
-                        }
-                    )
-
-            if self.interface.__dict__.get(self.device.tag).kind == "dth22":
-                time.sleep(1.8)
-            else:
-                time.sleep(1)
+            self.handle_event(self.devices[pin], level)
+
+    def handle_event(self, device, level):
+        self.events_handled += 1
+        if device.tag in PEOPLE_COUNTERS:
+            self.count_person(device)
+            return
+        if level is None:
+            # Start-up sync rather than an edge
+            level = GPIO.input(device.pin)
+            if level == device.get_value():
+                return
+        elif level == device.get_value():
+            # Bounced back to the level already reported
+            self.interface.reporter.drop(device.tag)
+            return
+        device.set_value(level)
+        self.interface.save_state()
+        if (
+            device.tag == "presence_sensor"
+            and level == 1
+            and self.interface.get_alarm_system() == 0
+        ):
+            self.turn_on_presence_lamps()
+            return
+        self.interface.reporter.report(device.tag, level)
+
+    def count_person(self, device):
+        with globals.people_count:
+            globals.people_count._value += PEOPLE_COUNTERS[device.tag]
+        self.interface.reporter.report(
+            "people_count", globals.people_count._value
+        )
+
+    def turn_on_presence_lamps(self):
+        self.interface.turn_all_lamp_on()
+        push(self.interface.get_lamps_values())
+        self.interface.reporter.report("presence_sensor", 1)
+        # Presence again before the lamps go off restarts the countdown
+        timers = globals.timers
+        if not timers.extend(PRESENCE_LAMP_TIMER, PRESENCE_LAMP_SECONDS):
+            timers.schedule(
+                PRESENCE_LAMP_TIMER,
+                PRESENCE_LAMP_SECONDS,
+                self.turn_off_presence_lamps,
+            )
+
+    def turn_off_presence_lamps(self):
+        self.interface.turn_all_lamp_off()
+        push(self.interface.get_lamps_values())
+
+
+# Pushes are merged for this long before they go out as one frame
+FLUSH_INTERVAL = 0.1
+# Contacts the central raises alarms on: every change is sent right away
+URGENT_TAGS = {
+    "presence_sensor",
+    "smoke_sensor",
+    "window_sensor",
+    "door_sensor",
+}
+
+
+# Outbox entries uploaded per frame once the connection is back
+BACKLOG_BATCH = 100
 
 
 class SendMessage(threading.Thread):
-    def __init__(self, client):
+    # Drains the outbound queue and merges the pushes into one latest-value
+    # delta per flush interval; responses and urgent pushes go out at once,
+    # after whatever was pending so the central never sees stale values.
+    # With an outbox every push frame gets a sequence number, the deltas
+    # flushed while disconnected are written to it and the backlog is
+    # uploaded in batches before anything else once the room is back.
+    def __init__(
+        self,
+        client,
+        flush_interval=FLUSH_INTERVAL,
+        manager=None,
+        outbox=None,
+        codec=None,
+    ):
         threading.Thread.__init__(self)
         self.client = client
+        self.codec = codec
+        self.flush_interval = flush_interval
+        self.manager = manager
+        self.outbox = outbox
+        self.lost = None
+        self.pending = {}
+        self.pending_since = None
+        self.pending_seq = None
+        self.pushes_received = 0
+        self.frames_sent = 0
+        self.backlog_sent = 0
+        self.responses_dropped = 0
 
     def run(self):
         while True:
             if globals.stop_threads:
+                try:
+                    self.flush()
+                except OSError:
+                    self.spool()
                 break
             try:
-                if not globals.queueMessages.empty():
-                    message = globals.queueMessages.get()
-                    self.client.sendall(
-                        bytes(json.dumps(message), encoding="utf-8")
-                    )
-            except BrokenPipeError:
-                globals.queueMessages.put(message)
+                if self.client is None:
+                    self.reconnect()
+                if self.client is not None and self.outbox is not None:
+                    self.upload()
+                message = self.get_message(self.get_timeout())
+                # A storm that never empties the queue still flushes on time
+                while message is not None and self.get_timeout() > 0:
+                    self.handle_message(message)
+                    message = self.get_message()
+                if message is not None:
+                    self.handle_message(message)
+                if self.get_timeout() == 0:
+                    self.flush()
+            except OSError:
                 print("Client disconnected")
-                break
-                globals.stop_threads = True
-            time.sleep(0.5)
+                if self.manager is None:
+                    if self.pending:
+                        push(self.pending)
+                    break
+                self.disconnect()
+
+    def get_message(self, timeout=None):
+        try:
+            if timeout is None:
+                return globals.queueMessages.get_nowait()
+            return globals.queueMessages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_timeout(self) -> float:
+        if self.pending_since is None:
+            # While disconnected the reconnect is checked this often
+            return 0.5 if self.client is not None else self.flush_interval
+        elapsed = time.monotonic() - self.pending_since
+        return max(0.0, self.flush_interval - elapsed)
+
+    def reconnect(self):
+        self.client, decoder = self.manager.reconnect(self.lost, 0)
+        if self.client is not None:
+            # The new connection may have agreed on another encoding
+            self.codec = decoder.codec
+
+    def follow(self):
+        # The reader may have reconnected already: the old socket would
+        # only fail and send the delta to the backlog
+        if self.manager is None or self.client is None:
+            return
+        with self.manager.condition:
+            connection = self.manager.connection
+            if self.manager.reconnecting or connection in (None, self.client):
+                return
+            self.client = connection
+            self.codec = self.manager.decoder.codec
+        if self.outbox is not None:
+            self.upload()
+
+    def disconnect(self):
+        self.lost, self.client = self.client, None
+        self.spool()
+        # Starts the reconnect if the reader did not notice yet
+        self.manager.reconnect(self.lost, 0)
+
+    def handle_message(self, message):
+        if message.get("type") != "push":
+            self.flush(message)
+            return
+        self.pushes_received += 1
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        self.pending.update(message.get("data"))
+        if URGENT_TAGS.intersection(message.get("data")):
+            self.flush()
+
+    def flush(self, message=None):
+        if self.client is None:
+            self.spool()
+            if message is not None:
+                # The central already failed the request on disconnect
+                self.responses_dropped += 1
+            return
+        self.follow()
+        frames = []
+        if self.pending:
+            frame = {"type": "push", "message": "ok", "data": self.pending}
+            if self.outbox is not None:
+                if self.pending_seq is None:
+                    self.pending_seq = self.outbox.next_seq()
+                frame["seq"] = self.pending_seq
+            frames.append(encode_frame(frame, self.codec))
+        if message is not None:
+            frames.append(encode_frame(message, self.codec))
+        if not frames:
+            return
+        try:
+            self.client.sendall(b"".join(frames))
+        except OSError:
+            if message is not None:
+                globals.queueMessages.put(message)
+            raise
+        self.frames_sent += len(frames)
+        self.pending = {}
+        self.pending_since = None
+        self.pending_seq = None
+
+    def spool(self):
+        # Without an outbox the delta stays in memory; the snapshot sent
+        # on reconnect covers it anyway
+        self.pending_since = None
+        if not self.pending or self.outbox is None:
+            return
+        self.outbox.append(self.pending, self.pending_seq)
+        self.pending = {}
+        self.pending_seq = None
+
+    def upload(self):
+        while len(self.outbox):
+            entries = self.outbox.peek(BACKLOG_BATCH)
+            frame = {"type": "backlog", "data": entries}
+            self.client.sendall(encode_frame(frame, self.codec))
+            # Entries go only after the send; a resend is deduplicated
+            self.outbox.pop(len(entries))
+            self.backlog_sent += len(entries)
+            self.frames_sent += 1
@@ -1,11 +1,13 @@
-from multiprocessing import Queue
+from queue import Queue
 from threading import Semaphore
+from timers import TimerWheel
 from utils import read_config
 
-queueCommand = None
+queueCommands = None
 queueMessages = None
 people_count = None
 config = None
+timers = None
 stop_threads = False
 
 
@@ -14,9 +16,11 @@ def initialize():
     global queueMessages
     global people_count
     global config
+    global timers
     global stop_threads
     queueCommands = Queue()
     queueMessages = Queue()
     people_count = Semaphore(2)
     config = read_config()
+    timers = TimerWheel()
     stop_threads = False
@@ -0,0 +1,151 @@
+import os
+import random
+import threading
+import time
+
+# FSE_GPIO=fake runs the client on any Linux box, without RPi.GPIO, board
+# or a DHT22 attached.
+BACKEND = os.environ.get("FSE_GPIO", "rpi")
+
+
+class FakeGPIO:
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+
+    def __init__(self):
+        self.mode = None
+        self.levels = {}
+        self.directions = {}
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def getmode(self):
+        return self.mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=0):
+        with self.lock:
+            self.directions[pin] = direction
+            self.levels.setdefault(pin, initial)
+
+    def input(self, pin) -> int:
+        return self.levels.get(pin, 0)
+
+    def output(self, pin, value):
+        self.levels[pin] = int(value)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self.lock:
+            self.events[pin] = [edge, callback, (bouncetime or 0) / 1000, 0.0]
+
+    def add_event_callback(self, pin, callback):
+        with self.lock:
+            self.events[pin][1] = callback
+
+    def remove_event_detect(self, pin):
+        with self.lock:
+            self.events.pop(pin, None)
+
+    def cleanup(self, pins=None):
+        with self.lock:
+            self.levels.clear()
+            self.directions.clear()
+            self.events.clear()
+
+    def set_input(self, pin, value):
+        # Drive an input pin like the sensor would; edge callbacks run on
+        # the calling thread, as RPi.GPIO runs them on its own thread
+        value = int(value)
+        with self.lock:
+            previous = self.levels.get(pin, 0)
+            self.levels[pin] = value
+            event = self.events.get(pin)
+            if event is None or previous == value:
+                return
+            edge, callback, bouncetime, last = event
+            if edge == self.RISING and not value:
+                return
+            if edge == self.FALLING and value:
+                return
+            now = time.monotonic()
+            if now - last < bouncetime:
+                return
+            event[3] = now
+        if callback:
+            callback(pin)
+
+    def pulse(self, pin, width=0.0):
+        self.set_input(pin, 1)
+        if width:
+            time.sleep(width)
+        self.set_input(pin, 0)
+
+
+class FakeDHT22:
+    def __init__(self, pin):
+        self.pin = pin
+        self.temperature_value = 22.0
+        self.humidity_value = 60.0
+        self.failure_rate = 0.0
+        self.spike_rate = 0.0
+        self.spike = None
+
+    def read(self):
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        self.temperature_value += random.uniform(-0.1, 0.1)
+        self.humidity_value += random.uniform(-0.5, 0.5)
+        self.spike = None
+        if random.random() < self.spike_rate:
+            # Corrupted bits that still passed the checksum
+            self.spike = (random.uniform(-40, 125), random.uniform(0, 100))
+
+    @property
+    def temperature(self):
+        self.read()
+        if self.spike:
+            return round(self.spike[0], 1)
+        return round(self.temperature_value, 1)
+
+    @property
+    def humidity(self):
+        if self.spike:
+            return round(self.spike[1], 1)
+        return round(self.humidity_value, 1)
+
+
+def load_gpio():
+    if BACKEND == "fake":
+        return FakeGPIO()
+    import RPi.GPIO
+
+    return RPi.GPIO
+
+
+def create_dht22(pin):
+    if BACKEND == "fake":
+        return FakeDHT22(pin)
+    import board
+    import adafruit_dht
+
+    return adafruit_dht.DHT22(
+        board.D4 if pin == 4 else board.D18, use_pulseio=False
+    )
+
+
+GPIO = load_gpio()
@@ -1,24 +1,30 @@
-import RPi.GPIO as GPIO
-import board
-import adafruit_dht
 import json
 import globals
+from hardware import GPIO, create_dht22
+from persistence import StatePersister
+from reporting import Reporter
+
+STATE_FILE = "client/state.json"
 
 
 class Device:
-    def __init__(self, name, pin, tag, kind):
+    def __init__(self, name, pin, tag, kind, report=None):
         self.name = name
         self.pin = pin
         self.value = 0
         self.tag = tag
+        # Reporting policy from the device config, see reporting.py
+        self.report = report or {}
         if kind == "output":
             self.kind = GPIO.OUT
         elif kind == "input":
             self.kind = GPIO.IN
         elif kind == "dth22":
             self.kind = "dth22"
-            self.pin = board.D4 if pin == 4 else board.D18
-            self.sensor = adafruit_dht.DHT22(self.pin, use_pulseio=False)
+            self.sensor = create_dht22(pin)
+            # Last good reading, published by the DHT22 sampler
+            self.reading = None
+            self.read_at = None
 
     def turn_off(self):
         if self.kind == "dth22":
@@ -45,20 +51,23 @@ class Device:
 
     def get_input(self):
         if self.kind == "dth22":
-            try:
-                temperature_c = self.sensor.temperature
-                humidity = self.sensor.humidity
-                return {
-                    "temperature": temperature_c,
-                    "humidity": humidity,
-                }
-            except RuntimeError:
-                return {
-                    "temperature": 0,
-                    "humidity": 0,
-                }
+            # Only the sampler touches the sensor, everyone else gets the
+            # cached reading
+            return self.reading
         return GPIO.input(self.pin)
 
+    def read_sensor(self):
+        # Raises RuntimeError when the read fails, as the driver does
+        temperature_c = self.sensor.temperature
+        humidity = self.sensor.humidity
+        if temperature_c is None or humidity is None:
+            raise RuntimeError("DHT22 returned no data")
+        return {"temperature": temperature_c, "humidity": humidity}
+
+    def set_reading(self, reading, read_at):
+        self.reading = reading
+        self.read_at = read_at
+
     def get_value(self):
         return self.value
 
@@ -72,8 +81,12 @@ class Device:
 class ControlGPIO:
     def __init__(self, **kwargs):
         self.alarm_system = 0
+        self.persister = StatePersister(STATE_FILE, self.get_state_to_save)
         for key, value in kwargs.items():
             setattr(self, key, Device(**value))
+        self.reporter = Reporter(
+            {device.tag: device.report for device in self.get_inputs_devices()}
+        )
 
     def get_alarm_system(self):
         return self.alarm_system
@@ -82,6 +95,8 @@ class ControlGPIO:
         self.alarm_system = value
 
     def initialize(self):
+        if GPIO.getmode() is None:
+            GPIO.setmode(GPIO.BCM)
         for device in self.__dict__.values():
             if type(device) != Device:
                 continue
@@ -139,9 +154,11 @@ class ControlGPIO:
             getattr(self, device).turn_on() if action == "on" else getattr(
                 self, device
             ).turn_off()
-        self.save_state()
 
     def save_state(self):
+        self.persister.save()
+
+    def get_state_to_save(self):
         data_to_save = {}
         for device in self.__dict__.values():
             if type(device) != Device:
@@ -149,8 +166,18 @@ class ControlGPIO:
             data_to_save[device.tag] = device.get_value()
         data_to_save["alarm_system"] = self.get_alarm_system()
         data_to_save["people_count"] = globals.people_count._value
-        with open("client/state.json", "w") as file:
-            json.dump(data_to_save, file)
+        return data_to_save
+
+    def get_snapshot(self):
+        # What the central needs to resume the room after a (re)connect
+        snapshot = self.get_state_to_save()
+        for device in self.__dict__.values():
+            if type(device) != Device:
+                continue
+            if device.kind == "dth22" and not isinstance(device.value, dict):
+                # No reading yet, the central keeps its placeholder
+                snapshot.pop(device.tag)
+        return snapshot
 
     def load_state(self):
         state = self.get_state()
@@ -164,9 +191,13 @@ class ControlGPIO:
         globals.people_count._value = state["people_count"]
 
     def get_state(self):
-        with open("client/state.json", "r") as file:
-            json_data = file.read()
-        return json.loads(json_data)
+        try:
+            with open(STATE_FILE, "r") as file:
+                json_data = file.read()
+            return json.loads(json_data)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Boot with the defaults rather than not at all
+            return {}
 
     def print_all_devices(self):
         for device in self.__dict__.values():
@@ -0,0 +1,165 @@
+import json
+import mmap
+import os
+import struct
+import time
+
+OUTBOX_FILE = "client/outbox.bin"
+OUTBOX_SIZE = 256 * 1024
+# What to do when the outbox is full: drop the oldest entries to make
+# room, or drop the new entry and keep the backlog as it is
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+MAGIC = b"FSEOUTB1"
+# magic, head, tail, count, last_seq, dropped. head and tail are byte
+# counters that only grow; their position in the ring is modulo capacity
+HEADER = struct.Struct("!8sQQQQQ")
+HEADER_SIZE = 64
+# payload length, seq, time
+RECORD = struct.Struct("!IQd")
+
+
+class Outbox:
+    # Fixed-size ring buffer of pushes in a memory-mapped file. Entries
+    # written while the room is disconnected survive a restart of the
+    # client and are uploaded in batches once the connection is back.
+    # The same file keeps the push sequence numbers, so they keep growing
+    # across restarts and the central can drop anything it already has.
+    def __init__(self, path=OUTBOX_FILE, size=OUTBOX_SIZE, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown outbox policy: {policy}")
+        self.path = path
+        self.policy = policy
+        self.capacity = size - HEADER_SIZE
+        self.file = open(path, "a+b")
+        created = os.path.getsize(path) != size
+        if created:
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.head = self.tail = self.count = self.last_seq = self.dropped = 0
+        if created or not self.load_header():
+            self.write_header()
+
+    def load_header(self) -> bool:
+        magic, head, tail, count, last_seq, dropped = HEADER.unpack_from(
+            self.map, 0
+        )
+        if magic != MAGIC or not 0 <= tail - head <= self.capacity:
+            return False
+        self.head = head
+        self.tail = tail
+        self.count = count
+        self.last_seq = last_seq
+        self.dropped = dropped
+        return True
+
+    def write_header(self):
+        HEADER.pack_into(
+            self.map,
+            0,
+            MAGIC,
+            self.head,
+            self.tail,
+            self.count,
+            self.last_seq,
+            self.dropped,
+        )
+
+    def __len__(self):
+        return self.count
+
+    def get_used(self) -> int:
+        return self.tail - self.head
+
+    def next_seq(self) -> int:
+        self.last_seq += 1
+        self.write_header()
+        return self.last_seq
+
+    def append(self, data, seq=None, timestamp=None) -> bool:
+        payload = json.dumps(data, separators=(",", ":")).encode()
+        size = RECORD.size + len(payload)
+        if size > self.capacity:
+            self.dropped += 1
+            self.write_header()
+            return False
+        while self.get_used() + size > self.capacity:
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                self.write_header()
+                return False
+            self.pop(1)
+            self.dropped += 1
+        if seq is None:
+            seq = self.last_seq + 1
+        self.last_seq = max(self.last_seq, seq)
+        timestamp = time.time() if timestamp is None else timestamp
+        self.write(self.tail, RECORD.pack(len(payload), seq, timestamp))
+        self.write(self.tail + RECORD.size, payload)
+        # The header goes last: a crash in between loses the entry, it
+        # never leaves half of one in the ring
+        self.tail += size
+        self.count += 1
+        self.write_header()
+        return True
+
+    def peek(self, limit) -> list[dict]:
+        entries = []
+        offset = self.head
+        while offset < self.tail and len(entries) < limit:
+            length, seq, timestamp = RECORD.unpack(
+                self.read(offset, RECORD.size)
+            )
+            payload = self.read(offset + RECORD.size, length)
+            entries.append(
+                {"seq": seq, "time": timestamp, "data": json.loads(payload)}
+            )
+            offset += RECORD.size + length
+        return entries
+
+    def pop(self, number):
+        for _ in range(min(number, self.count)):
+            length = RECORD.unpack(self.read(self.head, RECORD.size))[0]
+            self.head += RECORD.size + length
+            self.count -= 1
+        self.write_header()
+
+    def write(self, offset, data):
+        position = offset % self.capacity
+        first = min(len(data), self.capacity - position)
+        start = HEADER_SIZE + position
+        self.map[start : start + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            self.map[HEADER_SIZE : HEADER_SIZE + rest] = data[first:]
+
+    def read(self, offset, length) -> bytes:
+        position = offset % self.capacity
+        first = min(length, self.capacity - position)
+        start = HEADER_SIZE + position
+        data = self.map[start : start + first]
+        if first < length:
+            data += self.map[HEADER_SIZE : HEADER_SIZE + length - first]
+        return data
+
+    def sync(self):
+        # The page cache already survives the process; this is for power loss
+        self.map.flush()
+
+    def close(self):
+        if self.map.closed:
+            return
+        self.sync()
+        self.map.close()
+        self.file.close()
+
+    def get_stats(self) -> dict:
+        return {
+            "entries": self.count,
+            "bytes": self.get_used(),
+            "capacity": self.capacity,
+            "dropped": self.dropped,
+            "last_seq": self.last_seq,
+        }
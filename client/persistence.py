@@ -0,0 +1,88 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def write_atomic(path, data):
+    # The old file stays in place until the new one is complete on disk,
+    # so a crash mid-write never leaves invalid JSON behind
+    directory = os.path.dirname(path) or "."
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class StatePersister:
+    # save() only marks the state dirty; a background thread waits for
+    # the changes to settle for `delay` seconds and writes one snapshot.
+    def __init__(self, path, snapshot, delay=0.2):
+        self.path = path
+        self.snapshot = snapshot
+        self.delay = delay
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.dirty = False
+        self.thread = None
+        self.running = False
+        self.requests = 0
+        self.writes = 0
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+        self.flush()
+
+    def save(self):
+        with self.condition:
+            self.requests += 1
+            self.dirty = True
+            self.condition.notify()
+        if self.thread is None:
+            self.flush()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.dirty:
+                    self.condition.wait()
+                if not self.running:
+                    break
+            # Everything saved while we wait goes out in the same write
+            time.sleep(self.delay)
+            self.flush()
+
+    def flush(self):
+        with self.write_lock:
+            with self.condition:
+                if not self.dirty:
+                    return
+                self.dirty = False
+                data = self.snapshot()
+            write_atomic(self.path, data)
+            self.writes += 1
+
+    def get_saved_writes(self) -> int:
+        return self.requests - self.writes
@@ -0,0 +1 @@
+../server/protocol.py
\ No newline at end of file
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import Counter
+
+import globals
+from connection import push
+
+
+class ReportPolicy:
+    # Set per device under "report" in client/config*.json. The deadbands
+    # are a number for plain values or a dict per field of the reading.
+    def __init__(
+        self,
+        deadband=0,
+        deadband_pct=0,
+        min_interval=0,
+        heartbeat=None,
+        debounce_ms=None,
+    ):
+        self.deadband = deadband
+        self.deadband_pct = deadband_pct
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self.debounce_ms = debounce_ms
+
+    def get_limit(self, field, last) -> float:
+        absolute = self.deadband
+        percent = self.deadband_pct
+        if isinstance(absolute, dict):
+            absolute = absolute.get(field, 0)
+        if isinstance(percent, dict):
+            percent = percent.get(field, 0)
+        return max(absolute, abs(last) * percent / 100)
+
+    def exceeds_deadband(self, last, value) -> bool:
+        if isinstance(value, dict) and isinstance(last, dict):
+            return any(
+                self.exceeds_field(field, last.get(field), item)
+                for field, item in value.items()
+            )
+        return self.exceeds_field(None, last, value)
+
+    def exceeds_field(self, field, last, value) -> bool:
+        numbers = (int, float)
+        if not isinstance(last, numbers) or not isinstance(value, numbers):
+            return last != value
+        if last == value:
+            return False
+        return abs(value - last) > self.get_limit(field, last)
+
+
+class Reporter:
+    # Report by exception: a value only reaches the outbound queue when
+    # it moved past the deadband and the minimum interval has passed.
+    # Changes held back by the interval go out when it ends, and a
+    # heartbeat repeats the value after `heartbeat` seconds of silence.
+    def __init__(self, policies=None):
+        self.policies = {
+            tag: ReportPolicy(**policy)
+            for tag, policy in (policies or {}).items()
+        }
+        self.last = {}
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.offered = Counter()
+        self.sent = Counter()
+        self.heartbeats = Counter()
+
+    def get_policy(self, tag) -> ReportPolicy:
+        return self.policies.get(tag) or ReportPolicy()
+
+    def report(self, tag, value):
+        policy = self.get_policy(tag)
+        with self.lock:
+            self.offered[tag] += 1
+            self.latest[tag] = value
+            last = self.last.get(tag)
+            if last is not None:
+                last_value, last_at = last
+                if not policy.exceeds_deadband(last_value, value):
+                    return
+                wait = policy.min_interval - (time.monotonic() - last_at)
+                if wait > 0:
+                    globals.timers.schedule(
+                        f"report:{tag}", wait, lambda: self.report_held(tag)
+                    )
+                    return
+            self.send(tag, value)
+
+    def report_held(self, tag):
+        with self.lock:
+            value = self.latest[tag]
+            last_value = self.last[tag][0]
+            if self.get_policy(tag).exceeds_deadband(last_value, value):
+                self.send(tag, value)
+
+    def report_heartbeat(self, tag):
+        with self.lock:
+            self.heartbeats[tag] += 1
+            self.send(tag, self.latest[tag])
+
+    def drop(self, tag):
+        # A change that settled back before it was reported, like a bounce
+        with self.lock:
+            self.offered[tag] += 1
+
+    def send(self, tag, value):
+        policy = self.get_policy(tag)
+        self.last[tag] = (value, time.monotonic())
+        self.sent[tag] += 1
+        globals.timers.cancel(f"report:{tag}")
+        if policy.heartbeat:
+            globals.timers.schedule(
+                f"heartbeat:{tag}",
+                policy.heartbeat,
+                lambda: self.report_heartbeat(tag),
+            )
+        push({tag: value})
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            # Heartbeats are sent without anything being offered
+            suppressed = {
+                tag: count - self.sent[tag] + self.heartbeats[tag]
+                for tag, count in self.offered.items()
+            }
+            return {
+                "offered": sum(self.offered.values()),
+                "sent": sum(self.sent.values()),
+                "heartbeats": sum(self.heartbeats.values()),
+                "suppressed": sum(suppressed.values()),
+                "suppressed_by_tag": {
+                    tag: count for tag, count in suppressed.items() if count
+                },
+            }
@@ -0,0 +1,124 @@
+import statistics
+import threading
+import time
+from collections import deque
+
+import globals
+
+# The DHT22 cannot be read more than once every 2 seconds
+SAMPLE_PERIOD = 2.0
+RETRY_DELAY = 2.0
+MAX_RETRY_DELAY = 30.0
+MEDIAN_WINDOW = 5
+# Range the sensor can measure, from the datasheet
+PLAUSIBLE_RANGE = {"temperature": (-40.0, 80.0), "humidity": (0.0, 100.0)}
+# Largest jump from the median accepted from one reading to the next
+MAX_STEP = {"temperature": 5.0, "humidity": 15.0}
+# Jumps in a row after which the room really changed
+MAX_REJECTED = 3
+
+
+class DHT22Sampler(threading.Thread):
+    # The only thread that reads the sensor. Failed reads are retried with
+    # exponential backoff, implausible values and spikes are dropped, and
+    # the median of the last good readings is published on the device.
+    def __init__(
+        self,
+        device,
+        interface,
+        period=SAMPLE_PERIOD,
+        retry_delay=RETRY_DELAY,
+        max_retry_delay=MAX_RETRY_DELAY,
+    ):
+        threading.Thread.__init__(self)
+        self.device = device
+        self.interface = interface
+        self.period = period
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.window = deque(maxlen=MEDIAN_WINDOW)
+        self.failures_in_row = 0
+        self.rejected_in_row = 0
+        self.reads = 0
+        self.failures = 0
+        self.rejected = 0
+        self.published = 0
+
+    def run(self):
+        print(f"Starting sampler for {self.device.name}...")
+        while not globals.stop_threads:
+            self.sample()
+            self.wait(self.get_delay())
+
+    def sample(self):
+        reading = self.read()
+        if reading is None:
+            return
+        value = self.filter(reading)
+        if value is not None:
+            self.publish(value)
+
+    def get_delay(self) -> float:
+        if not self.failures_in_row:
+            return self.period
+        delay = self.retry_delay * 2 ** (self.failures_in_row - 1)
+        return min(delay, self.max_retry_delay)
+
+    def wait(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not globals.stop_threads:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            time.sleep(min(left, 0.5))
+
+    def read(self):
+        self.reads += 1
+        try:
+            reading = self.device.read_sensor()
+        except RuntimeError:
+            self.failures += 1
+            self.failures_in_row += 1
+            return None
+        self.failures_in_row = 0
+        return reading
+
+    def filter(self, reading):
+        if not self.is_plausible(reading):
+            self.rejected += 1
+            return None
+        if self.window and self.is_spike(reading):
+            self.rejected_in_row += 1
+            if self.rejected_in_row < MAX_REJECTED:
+                self.rejected += 1
+                return None
+            # Start over from the new level
+            self.window.clear()
+        self.rejected_in_row = 0
+        self.window.append(reading)
+        return {
+            key: round(statistics.median(item[key] for item in self.window), 1)
+            for key in PLAUSIBLE_RANGE
+        }
+
+    def is_plausible(self, reading) -> bool:
+        for key, (low, high) in PLAUSIBLE_RANGE.items():
+            if not low <= reading[key] <= high:
+                return False
+        return True
+
+    def is_spike(self, reading) -> bool:
+        for key, step in MAX_STEP.items():
+            median = statistics.median(item[key] for item in self.window)
+            if abs(reading[key] - median) > step:
+                return True
+        return False
+
+    def publish(self, value):
+        self.device.set_reading(value, time.time())
+        if value == self.device.get_value():
+            return
+        self.published += 1
+        self.device.set_value(value)
+        self.interface.save_state()
+        self.interface.reporter.report(self.device.get_tag(), value)
@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import globals
+from protocol import (
+    BINARY,
+    JSON,
+    BinaryCodec,
+    FrameDecoder,
+    FrameError,
+    RECV_SIZE,
+    encode_frame,
+)
+from utils import parse_devices_to_server
+
+CONFIGS = ("client/config_1_3.json", "client/config_2_4.json")
+# Contacts flipped during a sensor storm
+STORM_TAGS = ("presence_sensor", "window_sensor", "door_sensor")
+RECONNECT_DELAY = 1.0
+
+
+class VirtualRoom:
+    # A room without GPIO: it registers with the real handshake and device
+    # schema, pushes readings, contact storms and people counter changes,
+    # and answers commands the way ApplyCommand does.
+    def __init__(self, number, config, options, stats):
+        self.name = f"room_{number}"
+        self.devices = parse_devices_to_server(config.get("devices"))
+        self.encoding = options.encoding or config.get("encoding", JSON)
+        self.options = options
+        self.stats = stats
+        self.values = {}
+        for tag, device in self.devices.items():
+            if device["kind"] == "dth22":
+                self.values[tag] = {
+                    "temperature": round(random.uniform(18, 26), 1),
+                    "humidity": round(random.uniform(40, 70), 1),
+                }
+            else:
+                self.values[tag] = 0
+        self.writer = None
+        self.decoder = None
+        self.codec = None
+        self.seq = 0
+
+    async def run(self, host, port):
+        while not globals.stop_threads:
+            try:
+                reader = await self.connect(host, port)
+                tasks = [
+                    asyncio.create_task(self.listen(reader)),
+                    asyncio.create_task(self.push_readings()),
+                    asyncio.create_task(self.push_storms()),
+                    asyncio.create_task(self.count_people()),
+                ]
+                # Any of them ending means the connection is gone
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            except (OSError, FrameError):
+                pass
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+            if globals.stop_threads:
+                break
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(random.uniform(0, RECONNECT_DELAY))
+
+    async def connect(self, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        register = {
+            "name": self.name,
+            "devices": self.devices,
+            "seq": self.seq,
+        }
+        if self.encoding == BINARY:
+            register["encodings"] = [BINARY, JSON]
+        writer.write(encode_frame({"type": "register", "data": register}))
+        writer.write(
+            encode_frame(
+                {"type": "push", "message": "snapshot", "data": self.values}
+            )
+        )
+        await writer.drain()
+        self.decoder = FrameDecoder()
+        greeting = []
+        while not greeting:
+            data = await reader.read(RECV_SIZE)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            greeting = self.decoder.feed(data, limit=1)
+        greeting = greeting[0]
+        self.codec = None
+        if isinstance(greeting, dict) and greeting.get("encoding") == BINARY:
+            self.codec = BinaryCodec(greeting.get("tags"))
+            self.decoder.codec = self.codec
+        self.writer = writer
+        self.stats["connected"] += 1
+        return reader
+
+    async def send(self, message):
+        self.writer.write(encode_frame(message, self.codec))
+        await self.writer.drain()
+
+    async def push(self, data):
+        self.seq += 1
+        self.stats["pushes"] += 1
+        await self.send(
+            {"type": "push", "message": "ok", "seq": self.seq, "data": data}
+        )
+
+    async def listen(self, reader):
+        messages = self.decoder.feed(b"")
+        while not globals.stop_threads:
+            for message in messages:
+                if isinstance(message, dict) and message.get("type") == "post":
+                    await self.handle_command(message)
+            data = await reader.read(RECV_SIZE)
+            if not data:
+                return
+            messages = self.decoder.feed(data)
+
+    async def handle_command(self, message):
+        received = time.time()
+        self.stats["commands"] += 1
+        if message.get("time") is not None:
+            # Same host, same clock: central write to room read
+            self.stats["command_latency"].append(received - message["time"])
+        updates = {}
+        for tag, action in message.get("data").items():
+            value = 1 if action == "on" else 0
+            if tag == "all":
+                # Every on/off device, the DHT22 has no state to set
+                tags = [
+                    name
+                    for name, item in self.values.items()
+                    if not isinstance(item, dict)
+                ]
+            else:
+                tags = [tag]
+            for name in tags:
+                self.values[name] = value
+                updates[name] = value
+        await self.send(
+            {
+                "type": "response",
+                "id": message.get("id"),
+                "data": updates,
+                "message": "Command applied",
+                "status": "accepted",
+            }
+        )
+        self.stats["command_handling"].append(time.time() - received)
+
+    async def push_readings(self):
+        if not self.options.rate:
+            await self.wait_forever()
+        while not globals.stop_threads:
+            await asyncio.sleep(random.expovariate(self.options.rate))
+            for tag, value in self.values.items():
+                if isinstance(value, dict):
+                    value["temperature"] = round(
+                        value["temperature"] + random.gauss(0, 0.2), 1
+                    )
+                    value["humidity"] = round(
+                        value["humidity"] + random.gauss(0, 0.5), 1
+                    )
+                    await self.push({tag: dict(value)})
+
+    async def push_storms(self):
+        if not self.options.storm_every:
+            await self.wait_forever()
+        while not globals.stop_threads:
+            every = self.options.storm_every
+            await asyncio.sleep(random.uniform(0, 2 * every))
+            # Contacts chattering: every change is its own frame
+            self.stats["storms"] += 1
+            for _ in range(self.options.storm_size):
+                tag = random.choice(STORM_TAGS)
+                self.values[tag] ^= 1
+                await self.push({tag: self.values[tag]})
+
+    async def count_people(self):
+        if not self.options.people_rate:
+            await self.wait_forever()
+        while not globals.stop_threads:
+            await asyncio.sleep(random.expovariate(self.options.people_rate))
+            # Nobody leaves an empty room
+            if self.values["people_count"] and random.random() < 0.5:
+                self.values["people_count"] -= 1
+            else:
+                self.values["people_count"] += 1
+            await self.push({"people_count": self.values["people_count"]})
+
+    async def wait_forever(self):
+        while not globals.stop_threads:
+            await asyncio.sleep(0.5)
+
+
+def create_stats() -> dict:
+    return {
+        "connected": 0,
+        "reconnects": 0,
+        "pushes": 0,
+        "storms": 0,
+        "commands": 0,
+        "command_latency": [],
+        "command_handling": [],
+    }
+
+
+def percentiles(samples) -> str:
+    if not samples:
+        return "-"
+    samples = sorted(samples)
+    values = [
+        samples[min(len(samples) - 1, int(len(samples) * q))]
+        for q in (0.5, 0.95, 0.99)
+    ]
+    values.append(samples[-1])
+    return " / ".join(f"{1000 * value:.2f}" for value in values)
+
+
+def show_stats(stats, elapsed, rooms):
+    pushes = stats["pushes"]
+    print(
+        f"Rooms: {rooms}, connections: {stats['connected']}, "
+        f"reconnects: {stats['reconnects']}"
+    )
+    print(
+        f"Pushes: {pushes} ({pushes / elapsed:.0f}/s), "
+        f"storms: {stats['storms']}"
+    )
+    print(f"Commands: {stats['commands']}")
+    print(
+        "Command latency ms p50/p95/p99/max: "
+        f"{percentiles(stats['command_latency'])}"
+    )
+    print(
+        "Command handling ms p50/p95/p99/max: "
+        f"{percentiles(stats['command_handling'])}"
+    )
+
+
+async def simulate(options, stats):
+    configs = []
+    for file_name in CONFIGS:
+        with open(file_name, "r") as file:
+            configs.append(json.load(file))
+    host = options.server_ip or configs[0].get("server_ip")
+    port = options.server_port or configs[0].get("server_port")
+    rooms = [
+        VirtualRoom(
+            options.first + number,
+            configs[number % len(configs)],
+            options,
+            stats,
+        )
+        for number in range(options.rooms)
+    ]
+    tasks = [asyncio.create_task(room.run(host, port)) for room in rooms]
+    start = time.monotonic()
+    while not globals.stop_threads:
+        await asyncio.sleep(0.5)
+        if options.duration and time.monotonic() - start >= options.duration:
+            globals.stop_threads = True
+    for room in rooms:
+        if room.writer is not None:
+            room.writer.close()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load the central server with virtual rooms"
+    )
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument(
+        "--first", type=int, default=1, help="number of the first room"
+    )
+    parser.add_argument("--server-ip")
+    parser.add_argument("--server-port", type=int)
+    parser.add_argument(
+        "--rate", type=float, default=0.5, help="DHT22 pushes/s per room"
+    )
+    parser.add_argument(
+        "--storm-every",
+        type=float,
+        default=0,
+        help="mean seconds between contact storms in a room, 0 = none",
+    )
+    parser.add_argument(
+        "--storm-size", type=int, default=20, help="changes per storm"
+    )
+    parser.add_argument(
+        "--people-rate",
+        type=float,
+        default=0.1,
+        help="people/s through the counters of a room",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=0, help="seconds, 0 = until Ctrl+C"
+    )
+    parser.add_argument("--encoding", choices=(JSON, BINARY))
+    options = parser.parse_args()
+    stats = create_stats()
+    start = time.monotonic()
+    try:
+        elapsed = asyncio.run(simulate(options, stats))
+    except KeyboardInterrupt:
+        elapsed = time.monotonic() - start
+    show_stats(stats, elapsed, options.rooms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import math
+import threading
+import time
+import traceback
+
+TICK = 0.1
+SLOTS = 512
+
+
+class TimerWheel:
+    # Hashed timer wheel: a timer lives in the slot of the tick it is due
+    # on, so scheduling, extending and cancelling are a dict and a set
+    # operation, and each tick only looks at its own slot. One thread runs
+    # every due action, which must not block.
+    def __init__(self, tick=TICK, slots=SLOTS):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.timers = {}
+        self.origin = time.monotonic()
+        self.current = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.fired = 0
+
+    def schedule(self, key, delay, action) -> None:
+        # A timer scheduled again under the same key replaces the old one
+        with self.condition:
+            self.remove(key)
+            self.insert(key, delay, action)
+            self.condition.notify()
+
+    def extend(self, key, delay) -> bool:
+        # Push the deadline to `delay` seconds from now
+        with self.condition:
+            timer = self.remove(key)
+            if timer is None:
+                return False
+            self.insert(key, delay, timer[1])
+            return True
+
+    def cancel(self, key) -> bool:
+        with self.condition:
+            return self.remove(key) is not None
+
+    def pending(self, key) -> bool:
+        return key in self.timers
+
+    def __len__(self):
+        return len(self.timers)
+
+    def insert(self, key, delay, action):
+        now = time.monotonic()
+        if not self.timers:
+            # The wheel was idle, it picks up from now
+            self.current = self.get_tick(now)
+        # The first tick at or after the deadline, so a timer never fires
+        # early, and never one the wheel has already passed
+        due = math.ceil((now + delay - self.origin) / self.tick)
+        due = max(due, self.current + 1)
+        self.timers[key] = (due, action)
+        self.slots[due % len(self.slots)].add(key)
+
+    def remove(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            self.slots[timer[0] % len(self.slots)].discard(key)
+        return timer
+
+    def get_tick(self, now) -> int:
+        return int((now - self.origin) / self.tick)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    break
+                if not self.timers:
+                    # Nothing to wait for, sleep until a timer is scheduled
+                    self.condition.wait()
+                    continue
+                next_tick = self.origin + (self.current + 1) * self.tick
+                left = next_tick - time.monotonic()
+                if left > 0:
+                    self.condition.wait(left)
+                    continue
+                due = self.advance(self.get_tick(time.monotonic()))
+            for action in due:
+                try:
+                    action()
+                except Exception:
+                    traceback.print_exc()
+                self.fired += 1
+
+    def advance(self, now) -> list:
+        # Every tick since the last run, when the thread fell behind
+        due = []
+        while self.current < now:
+            self.current += 1
+            slot = self.slots[self.current % len(self.slots)]
+            for key in [key for key in slot if self.timers[key][0] <= now]:
+                slot.discard(key)
+                due.append(self.timers.pop(key)[1])
+            if not self.timers:
+                self.current = now
+        return due
@@ -1,8 +1,23 @@
 import json
-import random
 import socket
-import time
 import globals
+from protocol import (
+    BINARY,
+    JSON,
+    BinaryCodec,
+    FrameDecoder,
+    FrameError,
+    RECV_SIZE,
+    send_message,
+)
+
+# Seconds to connect and to get the greeting, instead of the OS defaults
+CONNECT_TIMEOUT = 5
+# TCP keepalive: a central that lost power is noticed after about
+# KEEPALIVE_IDLE + KEEPALIVE_INTERVAL * KEEPALIVE_COUNT seconds
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
 
 
 def read_config():
@@ -51,49 +66,93 @@ def get_host_ip(num):
         }
 
 
-def createConection():
+def createConection(snapshot=None, seq=None):
+    # One attempt; retrying with backoff is up to the ConnectionManager
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client.bind(
-        (
-            globals.config.get("client_ip"),
-            globals.config.get("client_port"),
+    # The same local port is bound again on every reconnect
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    client.settimeout(CONNECT_TIMEOUT)
+    try:
+        client.bind(
+            (
+                globals.config.get("client_ip"),
+                globals.config.get("client_port"),
+            )
         )
-    )
-    print("Waiting for connection...")
-    connected = False
-    while not connected:
-        try:
-            client.connect(
-                (
-                    globals.config.get("server_ip"),
-                    globals.config.get("server_port"),
-                )
+        client.connect(
+            (
+                globals.config.get("server_ip"),
+                globals.config.get("server_port"),
             )
-            connected = True
-        except ConnectionRefusedError:
-            time.sleep(1)
-    print("Connected to server!")
-
-    print("Sending data to server...")
-    client.sendall(
-        bytes(
-            json.dumps(
-                {
-                    "type": "register",
-                    "data": {
-                        "name": globals.config.get("name"),
-                        "devices": parse_devices_to_server(
-                            globals.config.get("devices")
-                        ),
-                    },
-                }
-            ),
-            "UTF-8",
         )
+        print("Connected to server!")
+
+        print("Sending data to server...")
+        register = {
+            "name": globals.config.get("name"),
+            "devices": parse_devices_to_server(globals.config.get("devices")),
+        }
+        if globals.config.get("encoding") == BINARY:
+            # The central answers with the one it picked, JSON otherwise
+            register["encodings"] = [BINARY, JSON]
+        if seq is not None:
+            # Last push sequence number, a lower one than the central has
+            # seen means the outbox was reset
+            register["seq"] = seq
+        send_message(client, {"type": "register", "data": register})
+        if snapshot:
+            # Full state, so the central resumes from where the room is
+            send_message(
+                client,
+                {"type": "push", "message": "snapshot", "data": snapshot},
+            )
+        decoder = FrameDecoder()
+        messages = []
+        while not messages:
+            data = client.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            messages = decoder.feed(data, limit=1)
+        # Blocking from here on; a dead central breaks recv through the
+        # keepalive instead
+        client.settimeout(None)
+        set_keepalive(client)
+    except OSError:
+        client.close()
+        raise
+    except FrameError as e:
+        client.close()
+        # Retried like any other failed connect
+        raise ConnectionError(f"Invalid greeting: {e}")
+    greeting = messages[0]
+    if isinstance(greeting, dict):
+        if greeting.get("encoding") == BINARY:
+            decoder.codec = BinaryCodec(greeting.get("tags"))
+        print("Received from server: ", greeting.get("message"))
+    else:
+        # Centrals from before the encoding was negotiated
+        print("Received from server: ", greeting)
+    return client, decoder
+
+
+def set_keepalive(client):
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Linux options, other systems keep their defaults. The user timeout
+    # covers pushes left unacknowledged, which keepalive does not probe
+    options = (
+        ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+        ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+        ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+        (
+            "TCP_USER_TIMEOUT",
+            1000 * (KEEPALIVE_IDLE + KEEPALIVE_INTERVAL * KEEPALIVE_COUNT),
+        ),
     )
-    data = client.recv(1024)
-    print("Received from server: ", data.decode())
-    return client
+    for name, value in options:
+        if hasattr(socket, name):
+            client.setsockopt(
+                socket.IPPROTO_TCP, getattr(socket, name), value
+            )
 
 
 def parse_devices_to_server(devices):
@@ -141,28 +200,8 @@ def parse_devices_to_client(devices):
                     "name": str(values.get("name")),
                     "kind": str(values.get("type")),
                     "pin": int(values.get("gpio")),
+                    "report": values.get("report", {}),
                 }
             }
         )
     return parsed_devices
-
-
-def mock_sensor():
-    while True:
-        globals.queueMessages.put(
-            {
-                "type": "push",
-                "message": "ok",
-                "data": {
-                    "temperature_humidity_sensor": {
-                        "temperature": random.randint(15, 30),
-                        "humidity": random.randint(0, 100),
-                    },
-                    # "lamp1": random.randint(0, 1),
-                    # "lamp2": random.randint(0, 1),
-                    "multimedia_projector": random.randint(0, 1),
-                    "air_conditioner": random.randint(0, 1),
-                },
-            }
-        )
-        time.sleep(2)
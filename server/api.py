@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+
+from broadcast import REJECTED
+from logquery import parse_date
+from protocol import FrameDecoder, FrameError, RECV_SIZE, encode_frame
+
+API_SOCKET = "server/central.sock"
+ERROR = "error"
+# Log lines a "logs" request returns when it sets no limit
+LOG_LIMIT = 100
+
+
+def is_number(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class CommandAPI:
+    # The operations of the numeric menu over a local socket, served on the
+    # room loop. Each request is answered with "queued" at once, then with
+    # one "result" per command as it finishes and a final "done", so a
+    # client can keep many requests in flight on the same connection.
+    def __init__(self, central, path=API_SOCKET):
+        self.central = central
+        self.path = path
+        self.server = None
+        self.commands = 0
+
+    async def start(self):
+        # Left behind by a central that did not stop cleanly
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(
+            self.handle_client, path=self.path
+        )
+
+    async def stop(self):
+        if self.server is None:
+            return
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def submit(self, room, command):
+        # For clients in the same process, like the curses menu: returns a
+        # concurrent.futures.Future with the result
+        return asyncio.run_coroutine_threadsafe(
+            self.execute(room, command), self.central.engine.loop
+        )
+
+    def submit_logs(self, **filters):
+        # Same as submit, for a log query
+        return asyncio.run_coroutine_threadsafe(
+            self.logs(**filters), self.central.engine.loop
+        )
+
+    async def logs(
+        self, room=None, action=None, since=None, until=None, limit=LOG_LIMIT
+    ) -> list:
+        # The query reads files, so it runs off the room loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            self.central.query_logs,
+            room,
+            action,
+            since,
+            until,
+            limit,
+        )
+
+    async def execute(self, room, command) -> dict:
+        if not is_number(room) or not is_number(command):
+            return {
+                "status": REJECTED,
+                "messages": ["Room and command must be integers"],
+            }
+        self.commands += 1
+        try:
+            return await self.central.execute(room, command)
+        except Exception as e:
+            return {"status": ERROR, "messages": [str(e)]}
+
+    async def handle_client(self, reader, writer):
+        decoder = FrameDecoder()
+        tasks = set()
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                for message in decoder.feed(data):
+                    task = asyncio.ensure_future(
+                        self.handle_request(writer, message)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except (ConnectionError, FrameError):
+            pass
+        finally:
+            # A client may close its side right after sending: the commands
+            # already queued still run and answer
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    def send(self, writer, message):
+        if not writer.is_closing():
+            writer.write(encode_frame(message))
+
+    async def handle_request(self, writer, message):
+        if not isinstance(message, dict):
+            self.send(writer, {"type": ERROR, "message": "Invalid request"})
+            return
+        request_id = message.get("id")
+        kind = message.get("type")
+        if kind == "status":
+            self.send(
+                writer,
+                {
+                    "type": "status",
+                    "id": request_id,
+                    **self.central.get_status(),
+                },
+            )
+            return
+        if kind == "logs":
+            await self.send_logs(writer, request_id, message)
+            return
+        if kind == "command":
+            commands = [message]
+        elif kind == "batch":
+            commands = message.get("commands")
+        else:
+            self.send(
+                writer,
+                {
+                    "type": ERROR,
+                    "id": request_id,
+                    "message": f"Unknown request type: {kind}",
+                },
+            )
+            return
+        if not isinstance(commands, list) or not commands:
+            self.send(
+                writer,
+                {"type": ERROR, "id": request_id, "message": "No commands"},
+            )
+            return
+        self.send(
+            writer,
+            {"type": "queued", "id": request_id, "commands": len(commands)},
+        )
+        await self.run_batch(writer, request_id, commands)
+        self.send(writer, {"type": "done", "id": request_id})
+
+    async def send_logs(self, writer, request_id, message):
+        room = message.get("room")
+        limit = message.get("limit", LOG_LIMIT)
+        if (room is not None and not is_number(room)) or not is_number(limit):
+            self.send(
+                writer,
+                {
+                    "type": ERROR,
+                    "id": request_id,
+                    "message": "Room and limit must be integers",
+                },
+            )
+            return
+        records = await self.logs(
+            room,
+            message.get("action"),
+            message.get("since"),
+            message.get("until"),
+            limit,
+        )
+        self.send(
+            writer,
+            {
+                "type": "logs",
+                "id": request_id,
+                "lines": [record.to_line() for record in records],
+            },
+        )
+
+    async def run_batch(self, writer, request_id, commands):
+        # Rooms run their commands in parallel but each room in the order
+        # given; a command for every room (room 0) waits for all before it
+        # and everything after it waits for it
+        last = {}
+        barrier = None
+        tasks = []
+        for index, item in enumerate(commands):
+            if not isinstance(item, dict):
+                item = {"room": None}
+            room = item.get("room", 0)
+            if not is_number(room):
+                room = None
+            if room == 0:
+                after = list(last.values())
+            else:
+                after = [last[room]] if room in last else []
+            if barrier is not None:
+                after.append(barrier)
+            task = asyncio.ensure_future(
+                self.run_command(writer, request_id, index, item, after)
+            )
+            if room == 0:
+                barrier = task
+                last = {}
+            elif room is not None:
+                last[room] = task
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+
+    async def run_command(self, writer, request_id, index, item, after):
+        if after:
+            await asyncio.wait(after)
+        result = await self.execute(item.get("room", 0), item.get("command"))
+        self.send(
+            writer,
+            {"type": "result", "id": request_id, "index": index, **result},
+        )
+
+
+def send_request(request, path=API_SOCKET):
+    # Blocking client: yields every reply to the request until it is done
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(encode_frame(request))
+        decoder = FrameDecoder()
+        while True:
+            data = client.recv(RECV_SIZE)
+            if not data:
+                return
+            for reply in decoder.feed(data):
+                yield reply
+                if reply.get("type") in ("done", "status", "logs", ERROR):
+                    return
+
+
+def parse_command(text) -> dict:
+    numbers = [int(value) for value in text.split()]
+    if len(numbers) == 1:
+        return {"room": 0, "command": numbers[0]}
+    if len(numbers) == 2:
+        return {"room": numbers[0], "command": numbers[1]}
+    raise ValueError(f"Invalid command: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Send menu commands to a running central server"
+    )
+    parser.add_argument(
+        "commands",
+        nargs="*",
+        help='"room command" as in the menu, e.g. "1 1" or "5"',
+    )
+    parser.add_argument("--socket", default=API_SOCKET)
+    parser.add_argument(
+        "--status", action="store_true", help="show rooms and alarms"
+    )
+    parser.add_argument(
+        "--logs", action="store_true", help="show the newest log lines"
+    )
+    parser.add_argument("--room", type=int, help="logs of a room, 0 = Central")
+    parser.add_argument("--action", help="logs of a device or action")
+    parser.add_argument("--since", help="YYYY-MM-DD HH:MM[:SS] or HH:MM")
+    parser.add_argument("--until", help="YYYY-MM-DD HH:MM[:SS] or HH:MM")
+    parser.add_argument("--limit", type=int, default=LOG_LIMIT)
+    args = parser.parse_args()
+    if args.status:
+        request = {"type": "status", "id": 1}
+    elif args.logs:
+        request = {
+            "type": "logs",
+            "id": 1,
+            "room": args.room,
+            "action": args.action,
+            "since": parse_date(args.since),
+            "until": parse_date(args.until, end=True),
+            "limit": args.limit,
+        }
+    elif args.commands:
+        try:
+            commands = [parse_command(text) for text in args.commands]
+        except ValueError as e:
+            parser.error(str(e))
+        request = {"type": "batch", "id": 1, "commands": commands}
+    else:
+        parser.error("give commands, --status or --logs")
+    for reply in send_request(request, args.socket):
+        if reply.get("type") == "logs":
+            print("\n".join(reply.get("lines")))
+        else:
+            print(json.dumps(reply))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+TIMED_OUT = "timed out"
+
+
+class BroadcastReport:
+    def __init__(self, action):
+        self.action = action
+        self.results = {}
+
+    def add(self, room, accepted, data, response):
+        if accepted:
+            status = ACCEPTED
+        elif response.get("status") == "timeout":
+            status = TIMED_OUT
+        else:
+            status = REJECTED
+        self.results[room.number] = (status, data, response.get("message"))
+
+    def rooms_with(self, status) -> list[int]:
+        return sorted(
+            number
+            for number, result in self.results.items()
+            if result[0] == status
+        )
+
+    def rooms_failed(self) -> list[int]:
+        return sorted(
+            number
+            for number, result in self.results.items()
+            if result[0] != ACCEPTED
+        )
+
+    def all_accepted(self) -> bool:
+        return len(self.rooms_with(ACCEPTED)) == len(self.results)
+
+    def describe_action(self) -> str:
+        if isinstance(self.action, dict):
+            return " ".join(
+                f"{key} {value}" for key, value in self.action.items()
+            )
+        return f"{self.action} toggle"
+
+    def show_in_screen(self) -> list[str]:
+        if not self.results:
+            return ["No rooms connected"]
+        messages = [
+            self.describe_action(),
+            f"{len(self.rooms_with(ACCEPTED))} accepted, "
+            f"{len(self.rooms_with(REJECTED))} rejected, "
+            f"{len(self.rooms_with(TIMED_OUT))} timed out",
+        ]
+        for number, (status, _, message) in sorted(self.results.items()):
+            if status != ACCEPTED:
+                messages.append(f"Room {number} {status}: {message}")
+        return messages
+
+    def log_action(self) -> dict:
+        if isinstance(self.action, dict):
+            action = dict(self.action)
+        else:
+            action = {self.action: "toggle"}
+        for status in (ACCEPTED, REJECTED, TIMED_OUT):
+            rooms = self.rooms_with(status)
+            if rooms:
+                action[status.replace(" ", "_")] = "/".join(
+                    str(number) for number in rooms
+                )
+        return action
+
+
+async def broadcast(rooms, action, deadline) -> BroadcastReport:
+    # Every room gets the command at once, so the whole broadcast takes as
+    # long as the slowest room and never more than the deadline.
+    report = BroadcastReport(action)
+    results = await asyncio.gather(
+        *[room.apply_action_async(action, deadline) for room in rooms]
+    )
+    for room, (accepted, data, response) in zip(rooms, results):
+        report.add(room, accepted, data, response)
+    return report
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+from protocol import (
+    BINARY,
+    BinaryCodec,
+    FrameDecoder,
+    FrameError,
+    RECV_SIZE,
+    choose_encoding,
+)
+
+
+class RoomServer:
+    # One event loop thread owns every room connection, so the number of
+    # threads stays the same no matter how many rooms are connected.
+    def __init__(
+        self,
+        sock,
+        room_factory,
+        on_room_connected=None,
+        on_room_reconnected=None,
+    ):
+        self.sock = sock
+        self.room_factory = room_factory
+        self.on_room_connected = on_room_connected
+        self.on_room_reconnected = on_room_reconnected
+        self.rooms = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.handlers = set()
+        self.ready = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def run_forever(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_connection, sock=self.sock)
+            )
+            self.ready.set()
+            self.loop.run_forever()
+        finally:
+            self.ready.set()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True)
+            )
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def shutdown(self):
+        if self.server is not None:
+            self.server.close()
+        for room in self.rooms.values():
+            room.connection.close()
+        # Let every room reader see its EOF instead of being cancelled
+        if self.handlers:
+            await asyncio.wait(self.handlers, timeout=1)
+
+    def call(self, coroutine, timeout=None):
+        # Run a coroutine on the room loop from any other thread
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("RoomServer.call would block the room loop")
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        return future.result(timeout)
+
+    def get_port(self) -> int:
+        return self.sock.getsockname()[1]
+
+    async def read_register(self, reader, decoder):
+        while True:
+            data = await reader.read(RECV_SIZE)
+            if not data:
+                return None
+            messages = decoder.feed(data, limit=1)
+            if messages:
+                return messages[0]
+
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            await self.serve_room(reader, writer)
+        finally:
+            self.handlers.discard(task)
+
+    async def serve_room(self, reader, writer):
+        decoder = FrameDecoder()
+        try:
+            register = await self.read_register(reader, decoder)
+        except (ConnectionError, FrameError):
+            register = None
+        if (
+            not isinstance(register, dict)
+            or register.get("type") != "register"
+        ):
+            writer.close()
+            return
+
+        name = register.get("data").get("name")
+        encoding = choose_encoding(register.get("data").get("encodings"))
+        if encoding == BINARY:
+            # Tag ids follow the order of the devices in the register
+            decoder.codec = BinaryCodec(register.get("data").get("devices"))
+        room = self.rooms.get(name)
+        if room is not None:
+            # Same room back after a disconnect: resume it, no duplicate
+            room.reattach(
+                writer.get_extra_info("peername"),
+                writer,
+                decoder,
+                register.get("data").get("seq"),
+            )
+            if self.on_room_reconnected:
+                self.on_room_reconnected(room)
+        else:
+            room = self.room_factory(
+                name,
+                writer.get_extra_info("peername"),
+                writer,
+                decoder,
+                **register.get("data").get("devices"),
+            )
+            room.loop = self.loop
+            room.snapshot_seq = register.get("data").get("seq") or 0
+            self.rooms[room.name] = room
+            if self.on_room_connected:
+                self.on_room_connected(room)
+        await room.listen_client(reader)
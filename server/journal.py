@@ -0,0 +1,136 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+HEADER = "place,action,date\n"
+
+
+class Journal:
+    # Callers only append to an in-memory buffer; a background thread
+    # writes everything buffered in one go and rotates the file.
+    def __init__(
+        self,
+        path,
+        max_buffer=10000,
+        flush_interval=0.5,
+        max_bytes=1 << 20,
+        rotate_seconds=24 * 60 * 60,
+        backups=5,
+    ):
+        self.path = path
+        self.buffer = deque(maxlen=max_buffer)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.condition = threading.Condition()
+        self.file = None
+        # When the current file got its first entry; a restart reads it
+        # back, so the rotation deadline does not move with the process
+        self.started_at = 0.0
+        self.thread = None
+        self.running = False
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, place, action) -> None:
+        timestamp = datetime.now().isoformat(sep=" ", timespec="milliseconds")
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(f"{place}, {action}, {timestamp}\n")
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.running:
+                    self.condition.wait(self.flush_interval)
+                lines = list(self.buffer)
+                self.buffer.clear()
+                running = self.running
+            if lines:
+                self.flush(lines)
+            if not running:
+                break
+
+    def flush(self, lines):
+        if self.file is None or self.should_rotate():
+            self.open_file()
+        self.file.write("".join(lines))
+        self.file.flush()
+        self.written += len(lines)
+        self.flushes += 1
+
+    def should_rotate(self) -> bool:
+        if self.file.tell() >= self.max_bytes:
+            return True
+        return time.time() - self.started_at >= self.rotate_seconds
+
+    def open_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.rotate()
+        elif os.path.exists(self.path):
+            self.started_at = self.get_started_at()
+            if (
+                os.path.getsize(self.path) >= self.max_bytes
+                or time.time() - self.started_at >= self.rotate_seconds
+            ):
+                self.rotate()
+        new_file = not os.path.exists(self.path)
+        self.file = open(self.path, "a")
+        if new_file:
+            self.file.write(HEADER)
+            self.started_at = time.time()
+
+    def get_started_at(self) -> float:
+        # Date of the first entry; files from before the entries carried
+        # a date fall back to the last write
+        with open(self.path, "r") as file:
+            file.readline()
+            line = file.readline()
+        if not line:
+            return time.time()
+        try:
+            date = datetime.fromisoformat(line.rstrip("\n").split(", ")[-1])
+        except ValueError:
+            return os.path.getmtime(self.path)
+        return date.timestamp()
+
+    def rotate(self):
+        # Sidecar files (the log query index) move with their log
+        for number in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{number}"
+            self.move(source, f"{self.path}.{number + 1}")
+        self.move(self.path, f"{self.path}.1")
+        self.rotations += 1
+
+    def move(self, source, target):
+        for suffix in ("", ".idx"):
+            if os.path.exists(source + suffix):
+                os.replace(source + suffix, target + suffix)
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+# Lines per index block: a query reads only the blocks whose rooms,
+# actions and time range can match.
+BLOCK_LINES = 4096
+# Bumped when the index stores something new, so old indexes are rebuilt
+INDEX_VERSION = 2
+# Fields of a broadcast line that list the rooms it reached, e.g.
+# "Central, lamp1 toggle accepted 1/2 timed_out 3, ..."
+ROOM_FIELDS = ("accepted", "rejected", "timed_out")
+
+
+class LogRecord:
+    def __init__(self, room, place, actions, date):
+        self.room = room
+        self.place = place
+        self.actions = actions
+        self.date = date
+
+    def __repr__(self):
+        return f"LogRecord({self.place}, {self.actions}, {self.date})"
+
+    def to_line(self) -> str:
+        actions = " ".join(
+            f"{key} {value}" for key, value in self.actions.items()
+        )
+        return f"{self.place}, {actions}, {self.date}"
+
+
+def parse_room(place) -> int:
+    if place == "Central":
+        return 0
+    return int(place.split()[1])
+
+
+def broadcast_rooms(actions) -> set[int]:
+    rooms = set()
+    for field in ROOM_FIELDS:
+        for number in actions.get(field, "").split("/"):
+            if number.isdigit():
+                rooms.add(int(number))
+    return rooms
+
+
+def parse_line(line):
+    fields = line.rstrip("\n").split(", ")
+    if len(fields) != 3 or fields[0] == "place,action,date":
+        return None
+    place, action, date = fields
+    try:
+        room = parse_room(place)
+    except (IndexError, ValueError):
+        return None
+    tokens = action.split()
+    actions = dict(zip(tokens[0::2], tokens[1::2]))
+    # Lines written before the journal only carry the time of day
+    if len(date) < 10 or date[4] != "-":
+        date = None
+    return LogRecord(room, place, actions, date)
+
+
+class LogIndex:
+    def __init__(self, path, block_lines=BLOCK_LINES):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.block_lines = block_lines
+        self.head = ""
+        self.size = 0
+        # Each block: [offset, end, first date, last date, rooms, actions]
+        self.blocks = []
+
+    def load(self):
+        try:
+            with open(self.index_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if (
+            data.get("version") != INDEX_VERSION
+            or data.get("block_lines") != self.block_lines
+        ):
+            return
+        self.head = data.get("head")
+        self.size = data.get("size")
+        self.blocks = [
+            [offset, end, first, last, set(rooms), set(actions)]
+            for offset, end, first, last, rooms, actions in data.get("blocks")
+        ]
+
+    def save(self):
+        data = {
+            "version": INDEX_VERSION,
+            "block_lines": self.block_lines,
+            "head": self.head,
+            "size": self.size,
+            "blocks": [
+                [offset, end, first, last, sorted(rooms), sorted(actions)]
+                for offset, end, first, last, rooms, actions in self.blocks
+            ],
+        }
+        temporary = f"{self.index_path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary, self.index_path)
+
+    def read_head(self, file) -> str:
+        file.seek(0)
+        file.readline()
+        return file.readline().decode("utf-8", "replace")
+
+    def update(self):
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as file:
+            head = self.read_head(file)
+            if head != self.head or size < self.size:
+                # The file was rotated or rewritten
+                self.blocks = []
+            self.head = head
+            if size == self.size and self.blocks:
+                return
+            # The last block may have been partial, index it again
+            offset = self.blocks.pop()[0] if self.blocks else 0
+            file.seek(offset)
+            block = None
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                if block is None:
+                    block = [offset, offset, None, None, set(), set(), 0]
+                    self.blocks.append(block)
+                offset += len(line)
+                block[1] = offset
+                block[6] += 1
+                fields = line[:-1].split(b", ")
+                if len(fields) == 3:
+                    place, action, date = fields
+                    block[4].add(place)
+                    tokens = action.split()
+                    block[5].update(tokens[0::2])
+                    # A broadcast also belongs to every room it reached
+                    for key, value in zip(tokens[0::2], tokens[1::2]):
+                        if key.decode("utf-8", "replace") in ROOM_FIELDS:
+                            block[4].update(
+                                b"Room " + number
+                                for number in value.split(b"/")
+                            )
+                    if date[4:5] == b"-":
+                        if block[2] is None:
+                            block[2] = date
+                        block[3] = date
+                if block[6] == self.block_lines:
+                    self.close_block(block)
+                    block = None
+            if block is not None:
+                self.close_block(block)
+            self.size = offset
+        self.save()
+
+    def close_block(self, block):
+        # Blocks are filled with raw bytes, keep them as rooms and strings
+        block.pop()
+        rooms = set()
+        for place in block[4]:
+            try:
+                rooms.add(parse_room(place.decode("utf-8", "replace")))
+            except (IndexError, ValueError):
+                continue
+        block[4] = rooms
+        block[5] = {action.decode("utf-8", "replace") for action in block[5]}
+        for position in (2, 3):
+            if block[position] is not None:
+                block[position] = block[position].decode("ascii", "replace")
+
+    def candidates(self, room=None, action=None, since=None, until=None):
+        for offset, end, first, last, rooms, actions in self.blocks:
+            if room is not None and room not in rooms:
+                continue
+            if action is not None and action not in actions:
+                continue
+            if since is not None and (last is None or last < since):
+                continue
+            if until is not None and (first is None or first > until):
+                continue
+            yield offset, end
+
+
+def log_files(path) -> list[str]:
+    # Oldest rotated file first, the live file last
+    files = []
+    number = 1
+    while os.path.exists(f"{path}.{number}"):
+        files.insert(0, f"{path}.{number}")
+        number += 1
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def matches(record, room, action, since, until) -> bool:
+    if record is None:
+        return False
+    if room is not None and record.room != room:
+        if record.room != 0 or room not in broadcast_rooms(record.actions):
+            return False
+    if action is not None and action not in record.actions:
+        return False
+    if since is not None or until is not None:
+        if record.date is None:
+            return False
+        if since is not None and record.date < since:
+            return False
+        if until is not None and record.date > until:
+            return False
+    return True
+
+
+def query(path, room=None, action=None, since=None, until=None):
+    # Dates are ISO strings, so they compare in time order as text
+    # Lines of the room itself and broadcasts, which may list it
+    prefixes = None
+    if room is not None:
+        prefixes = (b"Central, ",)
+        if room != 0:
+            prefixes += (f"Room {room}, ".encode(),)
+    for file_path in log_files(path):
+        index = LogIndex(file_path)
+        index.load()
+        index.update()
+        with open(file_path, "rb") as file:
+            for offset, end in index.candidates(room, action, since, until):
+                file.seek(offset)
+                for line in file.read(end - offset).splitlines():
+                    if prefixes is not None and not line.startswith(
+                        prefixes
+                    ):
+                        continue
+                    record = parse_line(line.decode("utf-8", "replace"))
+                    if matches(record, room, action, since, until):
+                        yield record
+
+
+def parse_date(value, end=False):
+    if value is None:
+        return None
+    if len(value) <= 8:
+        # Only a time was given, use today
+        value = f"{datetime.now().date().isoformat()} {value}"
+    date = datetime.fromisoformat(value)
+    if end:
+        # An end given as a day or a minute includes all of it
+        if len(value) == 10:
+            date = date.replace(hour=23, minute=59)
+        if len(value) <= 16:
+            date = date.replace(second=59, microsecond=999000)
+    return date.isoformat(sep=" ", timespec="milliseconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search the central server command and alarm log"
+    )
+    parser.add_argument("--file", default="server/logs.csv")
+    parser.add_argument("--room", type=int, help="room number, 0 = Central")
+    parser.add_argument("--action", help="device or action, e.g. lamp1")
+    parser.add_argument("--since", help="YYYY-MM-DD HH:MM[:SS] or HH:MM")
+    parser.add_argument("--until", help="YYYY-MM-DD HH:MM[:SS] or HH:MM")
+    parser.add_argument(
+        "--count", action="store_true", help="print only how many matched"
+    )
+    args = parser.parse_args()
+    records = query(
+        args.file,
+        room=args.room,
+        action=args.action,
+        since=parse_date(args.since),
+        until=parse_date(args.until, end=True),
+    )
+    if args.count:
+        print(sum(1 for _ in records))
+        return
+    for record in records:
+        print(record.to_line())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,76 @@
+import asyncio
+import collections
 import curses
+import itertools
 import json
-import socket
-import threading
+import math
+import textwrap
 import time
-from datetime import datetime
-from multiprocessing import Queue
 from curses.textpad import Textbox
+from api import API_SOCKET, CommandAPI
+from broadcast import ACCEPTED, REJECTED, TIMED_OUT, broadcast
+from engine import RoomServer
+from journal import Journal
+from logquery import query
+from protocol import (
+    BINARY,
+    JSON,
+    FrameDecoder,
+    FrameError,
+    RECV_SIZE,
+    encode_frame,
+)
+from rules import Rule, RuleEngine
+from screen import FPS, GridLayout, Renderer, put
+from stats import LatencyStats
+from timeseries import RingBuffer
+from tsstore import TelemetryStore
 from utils import commands_user
 
 import globals
 
+# Seconds a room has to answer a command before it is reported as timed out
+COMMAND_TIMEOUT = 5
+# Sensors that fire the alarm while the alarm system is on
+INTRUSION_SENSORS = ["presence_sensor", "window_sensor", "door_sensor"]
+# Seconds between bell commands to the rooms that did not accept it
+ALARM_RETRY = 2
+# DHT22 history: one sample every SAMPLE_PERIOD seconds, one hour kept, so
+# each sensor holds 2 x 360 doubles (5.6 KiB) however long the server runs
+SAMPLE_PERIOD = 10
+HISTORY_SIZE = 360
+TREND_WINDOWS = {"1 min": 6, "15 min": 90, "1 h": 360}
+DASHBOARD_WINDOW = "15 min"
+# A room cell whose device columns would be narrower than this shows the
+# compact summary instead
+MIN_DEVICE_WIDTH = 22
+# Short names for the compact summary, the device name otherwise
+COMPACT_NAMES = {
+    "lamp1": "Lamp1",
+    "lamp2": "Lamp2",
+    "air_conditioner": "AC",
+    "multimedia_projector": "Projector",
+    "presence_sensor": "Presence",
+    "window_sensor": "Window",
+    "door_sensor": "Door",
+    "smoke_sensor": "Smoke",
+    "alarm_bell": "Bell",
+    "alarm_system": "Alarm",
+}
+
 
 class Device:
     def __init__(self, name, tag, kind):
         self.name = name
         self.tag = tag
+        self.history = {}
+        self.updated = False
         if kind == "dth22":
             self.value = {"temperature": 0, "humidity": 0}
+            self.history = {
+                metric: RingBuffer(HISTORY_SIZE, TREND_WINDOWS.values())
+                for metric in self.value
+            }
         else:
             self.value = 0
         self.kind = kind
@@ -35,6 +89,36 @@ class Device:
 
     def set_value(self, value):
         self.value = value
+        self.updated = True
+
+    def sample(self):
+        # Nothing is recorded before the first reading arrives
+        if not self.updated:
+            return
+        for metric, buffer in self.history.items():
+            value = self.value.get(metric)
+            if isinstance(value, (int, float)):
+                buffer.append(value)
+
+    def get_trend(self, metric, window=DASHBOARD_WINDOW):
+        return self.history[metric].stats(TREND_WINDOWS[window])
+
+    def show_trend(self, metric, unit) -> str:
+        value = self.value[metric]
+        trend = self.get_trend(metric)
+        if trend is None:
+            return f"{value} {unit}"
+        low, high, mean = trend
+        if value > mean + 0.2:
+            arrow = "↑"
+        elif value < mean - 0.2:
+            arrow = "↓"
+        else:
+            arrow = "→"
+        return (
+            f"{value} {unit} {arrow} ({DASHBOARD_WINDOW}: "
+            f"{low:.1f}/{mean:.1f}/{high:.1f})"
+        )
 
     def turn_on_off(self):
         if self.value:
@@ -45,8 +129,8 @@ class Device:
     def show_in_screen(self) -> list[str]:
         if self.kind == "dth22":
             return [
-                f"Temperatura : {self.value['temperature']} °C",
-                f"Umidade : {self.value['humidity']} %",
+                f"Temperatura : {self.show_trend('temperature', '°C')}",
+                f"Umidade : {self.show_trend('humidity', '%')}",
             ]
         if self.tag == "people_count":
             value = self.value
@@ -54,6 +138,18 @@ class Device:
             value = "on" if self.value else "off"
         return [f"{self.name} : {value}"]
 
+    def show_compact(self) -> str:
+        # Readings always, other devices only while on
+        if self.kind == "dth22":
+            return (
+                f"{self.value['temperature']}°C {self.value['humidity']}%"
+            )
+        if self.tag == "people_count":
+            return f"{self.value} people"
+        if self.value:
+            return COMPACT_NAMES.get(self.tag, self.name)
+        return ""
+
 
 class Room:
     def __init__(
@@ -61,49 +157,74 @@ class Room:
         name,
         address,
         connection,
+        decoder=None,
         **kwargs,
     ):
         self.name = name
         self.number = int(name.split("_")[1])
         self.address = f"{address[0]}:{address[1]}"
-        self.pad = self.creat_new_pad()
+        self.pad = None
+        self.message_layout = (None, None)
         self.connected = True
+        self.reconnections = 0
         self.connection = connection
-        self.queueUpdates = Queue()
-        self.queueResponse = Queue()
+        self.decoder = decoder or FrameDecoder()
+        self.loop = None
+        self.on_change = None
+        self.on_sensor_change = None
+        self.on_values_change = None
+        self.on_backlog = None
+        self.redraw_pending = False
+        self.updates_applied = 0
+        self.pushes_received = 0
+        # Highest push sequence number applied, to drop resent pushes
+        self.last_seq = 0
+        # Sequence number the room had when it took the register snapshot;
+        # backlog entries past it are newer than the snapshot
+        self.snapshot_seq = 0
+        self.duplicates = 0
+        self.update_latency = LatencyStats()
+        self.request_ids = itertools.count(1)
+        self.pending_requests = {}
         for key, value in kwargs.items():
             setattr(self, key, Device(**value))
 
     def __repr__(self):
         return f"Room({self.name}, {self.number}, {self.address})"
 
-    def creat_new_pad(self):
-        _, _, rows_mid, cols_mid = self.get_screen_size()
-        return curses.newpad(rows_mid, cols_mid)
-
-    def get_screen_size(self) -> tuple[int, int, int, int]:
-        height, width = globals.stdscr_global.getmaxyx()  # type: ignore
-        cols_mid = int(0.5 * width)
-        rows_mid = int((1 / 3) * height)
-        return (height, width, rows_mid, cols_mid)
-
-    def get_pad_position(self) -> tuple[int, int, int, int]:
-        height, width, rows_mid, cols_mid = self.get_screen_size()
-        if self.number == 1:
-            return (rows_mid, 0, height - 1, cols_mid)
-        elif self.number == 2:
-            return (rows_mid, cols_mid, height - 1, width - 1)
-        elif self.number == 3:
-            return (rows_mid * 2, 0, height - 1, cols_mid * 2)
-        else:
-            return (rows_mid * 2, cols_mid, height - 1, width - 1)
-
-    def show_in_screen(self):
-        self.pad.clear()
-        rows, cols = self.pad.getmaxyx()
+    def get_message_positions(self, rows, cols, count) -> list:
+        # Row, column and width of each device line in a pad of this
+        # size: down the first column, then the next ones. It only changes
+        # with the size of the cell, so it is kept between redraws
+        key = (rows, cols, count)
+        if self.message_layout[0] != key:
+            per_column = max(1, rows - 4)
+            columns = math.ceil(count / per_column)
+            width = max(2, (cols - 3) // columns)
+            positions = [
+                (3 + index % per_column, 2 + index // per_column * width)
+                for index in range(count)
+            ]
+            self.message_layout = (key, (positions, width - 1))
+        return self.message_layout[1]
+
+    def show_in_screen(self, position):
+        # Drawn in the cell the layout gave this room; a room off screen
+        # has no pad at all
+        top, left, bottom, right = position
+        rows = bottom - top + 1
+        cols = right - left + 1
+        if self.pad is None or self.pad.getmaxyx() != (rows, cols):
+            self.pad = curses.newpad(rows, cols)
+        self.pad.erase()
         number = self.name.split("_")[1]
         message = f"Room {number} - Address {self.address}"
-        self.pad.addstr(1, int(cols / 2) - int(len(message) / 2), message)
+        if not self.connected:
+            message += " (disconnected)"
+        message = message[: cols - 2]
+        self.pad.addstr(
+            1, max(1, int(cols / 2) - int(len(message) / 2)), message
+        )
         self.pad.addstr(2, 0, "-" * cols)
         # Get all devices messages
         messages = []
@@ -111,133 +232,346 @@ class Room:
             if isinstance(value, Device):
                 messages.extend(value.show_in_screen())
 
-        row_message = 3
-        cols_message = 2
-        biggest_message = max(messages, key=len)
-
-        for message in messages:
-            if (
-                row_message >= rows - 1
-                and cols_message + len(biggest_message) >= cols
-            ):
-                break
-            elif (
-                row_message >= rows - 1
-                and cols_message + len(biggest_message) < cols
-            ):
-                cols_message += len(biggest_message) + 1
-                row_message = 3
-            self.pad.addstr(row_message, cols_message, message)
-            row_message += 1
+        positions, width = self.get_message_positions(
+            rows, cols, len(messages)
+        )
+        if width < MIN_DEVICE_WIDTH:
+            width = cols - 4
+            messages = self.get_summary(width)[: max(0, rows - 4)]
+            positions = [(3 + index, 2) for index in range(len(messages))]
+        for (row, col), message in zip(positions, messages):
+            if col + width < cols:
+                self.pad.addstr(row, col, message[:width])
         self.pad.border("|", "|", "-", "-", "+", "+", "+", "+")
-        self.refresh()
-
-    def refresh(self):
-        self.pad.refresh(0, 0, *self.get_pad_position())
-        globals.stdscr_global.noutrefresh()
-        curses.doupdate()
+        self.pad.noutrefresh(0, 0, top, left, bottom, right)
+
+    def get_summary(self, width) -> list[str]:
+        # Compact view for small cells: the readings, then what is on
+        readings = []
+        on = []
+        for device in self.__dict__.values():
+            if not isinstance(device, Device):
+                continue
+            text = device.show_compact()
+            if device.kind == "dth22" or device.tag == "people_count":
+                readings.append(text)
+            elif text:
+                on.append(text)
+        lines = [" ".join(readings)] if readings else []
+        lines += textwrap.wrap(
+            "On: " + " ".join(on) if on else "All off", width
+        )
+        return lines
 
-    def apply_action(self, action=None):
+    def build_action(self, action) -> dict:
         if type(action) == dict:
-            data = action
-        else:
-            data = {
-                action: "on"
-                if self.__dict__[action].get_value() == 0
-                else "of"
-            }
-        response = self.send_command(data)
-
-        if response.get("status") == "accepted":
-            body = response.get("data")
-            for key, value in body.items():
-                self.__dict__[key].set_value(value)
-            self.show_in_screen()
-            return True, data, response.get("message")
-        else:
-            return False, data, response.get("message")
-
-    def run(self):
-        thread = threading.Thread(target=self.lister_client)
-        thread.start()
-        thread2 = threading.Thread(target=self.apply_client_updates)
-        thread2.start()
+            return action
+        return {
+            action: "on" if self.__dict__[action].get_value() == 0 else "of"
+        }
+
+    def apply_response(self, response) -> bool:
+        if response.get("status") != "accepted":
+            return False
+        body = response.get("data")
+        for key, value in body.items():
+            self.__dict__[key].set_value(value)
+        if self.on_values_change:
+            self.on_values_change(self, list(body))
+        self.notify()
+        return True
 
-    def lister_client(self):
+    async def apply_action_async(self, action=None, timeout=COMMAND_TIMEOUT):
+        data = self.build_action(action)
+        response = await self.request(data, timeout)
+        return self.apply_response(response), data, response
+
+    def get_telemetry(self, tags=None) -> dict:
+        values = {}
+        for tag, device in self.__dict__.items():
+            if not isinstance(device, Device):
+                continue
+            if tags is not None and tag not in tags:
+                continue
+            if device.kind == "dth22" and not device.updated:
+                continue
+            values[tag] = device.value
+        return self.to_series(values)
+
+    def to_series(self, values) -> dict:
+        # Numeric readings by series name, a DHT22 gives one per metric
+        series = {}
+        for tag, value in values.items():
+            if not isinstance(self.__dict__.get(tag), Device):
+                continue
+            if isinstance(value, dict):
+                for metric, item in value.items():
+                    series[f"{self.name}/{metric}"] = item
+            else:
+                series[f"{self.name}/{tag}"] = value
+        return {
+            name: value
+            for name, value in series.items()
+            if isinstance(value, (int, float))
+        }
+
+    def sample_sensors(self):
+        for value in self.__dict__.values():
+            if isinstance(value, Device) and value.history:
+                value.sample()
+
+    def notify(self):
+        if self.on_change is None or self.redraw_pending:
+            return
+        if self.loop is None:
+            self.on_change(self)
+            return
+        # Changes made in the same loop iteration share a single redraw
+        self.redraw_pending = True
+        self.loop.call_soon_threadsafe(self.redraw)
+
+    def redraw(self):
+        self.redraw_pending = False
+        self.on_change(self)
+
+    async def listen_client(self, reader):
+        # A reattach swaps the connection, so this reader keeps its own
+        connection = self.connection
+        decoder = self.decoder
         try:
-            self.connection.send(
-                bytes(json.dumps(["Connected with the server"]), "utf-8")
-            )
+            # Still JSON: the room learns the encoding from this message
+            connection.write(encode_frame(self.get_greeting(decoder.codec)))
+            await connection.drain()
+            # Frames left over from the register handshake come first
+            messages = decoder.feed(b"")
+            received = time.perf_counter()
             while True:
                 if globals.stop_threads:
                     break
-                data = self.connection.recv(2048)
+                updates = {}
+                for data in messages:
+                    if not isinstance(data, dict):
+                        continue
+                    if data.get("type") == "push":
+                        if self.is_duplicate(data):
+                            continue
+                        self.pushes_received += 1
+                        updates.update(data.get("data"))
+                    elif data.get("type") == "backlog":
+                        self.apply_backlog(data.get("data"))
+                    elif data.get("type") == "response":
+                        self.resolve_request(data)
+                if updates:
+                    self.apply_client_updates(updates, received)
+                data = await reader.read(RECV_SIZE)
+                received = time.perf_counter()
                 if not data:
-                    time.sleep(0.4)
-                data = json.loads(data.decode("utf-8"))
-                if data.get("type") == "push":
-                    self.queueUpdates.put(data.get("data"))
-                elif data.get("type") == "response":
-                    self.queueResponse.put(data)
-        except socket.error:
+                    break
+                messages = decoder.feed(data)
+        except (ConnectionError, FrameError):
             pass
-            # self.connected = False
-            # self.connection.close()
-        except Exception:
-            time.sleep(0.4)
-            # print(f"Erro when listen the client {str(e)}")
+        finally:
+            connection.close()
+            if self.connection is connection:
+                self.connected = False
+                self.fail_pending_requests("Room disconnected")
+                self.notify()
+
+    def get_greeting(self, codec) -> dict:
+        greeting = {
+            "type": "welcome",
+            "message": "Connected with the server",
+            "encoding": JSON,
+        }
+        if codec is not None:
+            greeting["encoding"] = BINARY
+            greeting["tags"] = codec.tags
+        return greeting
+
+    def reattach(self, address, connection, decoder, seq=None):
+        # The room registered again: keep this Room, its history and
+        # hooks, and drop the old connection if it did not close yet
+        if seq is not None and seq < self.last_seq:
+            # The room lost its outbox and counts from the start again
+            self.last_seq = 0
+        self.snapshot_seq = seq or 0
+        old_connection = self.connection
+        self.address = f"{address[0]}:{address[1]}"
+        self.connection = connection
+        self.decoder = decoder
+        self.connected = True
+        self.reconnections += 1
+        old_connection.close()
+        # Requests sent on the old connection will never be answered
+        self.fail_pending_requests("Room reconnected")
+
+    def is_duplicate(self, message) -> bool:
+        seq = message.get("seq")
+        if seq is None:
+            return False
+        if seq <= self.last_seq:
+            self.duplicates += 1
+            return True
+        self.last_seq = seq
+        return False
 
-    def apply_client_updates(self):
-        while True:
-            if globals.stop_threads:
-                break
-            if not self.queueUpdates.empty():
-                devices_values = self.queueUpdates.get()
-                for key, value in devices_values.items():
-                    self.__dict__[key].set_value(value)
-                self.show_in_screen()
-            time.sleep(0.4)
-
-    def send_command(self, data):
-        if self.connected:
-            body = {"type": "post", "data": data}
-            self.connection.send(bytes(json.dumps(body), "utf-8"))
-            try:
-                response = self.queueResponse.get()
-                return response
-            except Exception as e:
-                return {"status": "error", "message": str(e)}
+    def apply_backlog(self, entries):
+        # Pushes the room kept while disconnected go to the history. Most
+        # are older than the snapshot sent with the register, but one that
+        # failed on a socket already replaced is not and is live state too
+        received = time.perf_counter()
+        entries = [entry for entry in entries if not self.is_duplicate(entry)]
+        if entries and self.on_backlog:
+            self.on_backlog(self, entries)
+        updates = {}
+        for entry in entries:
+            if entry.get("seq", 0) > self.snapshot_seq:
+                updates.update(entry.get("data"))
+        if updates:
+            self.apply_client_updates(updates, received)
+
+    def fail_pending_requests(self, message):
+        for future in self.pending_requests.values():
+            if not future.done():
+                future.set_result({"status": "error", "message": message})
+
+    def apply_client_updates(self, devices_values, received):
+        # Every push read together is merged, the latest value wins
+        changed = []
+        for key, value in devices_values.items():
+            device = self.__dict__.get(key)
+            if isinstance(device, Device):
+                if device.get_value() != value:
+                    changed.append(key)
+                device.set_value(value)
+        self.updates_applied += 1
+        self.update_latency.record(time.perf_counter() - received)
+        if changed and self.on_sensor_change:
+            self.on_sensor_change(self, changed, received)
+        if changed and self.on_values_change:
+            self.on_values_change(self, changed)
+        self.notify()
+
+    def resolve_request(self, response):
+        request_id = response.get("id")
+        if request_id is None and self.pending_requests:
+            # Clients without request ids answer in order
+            request_id = next(iter(self.pending_requests))
+        future = self.pending_requests.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    async def wait_response(self, future):
+        await self.connection.drain()
+        return await future
+
+    async def request(self, data, timeout=COMMAND_TIMEOUT):
+        request_id = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending_requests[request_id] = future
+        # The time lets a room on the same host see the delivery latency
+        body = {
+            "type": "post",
+            "id": request_id,
+            "time": time.time(),
+            "data": data,
+        }
+        try:
+            self.connection.write(encode_frame(body, self.decoder.codec))
+            return await asyncio.wait_for(
+                self.wait_response(future), timeout
+            )
+        except asyncio.TimeoutError:
+            return {
+                "status": "timeout",
+                "message": f"Room {self.number} did not answer in {timeout}s",
+            }
+        except ConnectionError as e:
+            return {"status": "error", "message": str(e)}
+        finally:
+            self.pending_requests.pop(request_id, None)
 
 
 class CentralServer:
-    def __init__(self, server):
-        self.people_count = 0
-        self.rooms_conneteds = 0
+    def __init__(self, server, config=None):
+        config = config or {}
         self.alarm_system = 0
         self.server = server
         self.buzzer = 0
         self.pad_dashboard = None
+        self.feedback_messages = None
+        self.box = None
+        self.renderer = None
+        self.layout = GridLayout()
+        self.fps = config.get("screen_fps", FPS)
+        self.journal = Journal(
+            config.get("log_file", "server/logs.csv"),
+            max_bytes=config.get("log_max_bytes", 1 << 20),
+            rotate_seconds=config.get("log_rotate_seconds", 24 * 60 * 60),
+            backups=config.get("log_backups", 5),
+        )
+        self.telemetry = TelemetryStore(
+            config.get("telemetry_dir", "server/telemetry"),
+            retention=config.get("telemetry_retention"),
+        )
+        self.rules = RuleEngine()
+        self.alarm_latency = LatencyStats()
+        self.load_alarm_rules()
+        self.engine = RoomServer(
+            server,
+            Room,
+            on_room_connected=self.add_room,
+            on_room_reconnected=self.resume_room,
+        )
+        self.api = CommandAPI(self, config.get("api_socket", API_SOCKET))
 
     def add_room(self, room: Room):
+        room.on_change = self.on_room_change
+        room.on_sensor_change = self.rules.evaluate
+        room.on_values_change = self.on_values_change
+        room.on_backlog = self.record_backlog
         setattr(self, room.name, room)
-        self.__dict__[room.name].run()
+        if self.has_screen():
+            self.add_room_panel(room)
+            self.renderer.invalidate("rooms")
         self.show_dashboard()
         self.show_instructions()
+        self.show_feedbacks_system(["New room connected", room.name])
+
+    def resume_room(self, room: Room):
+        self.show_feedbacks_system(["Room reconnected", room.name])
+        room.notify()
+
+    def on_room_change(self, room: Room):
+        if self.has_screen():
+            self.renderer.invalidate(room.name)
 
-    def turn_on_off_alarm_system(self):
+    def on_values_change(self, room: Room, tags):
+        self.record_telemetry(room, tags)
+        if "people_count" in tags:
+            self.show_dashboard()
+
+    def has_screen(self) -> bool:
+        # Headless, nothing is drawn and results only go to API clients
+        return self.renderer is not None
+
+    def get_rooms(self) -> list[Room]:
+        # A copy first: rooms are added from the room loop while the
+        # renderer and the API read them
+        return [
+            value
+            for value in list(self.__dict__.values())
+            if isinstance(value, Room)
+        ]
+
+    async def turn_on_off_alarm_system(self):
         command_applyed = {}
         if self.alarm_system == 0:
             triggers_dont_off = []
-            trigger_sensors = [
-                "presence_sensor",
-                "window_sensor",
-                "door_sensor",
-            ]
-            for sensor in trigger_sensors:
-                for key, value in self.__dict__.items():
-                    if isinstance(value, Room):
-                        if value.__dict__[sensor].value == 1:
-                            triggers_dont_off.append(sensor)
+            for sensor in INTRUSION_SENSORS:
+                for room in self.get_rooms():
+                    if room.__dict__[sensor].value == 1:
+                        triggers_dont_off.append(sensor)
 
             if triggers_dont_off:
                 return False, triggers_dont_off, {"alarm_system": "off"}
@@ -247,20 +581,15 @@ class CentralServer:
             self.alarm_system = 0
             command_applyed = {"alarm_system": "off"}
 
-        for key, value in self.__dict__.items():
-            if isinstance(value, Room):
-                value.apply_action(action=command_applyed)
+        report = await broadcast(
+            self.get_rooms(), command_applyed, COMMAND_TIMEOUT
+        )
         self.show_dashboard()
-        return True, None, command_applyed
+        return True, report, command_applyed
 
     def __repr__(self):
         return f"Central({self.__dict__})"
 
-    def refresh(self):
-        for key, value in self.__dict__.items():
-            if isinstance(value, Room):
-                value.refresh()
-
     def create_screen_feedbacks_system(self):
         height, width, rows_mid, cols_mid = self.get_screen_size()
         self.pad_feedbacks_system = curses.newpad(int(rows_mid / 2), cols_mid)
@@ -275,21 +604,42 @@ class CentralServer:
             width - 1,
         )
 
-    def update_rooms_info(self):
-        while True:
-            if globals.stop_threads:
-                break
-            self.rooms_conneteds = 0
-            self.people_count = 0
-            for key, value in self.__dict__.items():
-                if isinstance(value, Room):
-                    self.rooms_conneteds += 1
-                    if hasattr(value, "people_count"):
-                        self.people_count += value.__dict__.get(
-                            "people_count"
-                        ).get_value()
-            self.show_dashboard()
-            time.sleep(0.4)
+    def count_people(self) -> int:
+        return sum(
+            room.people_count.get_value()
+            for room in self.get_rooms()
+            if hasattr(room, "people_count")
+        )
+
+    def add_room_panel(self, room: Room):
+        self.renderer.add_panel(room.name, lambda: self.draw_room(room))
+
+    def draw_rooms(self):
+        # The rooms area: where each room goes, the page line, and a blank
+        # background for cells no room uses. Rooms that scrolled out of
+        # view drop their pad, the ones in view are drawn after this
+        height, width, rows_mid, cols_mid = self.get_screen_size()
+        rooms = sorted(self.get_rooms(), key=lambda room: room.number)
+        positions = self.layout.arrange(
+            [room.name for room in rooms],
+            rows_mid + 1,
+            0,
+            height - rows_mid - 1,
+            width,
+        )
+        for room in rooms:
+            if room.name in positions:
+                self.renderer.invalidate(room.name)
+            else:
+                room.pad = None
+        self.pad_rooms = curses.newpad(height - rows_mid, width)
+        put(self.pad_rooms, 0, 1, self.layout.describe()[: width - 2])
+        self.pad_rooms.noutrefresh(0, 0, rows_mid, 0, height - 1, width - 1)
+
+    def draw_room(self, room: Room):
+        position = self.layout.positions.get(room.name)
+        if position is not None:
+            room.show_in_screen(position)
 
     def get_screen_size(self):
         height, width = globals.stdscr_global.getmaxyx()
@@ -298,45 +648,53 @@ class CentralServer:
         return (height, width, rows_mid, cols_mid)
 
     def show_dashboard(self):
+        if self.has_screen():
+            self.renderer.invalidate("dashboard")
+
+    def draw_dashboard(self):
         height, width, rows_mid, cols_mid = self.get_screen_size()
         # Create pad dashboard
         self.pad_dashboard = curses.newpad(rows_mid, cols_mid)
         self.pad_dashboard.clear()
         self.pad_dashboard_position = (0, 0, rows_mid, cols_mid)
         self.pad_dashboard.border("|", "|", "-", "-", "+", "+", "+", "+")
-        self.pad_dashboard.addstr(1, 1, "System Dashboard", curses.A_BOLD)
+        put(self.pad_dashboard, 1, 1, "System Dashboard", curses.A_BOLD)
         rows, cols = self.pad_dashboard.getmaxyx()
-        self.pad_dashboard.addstr(2, 1, "-" * (cols - 2))
-        self.pad_dashboard.addstr(
-            3, 1, f"Rooms connected: {self.rooms_conneteds}"
+        put(self.pad_dashboard, 2, 1, "-" * (cols - 2))
+        put(
+            self.pad_dashboard,
+            3,
+            1,
+            f"Rooms connected: {len(self.get_rooms())}",
         )
-        self.pad_dashboard.addstr(
-            4, 1, f"Number of people: {self.people_count}"
+        put(
+            self.pad_dashboard,
+            4,
+            1,
+            f"Number of people: {self.count_people()}",
         )
-        self.pad_dashboard.addstr(
-            5, 1, f"Buzzer: {'ON' if self.buzzer else 'OFF'}"
+        put(
+            self.pad_dashboard,
+            5,
+            1,
+            f"Buzzer: {'ON' if self.buzzer else 'OFF'}",
         )
-        self.pad_dashboard.addstr(
-            6, 1, f"Alarm system: {'ON' if self.alarm_system else 'OFF'}"
+        put(
+            self.pad_dashboard,
+            6,
+            1,
+            f"Alarm system: {'ON' if self.alarm_system else 'OFF'}",
         )
-        self.show_rooms()
-        self.pad_dashboard.refresh(0, 0, *self.pad_dashboard_position)
-        globals.stdscr_global.noutrefresh()
-        curses.doupdate()
-
-    def show_rooms(self):
-        for key, value in self.__dict__.items():
-            if isinstance(value, Room):
-                value.show_in_screen()
+        self.pad_dashboard.noutrefresh(0, 0, *self.pad_dashboard_position)
 
     def get_rooms_conneteds(self):
-        return [
-            key.split("_")[1]
-            for key, value in self.__dict__.items()
-            if isinstance(value, Room)
-        ]
+        return [str(room.number) for room in self.get_rooms()]
 
     def show_instructions(self):
+        if self.has_screen():
+            self.renderer.invalidate("instructions")
+
+    def draw_instructions(self):
         height, width, rows_mid, cols_mid = self.get_screen_size()
         self.pad_instructions = curses.newpad(rows_mid, cols_mid * 2)
         self.pad_instructions.clear()
@@ -344,38 +702,42 @@ class CentralServer:
         self.pad_instructions.border("|", "|", "-", "-", "+", "+", "+", "+")
         rows, cols = self.pad_instructions.getmaxyx()
         if cols > 100:
-            self.pad_instructions.addstr(
+            put(
+                self.pad_instructions,
                 1,
                 1,
                 "Instructions: Write the number of the room and the number of the device to turn on/off",
                 curses.A_BOLD,
             )
         else:
-            self.pad_instructions.addstr(
+            put(
+                self.pad_instructions,
                 1,
                 1,
                 "Instructions:",
                 curses.A_BOLD,
             )
-        self.pad_instructions.addstr(2, 1, "-" * (cols - 2))
-        self.pad_instructions.addstr(3, 1, "1- Turn on/off lamp1")
-        self.pad_instructions.addstr(4, 1, "2- Turn on/off lamp2")
-        self.pad_instructions.addstr(5, 1, "3- Turn on/off Air conditioner")
-        self.pad_instructions.addstr(
-            6, 1, "4- Turn on/off Multimedia Projector"
+        put(self.pad_instructions, 2, 1, "-" * (cols - 2))
+        put(self.pad_instructions, 3, 1, "1- Turn on/off lamp1")
+        put(self.pad_instructions, 4, 1, "2- Turn on/off lamp2")
+        put(self.pad_instructions, 5, 1, "3- Turn on/off Air conditioner")
+        put(self.pad_instructions, 6, 1, "4- Turn on/off Multimedia Projector")
+        put(self.pad_instructions, 7, 1, "5- Turn on all lamps")
+
+        put(self.pad_instructions, 3, cols_mid + 1, "6- Turn off all lamps")
+        put(self.pad_instructions, 4, cols_mid + 1, "7- Turn on all devices")
+        put(self.pad_instructions, 5, cols_mid + 1, "8- Turn off all devices")
+        put(
+            self.pad_instructions,
+            6,
+            cols_mid + 1,
+            "9- Turn on/off systen alarm",
         )
-        self.pad_instructions.addstr(7, 1, "5- Turn on all lamps")
-
-        self.pad_instructions.addstr(3, cols_mid + 1, "6- Turn off all lamps")
-        self.pad_instructions.addstr(4, cols_mid + 1, "7- Turn on all devices")
-        self.pad_instructions.addstr(
-            5, cols_mid + 1, "8- Turn off all devices"
-        )
-        self.pad_instructions.addstr(
-            6, cols_mid + 1, "9- Turn on/off systen alarm"
-        )
-        self.pad_instructions.addstr(
-            7, cols_mid + 1, "10- Turn on/off buzzer alarm"
+        put(
+            self.pad_instructions,
+            7,
+            cols_mid + 1,
+            "10- Turn on/off buzzer alarm",
         )
         if cols > 100:
             # Notes
@@ -388,143 +750,273 @@ class CentralServer:
                 else:
                     number_of_roomns = rooms[0]
                 note = f"Note 1: You can turn on/off the devices of the room {number_of_roomns}"
-                self.pad_instructions.addstr(11, 1, note, curses.A_BOLD)
+                # Cut to the pad, a building lists many rooms
+                put(
+                    self.pad_instructions,
+                    11,
+                    1,
+                    note[: cols - 2],
+                    curses.A_BOLD,
+                )
             else:
                 note = "Note 1: There are no rooms connected"
-                self.pad_instructions.addstr(
-                    11, 1, note, curses.A_BOLD | curses.A_BLINK
+                put(
+                    self.pad_instructions,
+                    11,
+                    1,
+                    note,
+                    curses.A_BOLD | curses.A_BLINK,
                 )
 
-            self.pad_instructions.addstr(
+            put(
+                self.pad_instructions,
                 12,
                 1,
                 "Note 2: All devices is [lamp1, lamp2, air conditioner, multimedia projector]",
                 curses.A_BOLD,
             )
-            self.pad_instructions.addstr(
+            put(
+                self.pad_instructions,
                 13,
                 1,
                 "Note 3: To apply a command to all rooms, write the number 0",
                 curses.A_BOLD,
             )
-            self.pad_instructions.addstr(
+            put(
+                self.pad_instructions,
                 14,
                 1,
                 "Note 4: To send a command to all devices, just write the number of action",
                 curses.A_BOLD,
             )
+            if rows > 16:
+                put(
+                    self.pad_instructions,
+                    15,
+                    1,
+                    "Note 5: Write logs or logs <room> to see the last commands",
+                    curses.A_BOLD,
+                )
 
-            self.pad_instructions.addstr(
-                9, cols_mid + 1, "Examples: 1 1", curses.A_REVERSE
+            put(
+                self.pad_instructions,
+                9,
+                cols_mid + 1,
+                "Examples: 1 1",
+                curses.A_REVERSE,
             )
 
-        self.pad_instructions.refresh(0, 0, *self.pad_instructions_position)
-        globals.stdscr_global.noutrefresh()
-        curses.doupdate()
+        self.pad_instructions.noutrefresh(
+            0, 0, *self.pad_instructions_position
+        )
 
-    def show_text_box(self):
-        while True:
-            if globals.stop_threads:
-                break
-            height, width, rows_mid, cols_mid = self.get_screen_size()
-            nlines = int(rows_mid / 2)
-            ncols = cols_mid
-            begin_y = 0
-            begin_x = cols_mid * 3
-            win = curses.newwin(nlines, ncols, begin_y, begin_x)
-            win.clear()
-            win.border("|", "|", "-", "-", "+", "+", "+", "+")
-            win.addstr(1, 1, "Write a Command", curses.A_BOLD)
-            win.addstr(2, 1, "-" * (ncols - 2))
-            win.refresh()
-            sub = win.derwin(1, ncols - 2, 3, 1)
-            sub.clear()
-            self.box = Textbox(sub, insert_mode=True)
-            self.box.edit(enter_is_terminate)
+    def draw_text_box(self):
+        # Drawn once and after a resize: redrawing it would drop what is
+        # being typed
+        height, width, rows_mid, cols_mid = self.get_screen_size()
+        nlines = int(rows_mid / 2)
+        ncols = cols_mid
+        begin_y = 0
+        begin_x = cols_mid * 3
+        win = curses.newwin(nlines, ncols, begin_y, begin_x)
+        win.clear()
+        win.border("|", "|", "-", "-", "+", "+", "+", "+")
+        win.addstr(1, 1, "Write a Command", curses.A_BOLD)
+        win.addstr(2, 1, "-" * (ncols - 2))
+        win.noutrefresh()
+        sub = win.derwin(1, ncols - 2, 3, 1)
+        sub.clear()
+        self.box = Textbox(sub, insert_mode=True)
+        self.renderer.set_input(sub, self.handle_key)
+
+    def handle_key(self, key):
+        if key == curses.KEY_RESIZE:
+            self.renderer.invalidate_all()
+        elif key in (curses.KEY_NPAGE, curses.KEY_PPAGE):
+            self.layout.page(1 if key == curses.KEY_NPAGE else -1)
+            self.renderer.invalidate("rooms")
+        elif key in (curses.KEY_DOWN, curses.KEY_UP):
+            self.layout.scroll(1 if key == curses.KEY_DOWN else -1)
+            self.renderer.invalidate("rooms")
+        elif key in (10, 13, curses.KEY_ENTER):
             command = self.box.gather()
-            if self.valid_inputs(command):
+            self.box.win.erase()
+            if command.split()[:1] == ["logs"]:
+                self.show_logs(command)
+            elif self.valid_inputs(command):
                 self.apply_command(command)
-            globals.stdscr_global.noutrefresh()
-            curses.doupdate()
-            time.sleep(0.4)
+        else:
+            self.box.do_command(key)
 
     def parse_user_input(self, user_input):
-        user_input = user_input.strip().split()
-        if len(user_input) == 2:
-            room = int(user_input[0])
-            device = int(user_input[1])
-            return room, commands_user.get(device), device
-        if len(user_input) == 1:
-            device = int(user_input[0])
-            return 0, commands_user.get(device), device
+        # "command" runs in every room, "room command" in one of them
+        numbers = [int(value) for value in user_input.strip().split()]
+        if len(numbers) == 1:
+            return 0, numbers[0]
+        if len(numbers) == 2:
+            return numbers[0], numbers[1]
+        return None
 
     def apply_command(self, command):
-        room, action, id_command = self.parse_user_input(command)
+        # The menu is one more API client: the box is free again at once
+        # and the result shows up when the rooms answer
+        room, id_command = self.parse_user_input(command)
+        future = self.api.submit(room, id_command)
+        future.add_done_callback(self.show_command_result)
+
+    def show_logs(self, command):
+        # "logs" or "logs <room>": the newest lines that fit the panel
+        values = command.split()[1:]
+        if len(values) > 1 or not all(value.isdigit() for value in values):
+            self.show_feedbacks_system(["Write logs or logs <room>"])
+            return
+        room = int(values[0]) if values else None
+        rows = int(self.get_screen_size()[2] / 2)
+        future = self.api.submit_logs(room=room, limit=max(1, rows - 4))
+        future.add_done_callback(self.show_logs_result)
+
+    def show_logs_result(self, future):
+        try:
+            records = future.result()
+        except Exception as e:
+            self.show_feedbacks_system(["Log query failed", str(e)])
+            return
+        if not records:
+            self.show_feedbacks_system(["No log entries"])
+            return
+        lines = []
+        for record in records:
+            # The panel is narrow: time of day only
+            time_of_day = (record.date or "")[11:19] or "--:--:--"
+            actions = " ".join(
+                f"{key} {value}" for key, value in record.actions.items()
+            )
+            lines.append(f"{time_of_day} {record.place} {actions}")
+        self.show_feedbacks_system(lines)
+
+    def show_command_result(self, future):
+        try:
+            messages = future.result().get("messages")
+        except Exception as e:
+            messages = ["Command failed", str(e)]
+        self.show_feedbacks_system(messages)
+
+    def validate_command(self, room, id_command):
+        # None when the menu would run the command, the reason otherwise
         if room == 0:
-            if id_command == 9:
-                (
-                    status,
-                    message,
-                    command_applyed,
-                ) = self.turn_on_off_alarm_system()
-
-                if status:
-                    self.show_feedbacks_system(
-                        ["Command applied successfully"]
-                    )
-                else:
-                    if len(message) == 1:
-                        message_devices = message[0]
-                    else:
-                        message_devices = "{} and {}".format(
-                            ", ".join(str(x) for x in message[:-1]),
-                            message[-1],
-                        )
-                    self.log_command(
-                        {
-                            "local": 0,
-                            "action": command_applyed,
-                        }
-                    )
-                    self.show_feedbacks_system(
-                        [
-                            "Command not applied,"
-                            f"The devices {message_devices} ",
-                            "are on and the alarm system",
-                            " can't be turned on",
-                        ]
-                    )
-            elif id_command == 10:
-                if self.turn_on_off_buzzer():
-                    self.show_feedbacks_system(
-                        ["Command applied successfully"]
-                    )
-                else:
-                    self.show_feedbacks_system(
-                        [
-                            "Command not applied",
-                        ]
-                    )
+            if id_command not in commands_user:
+                return "Command not found"
+            return None
+        if not self.get_rooms():
+            return "No rooms connected"
+        target = self.__dict__.get(f"room_{room}")
+        if not isinstance(target, Room):
+            return "Invalid room number, try again"
+        if id_command not in range(1, 10):
+            return "Invalid action, try again"
+        if not target.connected:
+            return f"Room {room} disconnected"
+        return None
+
+    async def execute(self, room, id_command) -> dict:
+        # One menu command, run on the room loop. The result says what
+        # happened; showing it is up to whoever asked
+        error = self.validate_command(room, id_command)
+        if error:
+            return {"status": REJECTED, "messages": [error]}
+        action = commands_user[id_command]
+        if room != 0:
+            accepted, data, response = await self.__dict__[
+                f"room_{room}"
+            ].apply_action_async(action)
+            if accepted:
+                self.log_command({"local": room, "action": data})
+                status = ACCEPTED
+            elif response.get("status") == "timeout":
+                status = TIMED_OUT
             else:
-                for num_room in self.get_rooms_conneteds():
-                    self.__dict__[f"room_{num_room}"].apply_action(
-                        action=action
+                status = REJECTED
+            return {
+                "status": status,
+                "action": data,
+                "messages": [response.get("message", "")],
+            }
+        if id_command == 9:
+            applied, report, command_applyed = (
+                await self.turn_on_off_alarm_system()
+            )
+            if not applied:
+                self.log_command({"local": 0, "action": command_applyed})
+                if len(report) == 1:
+                    message_devices = report[0]
+                else:
+                    message_devices = "{} and {}".format(
+                        ", ".join(str(x) for x in report[:-1]),
+                        report[-1],
                     )
-                self.log_command({"local": 0, "action": action})
+                return {
+                    "status": REJECTED,
+                    "action": command_applyed,
+                    "messages": [
+                        "Command not applied,"
+                        f"The devices {message_devices} ",
+                        "are on and the alarm system",
+                        " can't be turned on",
+                    ],
+                }
+        elif id_command == 10:
+            report = await self.turn_on_off_buzzer()
         else:
-            accept, command_applyed, message = self.__dict__[
-                f"room_{room}"
-            ].apply_action(action=action)
-            messages = ["Valid command, applying..."]
-            messages.append(message)
-            self.show_feedbacks_system(messages)
-            if accept:
-                self.log_command(
-                    {
-                        "local": room,
-                        "action": command_applyed,
-                    }
-                )
+            report = await broadcast(self.get_rooms(), action, COMMAND_TIMEOUT)
+        self.log_command({"local": 0, "action": report.log_action()})
+        return {
+            "status": ACCEPTED if report.all_accepted() else REJECTED,
+            "action": report.action,
+            "rooms": {
+                str(number): result[0]
+                for number, result in report.results.items()
+            },
+            "messages": report.show_in_screen(),
+        }
+
+    def get_status(self) -> dict:
+        return {
+            "alarm_system": self.alarm_system,
+            "buzzer": self.buzzer,
+            "people_count": self.count_people(),
+            "rooms": [
+                {
+                    "number": room.number,
+                    "address": room.address,
+                    "connected": room.connected,
+                    "devices": {
+                        tag: device.value
+                        for tag, device in room.__dict__.items()
+                        if isinstance(device, Device)
+                    },
+                }
+                for room in self.get_rooms()
+            ],
+        }
+
+    async def record_sensor_history(self):
+        while True:
+            await asyncio.sleep(SAMPLE_PERIOD)
+            for room in self.get_rooms():
+                room.sample_sensors()
+                self.record_telemetry(room)
+                room.notify()
+
+    def record_telemetry(self, room, tags=None):
+        timestamp = time.time()
+        for series, value in room.get_telemetry(tags).items():
+            self.telemetry.record(series, value, timestamp)
+
+    def record_backlog(self, room, entries):
+        # Each entry at the time the room flushed it, not when it arrived
+        for entry in entries:
+            for series, value in room.to_series(entry.get("data")).items():
+                self.telemetry.record(series, value, entry.get("time"))
 
     def log_command(self, log_command):
         local = log_command.get("local")
@@ -535,60 +1027,35 @@ class CentralServer:
                 for key, value in log_command.get("action").items()
             ]
         )
-        log_message = f"{place}, {actions}, {datetime.now().time()}\n"
-        with open("server/logs.csv", "a") as f:
-            f.write(log_message)
+        self.journal.write(place, actions)
+
+    def query_logs(
+        self, room=None, action=None, since=None, until=None, limit=None
+    ):
+        # The newest `limit` matching records of the journal and its
+        # rotated files, newest first
+        records = query(self.journal.path, room, action, since, until)
+        return list(reversed(collections.deque(records, maxlen=limit)))
 
     def valid_inputs(self, command):
-        command = command.strip().split()
         try:
-            if len(command) == 1 and int(command[0]) in range(1, 11):
-                return True
-            elif len(command) == 1:
-                self.show_feedbacks_system(["Command not found"])
-                return False
-
-            if len(command) == 2:
-                room = command[0]
-                action = command[1]
-                if room.isdigit() and action.isdigit():
-                    if self.rooms_conneteds == 0:
-                        self.show_feedbacks_system(["No rooms connected"])
-                        return False
-                    if self.__dict__.get(f"room_{room}"):
-                        if int(action) in range(1, 10):
-                            self.show_feedbacks_system(
-                                ["Valid command, applying..."]
-                            )
-                            return True
-                        else:
-                            self.show_feedbacks_system(
-                                ["Invalid action, try again"]
-                            )
-                    else:
-                        self.show_feedbacks_system(
-                            ["Invalid room number, try again"]
-                        )
-
+            parsed = self.parse_user_input(command)
         except ValueError:
             self.show_feedbacks_system(
                 ["Invalid command, try again", "Writer only numbers"]
             )
-        else:
+            return False
+        if parsed is None:
             self.show_feedbacks_system(["Invalid command, try again"])
-        return False
-
-    def turn_on_buzzer(self):
-        if not self.buzzer:
-            self.buzzer = 1
-            for num_room in self.get_rooms_conneteds():
-                self.__dict__[f"room_{num_room}"].apply_action(
-                    action={"alarm_bell": "on"}
-                )
-        self.show_dashboard()
-        return
+            return False
+        error = self.validate_command(*parsed)
+        if error:
+            self.show_feedbacks_system([error])
+            return False
+        self.show_feedbacks_system(["Valid command, applying..."])
+        return True
 
-    def turn_on_off_buzzer(self):
+    async def turn_on_off_buzzer(self):
         action = {}
         if self.buzzer:
             action = {"alarm_bell": "off"}
@@ -596,154 +1063,155 @@ class CentralServer:
         else:
             self.buzzer = 1
             action = {"alarm_bell": "on"}
-        for num_room in self.get_rooms_conneteds():
-            self.__dict__[f"room_{num_room}"].apply_action(action)
-        return True
+        report = await broadcast(self.get_rooms(), action, COMMAND_TIMEOUT)
+        self.show_dashboard()
+        return report
+
+    def load_alarm_rules(self):
+        self.rules.add_rule(
+            Rule(
+                "intrusion",
+                INTRUSION_SENSORS,
+                lambda room, sensor: self.alarm_system
+                and room.__dict__[sensor].get_value(),
+                self.trigger_alarm,
+            )
+        )
+        self.rules.add_rule(
+            Rule(
+                "smoke",
+                ["smoke_sensor"],
+                lambda room, sensor: not self.alarm_system
+                and room.__dict__[sensor].get_value(),
+                self.trigger_alarm,
+            )
+        )
 
-    def watch_alarm_trigger(self):
-        trigger_sensors = [
-            "presence_sensor",
-            "window_sensor",
-            "door_sensor",
-        ]
-        while True:
-            if globals.stop_threads:
-                break
-            if self.alarm_system:
-                for num_room in self.get_rooms_conneteds():
-                    for trigger_sensor in trigger_sensors:
-                        if (
-                            self.__dict__[f"room_{num_room}"]
-                            .__dict__[trigger_sensor]
-                            .get_value()
-                            and self.alarm_system
-                        ):
-                            self.turn_on_buzzer()
-                            self.log_command(
-                                {
-                                    "local": num_room,
-                                    "action": {
-                                        "buzzer": "on",
-                                        trigger_sensor: "on",
-                                    },
-                                }
-                            )
-                            self.show_feedbacks_system(
-                                [
-                                    "Alarm triggered by",
-                                    f"{trigger_sensor} in room {num_room}",
-                                ]
-                            )
-            else:
-                for num_room in self.get_rooms_conneteds():
-                    if (
-                        self.__dict__[f"room_{num_room}"]
-                        .__dict__["smoke_sensor"]
-                        .get_value()
-                    ):
-                        self.turn_on_buzzer()
-                        self.log_command(
-                            {
-                                "local": num_room,
-                                "action": {
-                                    "buzzer": "on",
-                                    "smoke_sensor": "on",
-                                },
-                            }
-                        )
-                        self.show_feedbacks_system(
-                            [
-                                "Alarm triggered by",
-                                f"smoke_sensor in room {num_room}",
-                            ]
-                        )
-            time.sleep(1)
+    def trigger_alarm(self, room, sensor, detected_at):
+        # Rules run on the room loop, so the buzzer broadcast is scheduled
+        # there instead of waited for
+        asyncio.ensure_future(self.sound_alarm(room, sensor, detected_at))
+
+    async def sound_alarm(self, room, sensor, detected_at):
+        if not self.buzzer:
+            self.buzzer = 1
+            report = await broadcast(
+                self.get_rooms(), {"alarm_bell": "on"}, COMMAND_TIMEOUT
+            )
+            if report.rooms_failed():
+                asyncio.ensure_future(
+                    self.retry_alarm_bell(report.rooms_failed(), room, sensor)
+                )
+        self.alarm_latency.record(time.perf_counter() - detected_at)
+        self.log_command(
+            {
+                "local": room.number,
+                "action": {
+                    "buzzer": "on",
+                    sensor: "on",
+                },
+            }
+        )
+        self.show_feedbacks_system(
+            [
+                "Alarm triggered by",
+                f"{sensor} in room {room.number}",
+            ]
+        )
+        self.show_dashboard()
+
+    async def retry_alarm_bell(self, numbers, room, sensor):
+        # The rule only fires on a change, so a room that timed out or
+        # rejected the bell gets it again while the sensor that fired stays
+        # on, until every room accepted or the buzzer is turned off
+        while numbers:
+            await asyncio.sleep(ALARM_RETRY)
+            if not self.buzzer or not room.__dict__[sensor].get_value():
+                return
+            rooms = [
+                target
+                for target in self.get_rooms()
+                if target.number in numbers
+            ]
+            report = await broadcast(
+                rooms, {"alarm_bell": "on"}, COMMAND_TIMEOUT
+            )
+            numbers = report.rooms_failed()
 
     def show_feedbacks_system(self, messages=None) -> None:
+        self.feedback_messages = messages
+        if self.has_screen():
+            self.renderer.invalidate("feedbacks")
+
+    def draw_feedbacks_system(self):
+        messages = self.feedback_messages
         self.create_screen_feedbacks_system()
-        self.pad_feedbacks_system.addstr(1, 1, "System messages")
+        put(self.pad_feedbacks_system, 1, 1, "System messages")
         rows, cols = self.pad_feedbacks_system.getmaxyx()
-        self.pad_feedbacks_system.addstr(2, 1, "-" * (cols - 2))
+        put(self.pad_feedbacks_system, 2, 1, "-" * (cols - 2))
         # TODO: messages in the box scroll up when the number of messages is
         # greater than the number of rows
         if messages:
             for i, message in enumerate(messages):
                 if i < rows - 3:
-                    self.pad_feedbacks_system.addstr(i + 3, 1, message)
+                    # Cut to the pad, log lines are wider than it
+                    put(
+                        self.pad_feedbacks_system,
+                        i + 3,
+                        1,
+                        message[: cols - 2],
+                    )
                 else:
-                    self.pad_feedbacks_system.addstr(3, 1, "...")
+                    put(self.pad_feedbacks_system, 3, 1, "...")
 
-        self.pad_feedbacks_system.refresh(
+        self.pad_feedbacks_system.noutrefresh(
             0, 0, *self.pad_feedbacks_system_position
         )
-        globals.stdscr_global.noutrefresh()
-        curses.doupdate()
 
-    def listen_connections(self):
-        while True:
-            if globals.stop_threads:
-                break
-            self.server.listen(socket.INADDR_ANY)
-            try:
-                client_socket, client_address = self.server.accept()
-                self.show_feedbacks_system(
-                    [
-                        "New room connected",
-                        "Waiting for configuration...",
-                    ]
-                )
-                time.sleep(1)
-            except OSError:
-                pass
-                # break
-            else:
-                self.rooms_conneteds += 1
-
-                while True:
-                    data = client_socket.recv(2048)  # the client send a json
-                    if data:
-                        break
-                configure_file = json.loads(data.decode("utf-8"))
-                room_name = configure_file.get("data").get("name")
-                devices = configure_file.get("data").get("devices")
-                room = Room(
-                    room_name,
-                    client_address,
-                    client_socket,
-                    **devices,
-                )
-                self.add_room(room)
-            if self.rooms_conneteds == 4:
-                break
-            time.sleep(3)
+    def start(self):
+        self.journal.start()
+        self.telemetry.start()
+        self.engine.start()
+        asyncio.run_coroutine_threadsafe(
+            self.record_sensor_history(), self.engine.loop
+        )
+        self.engine.call(self.api.start())
+
+    def stop(self):
+        globals.stop_threads = True
+        self.engine.call(self.api.stop())
+        self.engine.stop()
+        self.telemetry.stop()
+        self.journal.stop()
+
+    def create_renderer(self):
+        self.renderer = Renderer(self.fps)
+        self.renderer.add_panel("dashboard", self.draw_dashboard)
+        self.renderer.add_panel("instructions", self.draw_instructions)
+        self.renderer.add_panel("feedbacks", self.draw_feedbacks_system)
+        self.renderer.add_panel("text_box", self.draw_text_box)
+        self.renderer.add_panel("rooms", self.draw_rooms)
+        for room in self.get_rooms():
+            self.add_room_panel(room)
 
     def run(self):
         globals.stdscr_global.clear()
         globals.stdscr_global.refresh()
-        listen_connections_thread = threading.Thread(
-            target=self.listen_connections
-        )
-        text_box_thread = threading.Thread(target=self.show_text_box)
-        dashboard_thread = threading.Thread(target=self.update_rooms_info)
-        watch_alarm_trigger_thread = threading.Thread(
-            target=self.watch_alarm_trigger
-        )
-        listen_connections_thread.start()
-        text_box_thread.start()
-        dashboard_thread.start()
-        watch_alarm_trigger_thread.start()
-        self.show_dashboard()
-        self.show_instructions()
-        self.show_feedbacks_system()
-        globals.stdscr_global.refresh()
-        text_box_thread.join()
-
-
-def enter_is_terminate(x):
-    # fucntion to suport the text box
-    if x == 10:
-        return 7
-    return x
+        self.create_renderer()
+        self.start()
+        # The screen belongs to this thread until the server stops
+        self.renderer.run()
+
+    def run_headless(self):
+        # No curses: commands only come in through the API socket
+        self.start()
+        try:
+            while not globals.stop_threads:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
 
 
 def load_commands():
@@ -0,0 +1,265 @@
+import json
+import struct
+
+# Every message on the room <-> central socket is a 4 byte big-endian length
+# followed by the payload: UTF-8 JSON, or the binary encoding below when
+# both sides agreed on it in the register handshake. client/protocol.py is
+# a link to this file, so the two sides cannot drift apart.
+HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 1 << 20
+RECV_SIZE = 4096
+
+JSON = "json"
+BINARY = "binary"
+# JSON payloads start with "{" or "[", binary ones with this byte, so the
+# decoder tells them apart frame by frame
+BINARY_MARKER = 0xB1
+# Strings every message uses get an id without being negotiated. The
+# device tags of the room are appended after them at register time.
+# Changing this list changes the encoding: both sides must agree.
+SYMBOLS = (
+    "type",
+    "message",
+    "data",
+    "id",
+    "seq",
+    "time",
+    "status",
+    "name",
+    "push",
+    "post",
+    "response",
+    "backlog",
+    "ok",
+    "snapshot",
+    "accepted",
+    "error",
+    "Command applied",
+    "temperature",
+    "humidity",
+)
+# Value types of the binary encoding
+NONE, FALSE, TRUE, INT, TENTHS, FLOAT, STRING, SYMBOL, LIST, DICT = range(10)
+DOUBLE = struct.Struct("!d")
+# Lists and dicts nested deeper than this are refused instead of running
+# the decoder out of stack; real messages nest two or three levels
+MAX_DEPTH = 32
+
+
+class FrameError(Exception):
+    pass
+
+
+def choose_encoding(offered) -> str:
+    # The central picks; a room that offers nothing gets JSON
+    if offered and BINARY in offered:
+        return BINARY
+    return JSON
+
+
+class BinaryCodec:
+    # Compact encoding of the same messages JSON carries: known strings
+    # and device tags become small integer ids, integers are varints and
+    # readings with one decimal are sent as a varint of tenths.
+    def __init__(self, tags=()):
+        self.tags = [tag for tag in tags if tag not in SYMBOLS]
+        self.symbols = list(SYMBOLS) + self.tags
+        self.ids = {symbol: index for index, symbol in enumerate(self.symbols)}
+
+    def encode(self, message) -> bytes:
+        out = bytearray((BINARY_MARKER,))
+        self.write(out, message)
+        return bytes(out)
+
+    def write(self, out, value):
+        if value is None:
+            out.append(NONE)
+        elif value is True:
+            out.append(TRUE)
+        elif value is False:
+            out.append(FALSE)
+        elif isinstance(value, int):
+            out.append(INT)
+            write_varint(out, zigzag(value))
+        elif isinstance(value, float):
+            tenths = round(value * 10) if abs(value) < 1e15 else None
+            if tenths is not None and tenths / 10 == value:
+                out.append(TENTHS)
+                write_varint(out, zigzag(tenths))
+            else:
+                out.append(FLOAT)
+                out += DOUBLE.pack(value)
+        elif isinstance(value, str):
+            index = self.ids.get(value)
+            if index is not None:
+                out.append(SYMBOL)
+                write_varint(out, index)
+            else:
+                data = value.encode("utf-8")
+                out.append(STRING)
+                write_varint(out, len(data))
+                out += data
+        elif isinstance(value, dict):
+            out.append(DICT)
+            write_varint(out, len(value))
+            for key, item in value.items():
+                # JSON turns every key into a string, so does this
+                self.write(out, key if isinstance(key, str) else str(key))
+                self.write(out, item)
+        elif isinstance(value, (list, tuple)):
+            out.append(LIST)
+            write_varint(out, len(value))
+            for item in value:
+                self.write(out, item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__}")
+
+    def decode(self, payload):
+        try:
+            value, offset = self.read(payload, 1)
+        except (IndexError, struct.error) as e:
+            raise ValueError(f"Truncated binary payload: {e}")
+        if offset != len(payload):
+            raise ValueError("Trailing bytes in binary payload")
+        return value
+
+    def read(self, payload, offset, depth=0):
+        kind = payload[offset]
+        offset += 1
+        if kind == SYMBOL:
+            index, offset = read_varint(payload, offset)
+            if index >= len(self.symbols):
+                raise ValueError(f"Unknown symbol {index}")
+            return self.symbols[index], offset
+        if kind == INT:
+            value, offset = read_varint(payload, offset)
+            return unzigzag(value), offset
+        if kind == TENTHS:
+            value, offset = read_varint(payload, offset)
+            return unzigzag(value) / 10, offset
+        if kind in (DICT, LIST) and depth >= MAX_DEPTH:
+            raise FrameError(f"Binary payload nested over {MAX_DEPTH} levels")
+        if kind == DICT:
+            size, offset = read_varint(payload, offset)
+            value = {}
+            for _ in range(size):
+                key, offset = self.read(payload, offset, depth + 1)
+                value[key], offset = self.read(payload, offset, depth + 1)
+            return value, offset
+        if kind == STRING:
+            size, offset = read_varint(payload, offset)
+            end = offset + size
+            if end > len(payload):
+                raise ValueError("Truncated string in binary payload")
+            return payload[offset:end].decode("utf-8"), end
+        if kind == LIST:
+            size, offset = read_varint(payload, offset)
+            value = []
+            for _ in range(size):
+                item, offset = self.read(payload, offset, depth + 1)
+                value.append(item)
+            return value, offset
+        if kind == FLOAT:
+            return DOUBLE.unpack_from(payload, offset)[0], offset + 8
+        if kind == NONE:
+            return None, offset
+        if kind == TRUE:
+            return True, offset
+        if kind == FALSE:
+            return False, offset
+        raise ValueError(f"Unknown value type {kind}")
+
+
+def zigzag(value) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value) -> int:
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def write_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(payload, offset):
+    value = payload[offset]
+    if value < 0x80:
+        # Ids, counts and most readings fit in one byte
+        return value, offset + 1
+    value = 0
+    shift = 0
+    while True:
+        byte = payload[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_frame(message, codec=None) -> bytes:
+    if codec is not None:
+        payload = codec.encode(message)
+    else:
+        payload = json.dumps(message).encode("utf-8")
+    return HEADER.pack(len(payload)) + payload
+
+
+def send_message(connection, message, codec=None) -> None:
+    connection.sendall(encode_frame(message, codec))
+
+
+class FrameDecoder:
+    # `codec` is set once the connection agreed on the binary encoding;
+    # JSON frames are still understood after that
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, codec=None):
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+        self.codec = codec
+        self.invalid_frames = 0
+
+    def feed(self, data, limit=None) -> list:
+        self.buffer += data
+        messages = []
+        offset = 0
+        size = len(self.buffer)
+        while size - offset >= HEADER.size:
+            if limit is not None and len(messages) >= limit:
+                break
+            (length,) = HEADER.unpack_from(self.buffer, offset)
+            if length > self.max_frame_size:
+                self.buffer.clear()
+                raise FrameError(f"Frame of {length} bytes is too big")
+            start = offset + HEADER.size
+            end = start + length
+            if end > size:
+                break
+            try:
+                if length and self.buffer[start] == BINARY_MARKER:
+                    if self.codec is None:
+                        raise ValueError("Binary frame before negotiation")
+                    payload = bytes(self.buffer[start:end])
+                    messages.append(self.codec.decode(payload))
+                else:
+                    messages.append(json.loads(self.buffer[start:end]))
+            except ValueError:
+                # A corrupted payload only costs its own frame
+                self.invalid_frames += 1
+            except FrameError:
+                # Nested on purpose to crash the reader: drop the peer
+                self.buffer.clear()
+                raise
+            except RecursionError:
+                self.buffer.clear()
+                raise FrameError("JSON frame nested too deep")
+            offset = end
+        if offset:
+            del self.buffer[:offset]
+        return messages
+
+    def pending(self) -> int:
+        return len(self.buffer)
@@ -0,0 +1,34 @@
+class Rule:
+    def __init__(self, name, sensors, condition, action):
+        self.name = name
+        self.sensors = tuple(sensors)
+        self.condition = condition
+        self.action = action
+        self.fired = 0
+
+    def __repr__(self):
+        return f"Rule({self.name}, {self.sensors})"
+
+
+class RuleEngine:
+    # Rules are indexed by the sensors they read, so an update only costs
+    # the rules that watch one of the devices it changed.
+    def __init__(self):
+        self.rules_by_sensor = {}
+
+    def add_rule(self, rule: Rule):
+        for sensor in rule.sensors:
+            self.rules_by_sensor.setdefault(sensor, []).append(rule)
+
+    def get_rules(self, sensor) -> list[Rule]:
+        return self.rules_by_sensor.get(sensor, [])
+
+    def evaluate(self, room, changed, detected_at) -> list[Rule]:
+        fired = []
+        for sensor in changed:
+            for rule in self.get_rules(sensor):
+                if rule.condition(room, sensor):
+                    rule.fired += 1
+                    rule.action(room, sensor, detected_at)
+                    fired.append(rule)
+        return fired
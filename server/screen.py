@@ -0,0 +1,145 @@
+import curses
+import math
+import threading
+import time
+
+import globals
+
+# Most frames drawn per second, however often the panels change
+FPS = 10
+# Smallest room cell: the compact view of a room, its title and two
+# summary lines inside the border, so four rooms fit on 80x24
+MIN_CELL_HEIGHT = 6
+MIN_CELL_WIDTH = 38
+
+
+def put(window, row, col, text, attr=0):
+    # addstr cut to the window: on a small terminal a line loses its end
+    # instead of failing the whole frame
+    rows, cols = window.getmaxyx()
+    if row >= rows or col >= cols - 1:
+        return
+    window.addstr(row, col, text[: cols - 1 - col], attr)
+
+
+class Renderer:
+    # The only thread that touches curses. Other threads mark panels dirty;
+    # each frame redraws just those and puts them on the terminal with a
+    # single doupdate, and frames are at least 1 / fps apart, so a burst of
+    # changes costs one frame. Keys are read here too, between frames.
+    # Panels are drawn in the order they were added, and a panel may mark
+    # the ones after it dirty to have them drawn in the same frame.
+    def __init__(self, fps=FPS):
+        self.interval = 1 / fps
+        self.panels = {}
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.input = None
+        self.on_key = None
+        self.frames = 0
+        self.invalidations = 0
+
+    def add_panel(self, name, draw):
+        with self.lock:
+            self.panels[name] = draw
+        self.invalidate(name)
+
+    def invalidate(self, *names):
+        with self.lock:
+            self.dirty.update(names)
+            self.invalidations += 1
+
+    def invalidate_all(self):
+        with self.lock:
+            self.dirty.update(self.panels)
+
+    def set_input(self, window, on_key):
+        # getch waits at most one frame, so the loop never sleeps longer
+        window.timeout(max(1, int(self.interval * 1000)))
+        self.input = window
+        self.on_key = on_key
+
+    def render(self):
+        with self.lock:
+            panels = list(self.panels.items())
+        for name, draw in panels:
+            with self.lock:
+                if name not in self.dirty:
+                    continue
+                self.dirty.discard(name)
+            draw()
+        curses.doupdate()
+        self.frames += 1
+
+    def run(self):
+        next_frame = 0
+        while not globals.stop_threads:
+            if self.input is not None:
+                key = self.input.getch()
+                if key != -1:
+                    self.on_key(key)
+            else:
+                time.sleep(self.interval)
+            now = time.monotonic()
+            if self.dirty and now >= next_frame:
+                self.render()
+                next_frame = now + self.interval
+
+
+class GridLayout:
+    # Cells for any number of rooms: a grid as close to square as the
+    # minimum cell size allows, scrolled a grid row at a time when they do
+    # not all fit. Only the cells on screen get a position.
+    def __init__(self, min_height=MIN_CELL_HEIGHT, min_width=MIN_CELL_WIDTH):
+        self.min_height = min_height
+        self.min_width = min_width
+        self.first_row = 0
+        self.rows = 1
+        self.columns = 1
+        self.count = 0
+        self.positions = {}
+
+    def arrange(self, names, top, left, height, width) -> dict:
+        count = len(names)
+        max_rows = max(1, height // self.min_height)
+        max_columns = max(1, width // self.min_width)
+        rows = min(max_rows, max(1, math.ceil(math.sqrt(count))))
+        columns = min(max_columns, max(1, math.ceil(count / rows)))
+        rows = min(rows, max(1, math.ceil(count / columns)))
+        total_rows = math.ceil(count / columns)
+        self.first_row = max(0, min(self.first_row, total_rows - rows))
+        cell_height = height // rows
+        cell_width = width // columns
+        first = self.first_row * columns
+        self.positions = {}
+        for index, name in enumerate(names[first : first + rows * columns]):
+            row, column = divmod(index, columns)
+            y = top + row * cell_height
+            x = left + column * cell_width
+            self.positions[name] = (
+                y,
+                x,
+                y + cell_height - 1,
+                x + cell_width - 1,
+            )
+        self.rows = rows
+        self.columns = columns
+        self.count = count
+        return self.positions
+
+    def scroll(self, rows):
+        # Past the end is fixed on the next arrange
+        self.first_row = max(0, self.first_row + rows)
+
+    def page(self, pages):
+        self.scroll(pages * self.rows)
+
+    def describe(self) -> str:
+        if not self.count:
+            return "No rooms connected"
+        first = self.first_row * self.columns
+        last = min(self.count, first + self.rows * self.columns)
+        message = f"Rooms {first + 1}-{last} of {self.count}"
+        if last - first < self.count:
+            message += " (PgUp/PgDn or Up/Down to scroll)"
+        return message
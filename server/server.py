@@ -1,3 +1,4 @@
+import argparse
 import curses
 import json
 import socket
@@ -10,6 +11,17 @@ from models import CentralServer
 from utils import load_config
 
 
+def create_central() -> CentralServer:
+    server_config = load_config()
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(
+        (server_config.get("server_ip"), server_config.get("server_port"))
+    )
+    return CentralServer(server, server_config)
+
+
 def init(stdscr: curses.window) -> None:
     globals.initialize()
 
@@ -31,14 +43,7 @@ def init(stdscr: curses.window) -> None:
     globals.stdscr_global.refresh()
     time.sleep(1)
 
-    server_config = load_config()
-
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server.bind(
-        (server_config.get("server_ip"), server_config.get("server_port"))
-    )
-    central = CentralServer(server)
+    central = create_central()
     central.run()
 
     k = 0
@@ -49,5 +54,22 @@ def init(stdscr: curses.window) -> None:
         exit()
 
 
+def init_headless() -> None:
+    globals.initialize()
+    central = create_central()
+    print("[STARTED] Server started")
+    print(f"[WAITING] Commands on {central.api.path}")
+    central.run_headless()
+
+
 if __name__ == "__main__":
-    wrapper(init)
+    parser = argparse.ArgumentParser(description="Central server")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="no curses screen, commands only through the API socket",
+    )
+    if parser.parse_args().headless:
+        init_headless()
+    else:
+        wrapper(init)
@@ -0,0 +1,85 @@
+from array import array
+from collections import deque
+
+
+class WindowStats:
+    # Rolling min/max/mean over the last `size` samples, updated on every
+    # append: a running sum for the mean and monotonic deques of sample
+    # indexes for min and max (never longer than the window).
+    def __init__(self, size):
+        self.size = size
+        self.total = 0.0
+        self.mins = deque()
+        self.maxs = deque()
+
+    def push(self, index, value, buffer):
+        self.total += value
+        if index >= self.size:
+            self.total -= buffer.at(index - self.size)
+        while self.mins and buffer.at(self.mins[-1]) >= value:
+            self.mins.pop()
+        self.mins.append(index)
+        while self.maxs and buffer.at(self.maxs[-1]) <= value:
+            self.maxs.pop()
+        self.maxs.append(index)
+        oldest = index - self.size
+        if self.mins[0] <= oldest:
+            self.mins.popleft()
+        if self.maxs[0] <= oldest:
+            self.maxs.popleft()
+
+
+class RingBuffer:
+    def __init__(self, capacity, windows=()):
+        windows = [window for window in windows if window <= capacity]
+        self.capacity = capacity
+        self.values = array("d", bytes(8 * capacity))
+        self.appended = 0
+        self.windows = {window: WindowStats(window) for window in windows}
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def at(self, index) -> float:
+        return self.values[index % self.capacity]
+
+    def append(self, value):
+        index = self.appended
+        # The windows still read the value this one replaces
+        for window in self.windows.values():
+            window.push(index, value, self)
+        self.values[index % self.capacity] = value
+        self.appended += 1
+        if self.appended % (self.capacity * 64) == 0:
+            self.resum()
+
+    def resum(self):
+        # Clear the floating point drift of the running sums
+        for size, window in self.windows.items():
+            count = min(size, self.appended)
+            window.total = sum(
+                self.at(self.appended - 1 - offset) for offset in range(count)
+            )
+
+    def latest(self):
+        if not self.appended:
+            return None
+        return self.at(self.appended - 1)
+
+    def to_list(self) -> list[float]:
+        start = self.appended - len(self)
+        return [self.at(index) for index in range(start, self.appended)]
+
+    def stats(self, window) -> tuple:
+        stats = self.windows[window]
+        count = min(window, self.appended)
+        if not count:
+            return None
+        return (
+            self.at(stats.mins[0]),
+            self.at(stats.maxs[0]),
+            stats.total / count,
+        )
+
+    def nbytes(self) -> int:
+        return self.values.itemsize * self.capacity
@@ -0,0 +1,279 @@
+import atexit
+import os
+import struct
+import threading
+import time
+import zlib
+
+DAY = 24 * 60 * 60
+RAW = struct.Struct("<dd")
+# bucket start, min, max, mean, count
+ROLLUP = struct.Struct("<ddddI")
+SEGMENT = struct.Struct("<I")
+
+# level: (bucket seconds, seconds per chunk file, record format)
+LEVELS = {
+    "raw": (None, 60 * 60, RAW),
+    "1m": (60, DAY, ROLLUP),
+    "1h": (60 * 60, 30 * DAY, ROLLUP),
+}
+
+
+class Bucket:
+    def __init__(self, start, value):
+        self.start = start
+        self.min = value
+        self.max = value
+        self.total = value
+        self.count = 1
+
+    def add(self, value):
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.total += value
+        self.count += 1
+
+    def to_record(self) -> tuple:
+        return (
+            self.start,
+            self.min,
+            self.max,
+            self.total / self.count,
+            self.count,
+        )
+
+
+def merge_rollups(records) -> list[tuple]:
+    # Rollups sorted by start; the ones that share a start are one bucket
+    # written in parts, like a bucket still open when the store stopped
+    merged = []
+    for record in records:
+        if not merged or merged[-1][0] != record[0]:
+            merged.append(record)
+            continue
+        start, low, high, mean, count = merged[-1]
+        total = mean * count + record[3] * record[4]
+        count += record[4]
+        merged[-1] = (
+            start,
+            min(low, record[1]),
+            max(high, record[2]),
+            total / count,
+            count,
+        )
+    return merged
+
+
+class TelemetryStore:
+    # Append-only store: every series and level is split in chunk files
+    # named by the start of the period they cover, and each flush appends
+    # one zlib compressed segment to the chunk it belongs to. `lock` guards
+    # what is in memory and is all record() takes; `files_lock` keeps the
+    # files still while a flush, a retention pass or a query uses them.
+    def __init__(self, root, flush_interval=5, retention=None):
+        self.root = root
+        self.flush_interval = flush_interval
+        self.retention = {"raw": 7 * DAY, "1m": 90 * DAY, "1h": None}
+        self.retention.update(retention or {})
+        self.pending = {}
+        self.buckets = {}
+        self.late = {}
+        self.lock = threading.Lock()
+        self.files_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_cleanup = 0.0
+        self.records = 0
+        self.bytes_written = 0
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.close_buckets()
+        self.flush()
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+            if time.time() - self.last_cleanup > 60 * 60:
+                self.apply_retention()
+
+    def record(self, series, value, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        value = float(value)
+        with self.lock:
+            self.add_pending(series, "raw", (timestamp, value))
+            for level in ("1m", "1h"):
+                self.add_to_bucket(series, level, timestamp, value)
+            self.records += 1
+
+    def add_pending(self, series, level, record):
+        self.pending.setdefault((series, level), []).append(record)
+
+    def add_to_bucket(self, series, level, timestamp, value):
+        size = LEVELS[level][0]
+        start = timestamp - timestamp % size
+        bucket = self.buckets.get((series, level))
+        if bucket is not None and start < bucket.start:
+            # Older than the open bucket, like a room backlog: rolled up on
+            # its own, written on the next flush and merged on query
+            late = self.late.get((series, level, start))
+            if late is None:
+                self.late[(series, level, start)] = Bucket(start, value)
+            else:
+                late.add(value)
+            return
+        if bucket is not None and start > bucket.start:
+            self.add_pending(series, level, bucket.to_record())
+            bucket = None
+        if bucket is None:
+            self.buckets[(series, level)] = Bucket(start, value)
+        else:
+            bucket.add(value)
+
+    def close_buckets(self):
+        # Partial buckets are written as they are when the store stops; a
+        # restart in the same period writes the rest, and query merges them
+        with self.lock:
+            for (series, level), bucket in self.buckets.items():
+                self.add_pending(series, level, bucket.to_record())
+            self.buckets = {}
+
+    def get_directory(self, series, level) -> str:
+        return os.path.join(self.root, level, *series.split("/"))
+
+    def get_chunk_start(self, level, timestamp) -> int:
+        span = LEVELS[level][1]
+        return int(timestamp - timestamp % span)
+
+    def flush(self):
+        with self.files_lock:
+            self.write_pending()
+
+    def write_pending(self):
+        with self.lock:
+            for (series, level, _), bucket in self.late.items():
+                self.add_pending(series, level, bucket.to_record())
+            self.late = {}
+            pending, self.pending = self.pending, {}
+        for (series, level), records in pending.items():
+            layout = LEVELS[level][2]
+            chunks = {}
+            for record in records:
+                start = self.get_chunk_start(level, record[0])
+                chunks.setdefault(start, []).append(layout.pack(*record))
+            directory = self.get_directory(series, level)
+            os.makedirs(directory, exist_ok=True)
+            for start, packed in chunks.items():
+                segment = zlib.compress(b"".join(packed))
+                with open(os.path.join(directory, f"{start}.z"), "ab") as f:
+                    f.write(SEGMENT.pack(len(segment)) + segment)
+                self.bytes_written += SEGMENT.size + len(segment)
+
+    def list_chunks(self, series, level) -> list[int]:
+        try:
+            names = os.listdir(self.get_directory(series, level))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-2]) for name in names if name.endswith(".z"))
+
+    def read_chunk(self, series, level, start):
+        layout = LEVELS[level][2]
+        path = os.path.join(self.get_directory(series, level), f"{start}.z")
+        with open(path, "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + SEGMENT.size <= len(data):
+            (length,) = SEGMENT.unpack_from(data, offset)
+            offset += SEGMENT.size
+            if offset + length > len(data):
+                # A segment cut short by a crash is skipped
+                break
+            raw = zlib.decompress(data[offset : offset + length])
+            offset += length
+            yield from layout.iter_unpack(raw)
+
+    def query(self, series, start, end, level="raw") -> list[tuple]:
+        # Holding files_lock, no record moves from memory to disk and no
+        # chunk is removed between reading the two
+        with self.files_lock:
+            records = self.read_range(series, level, start, end)
+            with self.lock:
+                records.extend(
+                    record
+                    for record in self.get_in_memory(series, level)
+                    if start <= record[0] <= end
+                )
+        records.sort(key=lambda record: record[0])
+        if level != "raw":
+            records = merge_rollups(records)
+        return records
+
+    def read_range(self, series, level, start, end) -> list[tuple]:
+        span = LEVELS[level][1]
+        records = []
+        for chunk in self.list_chunks(series, level):
+            # Only the chunks that overlap the range are read
+            if chunk + span <= start or chunk > end:
+                continue
+            records.extend(
+                record
+                for record in self.read_chunk(series, level, chunk)
+                if start <= record[0] <= end
+            )
+        return records
+
+    def get_in_memory(self, series, level) -> list[tuple]:
+        # Records not on disk yet, including the rollup buckets still open,
+        # so recent data shows up before its bucket closes
+        records = list(self.pending.get((series, level), []))
+        bucket = self.buckets.get((series, level))
+        if bucket is not None:
+            records.append(bucket.to_record())
+        records.extend(
+            late.to_record()
+            for (name, late_level, _), late in self.late.items()
+            if name == series and late_level == level
+        )
+        return records
+
+    def series_names(self) -> list[str]:
+        names = []
+        directory = os.path.join(self.root, "raw")
+        if not os.path.isdir(directory):
+            return names
+        for room in sorted(os.listdir(directory)):
+            for metric in sorted(os.listdir(os.path.join(directory, room))):
+                names.append(f"{room}/{metric}")
+        return names
+
+    def apply_retention(self, now=None):
+        with self.files_lock:
+            return self.remove_expired(now)
+
+    def remove_expired(self, now=None):
+        now = time.time() if now is None else now
+        self.last_cleanup = now
+        removed = 0
+        for level, keep in self.retention.items():
+            if keep is None:
+                continue
+            span = LEVELS[level][1]
+            for series in self.series_names():
+                directory = self.get_directory(series, level)
+                for chunk in self.list_chunks(series, level):
+                    if chunk + span < now - keep:
+                        os.remove(os.path.join(directory, f"{chunk}.z"))
+                        removed += 1
+        return removed